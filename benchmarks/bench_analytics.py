@@ -0,0 +1,85 @@
+"""
+Benchmark des calculs de la vue d'ensemble du budget
+
+Compare les sommes Python d'origine (un parcours par catégorie) au module
+vectorisé utils.analytics et aux totaux courants du RecordStore.
+
+Usage: python -m benchmarks.bench_analytics [nombre_de_depenses ...]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.bench_codec import CATEGORIES, make_records
+from utils import analytics
+from utils.columnar_store import records_to_frame
+from utils.record_store import RecordStore
+
+BUDGET_CATEGORIES = [{"id": i + 1, "name": name, "limit": 500.0, "spent": 0.0} for i, name in enumerate(CATEGORIES)]
+
+
+def python_overview(income, expenses):
+    """Calculs d'origine de pages/budget_overview.py sur des listes de dictionnaires"""
+    total_income = sum(item.get("amount", 0) for item in income)
+    total_expenses = sum(item.get("amount", 0) for item in expenses)
+    category_totals = {}
+    for expense in expenses:
+        category = expense.get("category", "Autre")
+        category_totals[category] = category_totals.get(category, 0) + expense.get("amount", 0)
+    spent = [
+        sum(e.get("amount", 0) for e in expenses if e.get("category") == c["name"])
+        for c in BUDGET_CATEGORIES
+    ]
+    return total_income, total_expenses, category_totals, spent
+
+
+def vectorized_overview(income_frame, expense_frame):
+    """Mêmes calculs en passes NumPy/pandas sur des colonnes typées"""
+    total_income = analytics.total(income_frame)
+    total_expenses = analytics.total(expense_frame)
+    category_totals = analytics.category_totals(expense_frame)
+    spent = analytics.category_budget(BUDGET_CATEGORIES, category_totals)["spent"].tolist()
+    return total_income, total_expenses, category_totals, spent
+
+
+def running_overview(income_store, expense_store):
+    """Lecture des totaux courants, sans parcours"""
+    totals = expense_store.totals
+    spent = analytics.category_budget(BUDGET_CATEGORIES, totals.by_category)["spent"].tolist()
+    return income_store.totals.total, totals.total, dict(totals.by_category), spent
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def bench(count: int) -> None:
+    expenses = make_records(count)
+    income = [{"id": r["id"], "source": "Salaire", "amount": r["amount"] * 2, "date": r["date"]} for r in expenses[: count // 10]]
+    print(f"\n📊 {count} dépenses")
+
+    expected, python_time = timed(python_overview, income, expenses)
+    print(f"  Python (d'origine)         {python_time:8.4f}s")
+
+    (income_frame, expense_frame), frame_time = timed(lambda: (records_to_frame(income), records_to_frame(expenses)))
+    result, vector_time = timed(vectorized_overview, income_frame, expense_frame)
+    assert abs(result[1] - expected[1]) < 1e-6 * max(1.0, expected[1])
+    print(f"  Vectorisé (analytics)      {vector_time:8.4f}s  (colonnes chargées une fois en {frame_time:.3f}s)"
+          f"  x{python_time / vector_time:.0f}")
+
+    (income_store, expense_store), store_time = timed(
+        lambda: (RecordStore.for_collection("income", income), RecordStore.for_collection("expenses", expenses))
+    )
+    result, running_time = timed(running_overview, income_store, expense_store)
+    assert abs(result[1] - expected[1]) < 1e-6 * max(1.0, expected[1])
+    print(f"  Totaux courants            {running_time:8.4f}s  (construits une fois en {store_time:.3f}s)"
+          f"  x{python_time / running_time:.0f}")
+
+
+if __name__ == "__main__":
+    for arg in sys.argv[1:] or ["10000", "100000", "1000000"]:
+        bench(int(arg))
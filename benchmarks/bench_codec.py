@@ -0,0 +1,61 @@
+"""
+Benchmark des codecs de sérialisation des collections
+
+Usage: python -m benchmarks.bench_codec [nombre_d_enregistrements ...]
+"""
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import codec
+from utils.journal import read_snapshot, write_snapshot
+
+CATEGORIES = ["Logement", "Alimentation", "Transport", "Divertissement", "Services", "Santé", "Autre"]
+
+
+def make_records(count: int):
+    """Générer des dépenses synthétiques"""
+    return [
+        {
+            "id": i + 1,
+            "category": CATEGORIES[i % len(CATEGORIES)],
+            "description": f"Dépense n°{i}",
+            "amount": round((i % 500) * 1.37, 2),
+            "date": f"2026-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+        }
+        for i in range(count)
+    ]
+
+
+def bench(count: int) -> None:
+    records = make_records(count)
+    print(f"\n📊 {count} enregistrements")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in codec.CODECS:
+            path = Path(tmp) / f"expenses-{name}.json"
+            codec.CODEC = name
+            start = time.perf_counter()
+            write_snapshot(path, records)
+            write_time = time.perf_counter() - start
+            start = time.perf_counter()
+            loaded = read_snapshot(path)
+            read_time = time.perf_counter() - start
+            assert len(loaded) == count
+            size_mb = path.stat().st_size / 1024 / 1024
+            print(f"  {name:5} écriture {write_time:7.3f}s  lecture {read_time:7.3f}s  taille {size_mb:7.1f} Mo")
+            if name == "json":
+                # Chemin d'origine: json.load du module standard
+                start = time.perf_counter()
+                with open(path, "r", encoding="utf-8") as f:
+                    json.load(f)
+                print(f"  json.load (module standard)  lecture {time.perf_counter() - start:7.3f}s")
+
+
+if __name__ == "__main__":
+    print(f"orjson disponible: {codec.ORJSON_AVAILABLE}")
+    for arg in sys.argv[1:] or ["100000", "1000000"]:
+        bench(int(arg))
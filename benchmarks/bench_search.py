@@ -0,0 +1,67 @@
+"""
+Benchmark de la recherche dans les descriptions des dépenses
+
+Compare le filtrage Python d'origine (une recherche de sous-chaîne par
+enregistrement) à l'index plein texte utils.text_index combiné aux filtres
+vectorisés du RecordStore.
+
+Usage: python -m benchmarks.bench_search [nombre_de_depenses ...]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.bench_codec import make_records
+from utils.record_store import RecordStore
+from utils.text_index import TextIndex, fold
+
+# Libellés récurrents, comme dans un vrai relevé: bien moins de textes distincts que de lignes
+MERCHANTS = ["Épicerie du marché", "Boulangerie Paul", "Pharmacie centrale", "Café de la gare",
+             "Librairie", "Station essence", "Cinéma", "Électricité", "Loyer", "Restaurant"]
+
+
+def python_search(records, query, category, start, end):
+    """Filtrage d'origine: sous-chaîne sans accents, catégorie et dates, enregistrement par enregistrement"""
+    needle = fold(query)
+    return [
+        r["id"] for r in records
+        if needle in fold(r["description"]) and r["category"] == category and start <= r["date"] <= end
+    ]
+
+
+def indexed_search(store, index, query, category, start, end):
+    """Même filtre: index plein texte puis masques sur les colonnes typées"""
+    mask = store.select(index.codes(query, store.texts), category, start, end)
+    return store.ids[: store.size][mask].tolist()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def bench(count: int) -> None:
+    records = make_records(count)
+    for i, record in enumerate(records):
+        record["description"] = f"{MERCHANTS[i % len(MERCHANTS)]} {i % 500}"
+    query = ("pharma", "Santé", "2026-03-01", "2026-06-30")
+    print(f"\n🔎 {count} dépenses")
+
+    expected, python_time = timed(python_search, records, *query)
+    print(f"  Python (d'origine)         {python_time:8.4f}s")
+
+    store, store_time = timed(RecordStore.for_collection, "expenses", records)
+    index = TextIndex()
+    _, index_time = timed(index.sync, store.texts.strings)
+    result, search_time = timed(indexed_search, store, index, *query)
+    assert sorted(result) == sorted(expected)
+    print(f"  Index plein texte          {search_time:8.4f}s  (index construit une fois en {index_time:.3f}s)"
+          f"  x{python_time / search_time:.0f}")
+
+
+if __name__ == "__main__":
+    for arg in sys.argv[1:] or ["10000", "100000", "1000000"]:
+        bench(int(arg))
@@ -14,17 +14,32 @@ data_manager = DataManager()
 
 def load_initial_data():
     """Load all saved data from files"""
-    saved_income = data_manager.load_data("income")
-    saved_expenses = data_manager.load_data("expenses")
     saved_goals = data_manager.load_data("savings_goals")
-    saved_settings = data_manager.load_data("settings")[0] if data_manager.load_data("settings") else {}
+    settings_records = data_manager.load_data("settings")
+    saved_settings = settings_records[0] if settings_records else {}
     
-    if saved_income:
-        income.income_records = saved_income
-    if saved_expenses:
-        expenses.expense_records = saved_expenses
+    # Montants saisis avant l'enregistrement de la devise: ils sont dans celle des paramètres
+    data_manager.stamp_legacy_currency()
+    # Revenus et dépenses: colonnes typées, sans liste de dictionnaires en mémoire.
+    # Leurs totaux par catégorie et par mois sont construits ici, au démarrage.
+    data_manager.aggregates("income")
+    data_manager.aggregates("expenses")
+    # Limites de budget chargées une fois: l'ajout d'une dépense les vérifie sans lire de fichier
+    data_manager.configure_budget_alerts()
+    # Historique des dépenses noté une fois; chaque nouvelle dépense ne met à jour que sa catégorie
+    data_manager.anomaly_detector()
+    income.income_total = income.current_month_total(data_manager)
+    income.income_df = income.get_income_df(data_manager.load_frame("income"))
+    expenses.expense_total = expenses.current_month_total(data_manager)
+    expenses.expenses_df = expenses.get_expenses_df(data_manager.load_frame("expenses"))
+    for name, value in reports.build_report(data_manager).items():
+        setattr(reports, name, value)
+    period = reports.build_period_report(data_manager, reports.period_start, reports.period_end)
+    for name, value in period.items():
+        setattr(reports, name, value)
     if saved_goals:
         savings.savings_goals = saved_goals
+        savings.savings_df = savings.forecast_savings_df(data_manager, saved_goals)
     if saved_settings:
         settings.currency = saved_settings.get("currency", "EUR")
         settings.theme = saved_settings.get("theme", "Clair")
@@ -32,6 +47,9 @@ def load_initial_data():
         settings.email_reports = saved_settings.get("email_reports", False)
         settings.user_email = saved_settings.get("user_email", "utilisateur@exemple.com")
         app_state.currency = settings.currency
+        # Les nouveaux montants sont saisis par défaut dans la devise choisie
+        income.new_currency = expenses.new_currency = settings.currency
+        income.total_currency = expenses.total_currency = settings.currency
         app_state.theme = settings.theme
 
 pages = {
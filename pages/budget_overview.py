@@ -2,50 +2,37 @@
 Page Vue d'Ensemble du Budget - Afficher l'état général du budget
 """
 from taipy.gui import Markdown
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from datetime import datetime
 import pandas as pd
+from utils import analytics
+from utils.aggregates import RunningTotals
+from utils.currency import CURRENCY_SYMBOLS, missing_rates_message
 from utils.data_manager import DataManager
 
 data_manager = DataManager()
 
-def calculate_budget_summary(state) -> Dict[str, float]:
-    """Calculer le résumé du budget à partir des données réelles"""
-    # Charger les revenus
-    income_data = data_manager.load_data("income")
-    if not isinstance(income_data, list):
-        income_data = []
-    total_income = sum(item.get("amount", 0) for item in income_data)
-    
-    # Charger les dépenses
-    expenses_data = data_manager.load_data("expenses")
-    if not isinstance(expenses_data, list):
-        expenses_data = []
-    total_expenses = sum(item.get("amount", 0) for item in expenses_data)
-    
-    # Calculer le restant et le taux d'épargne
-    remaining = total_income - total_expenses
-    savings_rate = (remaining / total_income * 100) if total_income > 0 else 0
-    
-    return {
-        "total_income": total_income,
-        "total_expenses": total_expenses,
-        "remaining": remaining,
-        "savings_rate": savings_rate
-    }
+# Horizon de projection des revenus récurrents, en mois
+PROJECTION_MONTHS = 12
 
-def calculate_category_expenses(state) -> Dict[str, List[Any]]:
+def calculate_budget_summary(state, income_totals: Optional[RunningTotals] = None, expense_totals: Optional[RunningTotals] = None, factor: float = 1.0) -> Dict[str, float]:
+    """Calculer le résumé du budget à partir des données réelles"""
+    # Totaux tenus à jour à chaque ajout, sans parcourir les enregistrements,
+    # en devise de référence: factor les convertit dans la devise affichée
+    income_totals = income_totals or data_manager.aggregates("income")
+    expense_totals = expense_totals or data_manager.aggregates("expenses")
+    summary = analytics.budget_summary(income_totals.total * factor, expense_totals.total * factor)
+    summary["month_expenses"] = expense_totals.month_total(datetime.now().strftime("%Y-%m")) * factor
+    # Revenus récurrents des 12 prochains mois, projetés sans créer d'enregistrements
+    projected = sum(data_manager.projected_income(PROJECTION_MONTHS).values()) * factor
+    summary["projected_income"] = projected
+    summary["projected_balance"] = summary["remaining"] + projected
+    return summary
+
+def calculate_category_expenses(state, category_totals: Optional[Dict[str, float]] = None, factor: float = 1.0) -> Dict[str, List[Any]]:
     """Calculer les dépenses par catégorie"""
-    raw_data = data_manager.load_data("expenses")
-    expenses_data: List[Dict[str, Any]] = (
-        raw_data if isinstance(raw_data, list) and all(isinstance(x, dict) for x in raw_data) else []
-    )
-
-    # Grouper par catégorie
-    category_totals: Dict[str, float] = {}
-    for expense in expenses_data:
-        category = expense.get("category", "Autre")
-        amount = expense.get("amount", 0)
-        category_totals[category] = category_totals.get(category, 0) + amount
+    if category_totals is None:
+        category_totals = data_manager.aggregates("expenses").by_category
     
     if not category_totals:
         return {
@@ -55,14 +42,17 @@ def calculate_category_expenses(state) -> Dict[str, List[Any]]:
     
     return {
         "Catégorie": list(category_totals.keys()),
-        "Montant": list(category_totals.values())
+        "Montant": [amount * factor for amount in category_totals.values()]
     }
 
 budget_data: Dict[str, float] = {
     "total_income": 0.0,
     "total_expenses": 0.0,
     "remaining": 0.0,
-    "savings_rate": 0.0
+    "savings_rate": 0.0,
+    "month_expenses": 0.0,
+    "projected_income": 0.0,
+    "projected_balance": 0.0
 }
 
 category_chart_data: Dict[str, List[Any]] = {
@@ -73,7 +63,8 @@ category_chart_data: Dict[str, List[Any]] = {
 budget_categories: List[Dict[str, Any]] = []
 new_category_name: str = ""
 new_category_limit: float = 0.0
-selected_category_index: int = -1
+# Identifiant de la catégorie à modifier ou supprimer
+selected_category_id: int = 0
 
 def load_budget_categories(state) -> None:
     """Charger les catégories de budget"""
@@ -89,51 +80,84 @@ def load_budget_categories(state) -> None:
             {"name": "Divertissement", "limit": 300.0, "spent": 0.0},
             {"name": "Services", "limit": 500.0, "spent": 0.0}
         ]
+    # Les catégories enregistrées avant les identifiants en reçoivent un, enregistré aussitôt
+    # pour qu'elles gardent le même identifiant d'un chargement à l'autre
+    categories = list(state.budget_categories)
+    missing = [category for category in categories if "id" not in category]
+    for category in missing:
+        category["id"] = data_manager.next_id("budget_categories")
+    if missing:
+        data_manager.save_data("budget_categories", categories)
+        state.budget_categories = categories
+    data_manager.configure_budget_alerts(state.budget_categories)
 
 def add_category(state) -> None:
     """Ajouter une nouvelle catégorie de budget"""
     if state.new_category_name and state.new_category_limit > 0:
         state.budget_categories.append({
+            "id": data_manager.next_id("budget_categories"),
             "name": state.new_category_name,
             "limit": state.new_category_limit,
             "spent": 0.0
         })
         data_manager.save_data("budget_categories", state.budget_categories)
+        data_manager.configure_budget_alerts(state.budget_categories)
         state.new_category_name = ""
         state.new_category_limit = 0.0
         update_page_data(state)
 
-def delete_category(state, index: int) -> None:
-    """Supprimer une catégorie de budget"""
-    if 0 <= index < len(state.budget_categories):
-        state.budget_categories.pop(index)
-        data_manager.save_data("budget_categories", state.budget_categories)
-        update_page_data(state)
+def _refresh_categories(state) -> None:
+    """Relire les catégories après une modification par identifiant"""
+    state.budget_categories = data_manager.load_data("budget_categories")
+    data_manager.configure_budget_alerts(state.budget_categories)
+    update_page_data(state)
+
+def update_category(state) -> None:
+    """Remplacer le nom et la limite de la catégorie sélectionnée par ceux du formulaire"""
+    from taipy.gui import notify
+
+    if not (state.new_category_name and state.new_category_limit > 0):
+        notify(state, "warning", "Renseignez le nom et une limite positive")
+        return
+    changes = {"name": state.new_category_name, "limit": state.new_category_limit}
+    if data_manager.update_record("budget_categories", int(state.selected_category_id), changes):
+        state.new_category_name = ""
+        state.new_category_limit = 0.0
+        _refresh_categories(state)
+        notify(state, "success", f"Catégorie {int(state.selected_category_id)} modifiée")
+    else:
+        notify(state, "error", f"Aucune catégorie avec l'ID {int(state.selected_category_id)}")
+
+def delete_category(state) -> None:
+    """Supprimer la catégorie de budget sélectionnée"""
+    from taipy.gui import notify
+
+    if data_manager.delete_record("budget_categories", int(state.selected_category_id)):
+        _refresh_categories(state)
+        notify(state, "success", f"Catégorie {int(state.selected_category_id)} supprimée")
+    else:
+        notify(state, "error", f"Aucune catégorie avec l'ID {int(state.selected_category_id)}")
 
 def update_page_data(state) -> None:
     """Mettre à jour toutes les données de la page"""
-    state.budget_data = calculate_budget_summary(state)
-    state.category_chart_data = calculate_category_expenses(state)
+    # Obtenir la devise des paramètres: tous les montants y sont convertis
+    currency = data_manager.display_currency()
+    state.currency_symbol = CURRENCY_SYMBOLS.get(currency, currency)
+    factor = data_manager.display_factor(currency)
+    state.rates_warning = missing_rates_message(data_manager.missing_rates())
+
+    expense_totals = data_manager.aggregates("expenses")
+    state.budget_data = calculate_budget_summary(state, data_manager.aggregates("income"), expense_totals, factor)
+    state.category_chart_data = calculate_category_expenses(state, expense_totals.by_category, factor)
     
-    # Mettre à jour les dépenses réelles pour chaque catégorie
-    raw_expenses = data_manager.load_data("expenses")
-    expenses_data: List[Dict[str, Any]] = (
-        raw_expenses if isinstance(raw_expenses, list) and all(isinstance(x, dict) for x in raw_expenses) else []
-    )
-
-    for category in state.budget_categories:
-        spent = sum(
-            expense.get("amount", 0) 
-            for expense in expenses_data 
-            if expense.get("category") == category["name"]
-        )
+    # Mettre à jour les dépenses réelles: jointure catégories/limites en une passe
+    budget = analytics.category_budget(state.budget_categories, expense_totals.by_category)
+    for category, spent in zip(state.budget_categories, (budget["spent"] * factor).tolist()):
         category["spent"] = spent
-    
-    # Obtenir le symbole de devise
-    settings = data_manager.load_data("settings")[0] if data_manager.load_data("settings") else {}
-    state.currency_symbol = settings.get("currency", "€")
 
 currency_symbol: str = "€"
+# Devises sans cours de change (vide: tous les cours sont connus)
+rates_warning: str = ""
 
 def on_init(state) -> None:
     """Initialiser la page avec les données"""
@@ -155,6 +179,10 @@ page = Markdown("""
 
 ## Résumé Financier
 
+<|part|render={rates_warning != ""}|
+⚠️ {rates_warning}
+|>
+
 <|layout|columns=1 1 1 1|gap=1rem|
 <|card|
 ### Revenu Total
@@ -177,6 +205,10 @@ page = Markdown("""
 |>
 |>
 
+Dépenses du mois en cours: **{budget_data['month_expenses']:.2f} {currency_symbol}**
+
+Revenus récurrents attendus sur 12 mois: **{budget_data['projected_income']:.2f} {currency_symbol}** — solde projeté: **{budget_data['projected_balance']:.2f} {currency_symbol}**
+
 ## Répartition des Dépenses
 
 <|{category_chart_data}|chart|type=pie|title=Dépenses par Catégorie|>
@@ -194,13 +226,19 @@ page = Markdown("""
 ### Mes Catégories
 
 <|{budget_categories}|table|
-columns=name;limit;spent
+columns=id;name;limit;spent
+column[id].label=ID
 column[name].label=Catégorie
 column[limit].label=Limite ({currency_symbol})
 column[spent].label=Dépensé ({currency_symbol})
 |>
 
+<|layout|columns=1fr auto auto auto|gap=1rem|
+<|{selected_category_id}|number|label=ID de la catégorie|>
+<|button|label=✏️ Modifier|on_action=update_category|class_name=edit-button|>
+<|button|label=🗑️ Supprimer|on_action=delete_category|class_name=delete-button|>
 <|button|label=🔄 Actualiser|on_action=update_page_data|class_name=refresh-button|>
+|>
 
 |>
 
@@ -226,6 +264,20 @@ column[spent].label=Dépensé ({currency_symbol})
     padding: 0.5rem 1rem;
     border-radius: 0.5rem;
 }
+.edit-button {
+    background-color: #F59E0B;
+    color: white;
+    padding: 0.5rem 1rem;
+    border-radius: 0.5rem;
+    margin-top: 1rem;
+}
+.delete-button {
+    background-color: #6B7280;
+    color: white;
+    padding: 0.5rem 1rem;
+    border-radius: 0.5rem;
+    margin-top: 1rem;
+}
 .refresh-button {
     background-color: #3b82f6;
     color: white;
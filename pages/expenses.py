@@ -5,31 +5,79 @@ from taipy.gui import Markdown
 from typing import List, Dict, Any
 from datetime import datetime
 import pandas as pd
+from utils.columnar_store import records_to_frame
+from utils.currency import SUPPORTED_CURRENCIES
+from utils.date_index import month_bounds
 
-expense_records: List[Dict[str, Any]] = []
+# Total du mois en cours, lu dans l'index des dates de DataManager.record_store
+expense_total: float = 0.0
+total_currency: str = "EUR"
+
+def current_month_total(data_manager) -> float:
+    """Total du mois en cours dans la devise des paramètres, sans parcourir l'historique"""
+    total, _ = data_manager.range_total("expenses", *month_bounds())
+    return total * data_manager.display_factor()
 
 categories: List[str] = ["Logement", "Alimentation", "Transport", "Divertissement", "Services", "Santé", "Autre"]
 new_category: str = categories[0]
 new_description: str = ""
 new_amount: float = 0.0
 new_date: str = datetime.now().strftime("%Y-%m-%d")
+# Devise d'origine du montant saisi, celle des paramètres par défaut
+currencies: List[str] = list(SUPPORTED_CURRENCIES)
+new_currency: str = currencies[0]
+# Saisie identique à une opération enregistrée, en attente de confirmation
+duplicate_pending: str = ""
+# Identifiant de la dépense à modifier ou supprimer
+selected_id: int = 0
+
+# Règle de catégorisation automatique: mot-clé (ou expression régulière) et catégorie attribuée
+rule_text: str = ""
+rule_category: str = categories[0]
+rule_is_pattern: bool = False
+# Catégorie proposée par les règles pour la description saisie (vide: aucune règle ne s'applique)
+suggested_category: str = ""
+
+# Recherche dans les descriptions et filtres du tableau (vides: aucun filtre)
+ALL_CATEGORIES = "Toutes"
+search_query: str = ""
+filter_categories: List[str] = [ALL_CATEGORIES] + categories
+filter_category: str = ALL_CATEGORIES
+filter_start: str = ""
+filter_end: str = ""
+
+# Colonnes des enregistrements et libellés affichés dans le tableau
+EXPENSE_COLUMNS: Dict[str, str] = {
+    "id": "ID",
+    "category": "Catégorie",
+    "description": "Description",
+    "amount": "Montant",
+    "date": "Date",
+    "currency": "Devise",
+}
+
+expense_table_columns: Dict[str, Dict[str, Any]] = {
+    "ID": {"index": 0},
+    "Catégorie": {"index": 1},
+    "Description": {"index": 2},
+    "Montant": {"index": 3, "format": "%.2f"},
+    "Date": {"index": 4, "format": "yyyy-MM-dd"},
+    "Devise": {"index": 5},
+}
 
 def get_expenses_df(records):
-    """Convert expense records to DataFrame"""
-    if not records:
-        return pd.DataFrame(columns=["ID", "Catégorie", "Description", "Montant", "Date"])
-    return pd.DataFrame([
-        {
-            "ID": r["id"],
-            "Catégorie": r["category"],
-            "Description": r["description"],
-            "Montant": f"{r['amount']:.2f}",
-            "Date": r["date"]
-        }
-        for r in records
-    ])
+    """Convert expense records (list or DataManager.load_frame result) to DataFrame"""
+    frame = records if isinstance(records, pd.DataFrame) else records_to_frame(records)
+    if frame.empty:
+        return pd.DataFrame(columns=list(EXPENSE_COLUMNS.values()))
+    return frame.reindex(columns=list(EXPENSE_COLUMNS)).rename(columns=EXPENSE_COLUMNS)
+
+expenses_df = get_expenses_df([])
 
-expenses_df = get_expenses_df(expense_records)
+def filtered_frame(state, data_manager):
+    """Dépenses correspondant à la recherche, à la catégorie et aux dates choisies"""
+    category = None if state.filter_category == ALL_CATEGORIES else state.filter_category
+    return data_manager.search_frame("expenses", state.search_query, category, state.filter_start, state.filter_end)
 
 page = Markdown("""
 <|container|
@@ -46,14 +94,14 @@ page = Markdown("""
 
 ## Ajouter une Nouvelle Dépense
 
-<|layout|columns=1 1 1 1|gap=1rem|
+<|layout|columns=1 1 1 1 1|gap=1rem|
 <|part|
 **Catégorie**
 <|{new_category}|selector|lov={categories}|>
 |>
 <|part|
 **Description**
-<|{new_description}|input|>
+<|{new_description}|input|on_change=suggest_category|>
 |>
 <|part|
 **Montant**
@@ -63,16 +111,71 @@ page = Markdown("""
 **Date**
 <|{new_date}|date|>
 |>
+<|part|
+**Devise**
+<|{new_currency}|selector|lov={currencies}|dropdown|>
+|>
 |>
 
 <|{None}|button|label=Ajouter une Dépense|on_action=add_expense|class_name=add-button|>
 
+## Règles de Catégorisation
+
+<|layout|columns=2 1 auto auto|gap=1rem|
+<|part|
+**Mot-clé de la description**
+<|{rule_text}|input|>
+|>
+<|part|
+**Catégorie**
+<|{rule_category}|selector|lov={categories}|dropdown|>
+|>
+<|part|
+<|{rule_is_pattern}|toggle|label=Expression régulière|>
+|>
+<|part|
+<|{None}|button|label=➕ Ajouter la Règle|on_action=add_rule|class_name=edit-button|>
+|>
+|>
+
 ## Enregistrements de Dépenses
 
-<|{expenses_df}|table|>
+<|layout|columns=2 1 1 1|gap=1rem|
+<|part|
+**Rechercher**
+<|{search_query}|input|on_change=apply_filters|>
+|>
+<|part|
+**Catégorie**
+<|{filter_category}|selector|lov={filter_categories}|dropdown|on_change=apply_filters|>
+|>
+<|part|
+**Du (AAAA-MM-JJ)**
+<|{filter_start}|input|on_change=apply_filters|>
+|>
+<|part|
+**Au (AAAA-MM-JJ)**
+<|{filter_end}|input|on_change=apply_filters|>
+|>
+|>
+
+<|{expenses_df}|table|columns={expense_table_columns}|>
+
+<|layout|columns=1 auto auto|gap=1rem|
+<|part|
+**ID de la dépense**
+<|{selected_id}|number|>
+|>
+<|part|
+<|{None}|button|label=✏️ Modifier|on_action=update_expense|class_name=edit-button|>
+|>
+<|part|
+<|{None}|button|label=🗑️ Supprimer|on_action=delete_expense|class_name=delete-button|>
+|>
+|>
 
 ## Dépenses Totales Ce Mois
-### {sum(record['amount'] for record in expense_records):.2f}
+### {expense_total:.2f} {total_currency}
 
 |>
 
@@ -91,6 +194,18 @@ page = Markdown("""
     padding: 0.75rem 1.5rem;
     border-radius: 0.5rem;
 }
+.edit-button {
+    margin-top: 1.5rem;
+    background-color: #F59E0B;
+    color: white;
+    border-radius: 0.5rem;
+}
+.delete-button {
+    margin-top: 1.5rem;
+    background-color: #6B7280;
+    color: white;
+    border-radius: 0.5rem;
+}
 </style>
 """)
 
@@ -104,23 +219,122 @@ def go_to_dashboard(state) -> None:
 
 def add_expense(state) -> None:
     """Ajouter un nouvel enregistrement de dépense"""
+    from taipy.gui import notify
     from utils.data_manager import DataManager
     
     if state.new_description and state.new_amount > 0:
-        new_record: Dict[str, Any] = {
-            "id": len(state.expense_records) + 1,
+        data_manager = DataManager()
+        fields: Dict[str, Any] = {
             "category": state.new_category,
             "description": state.new_description,
             "amount": state.new_amount,
-            "date": state.new_date
+            "date": state.new_date,
+            "currency": state.new_currency
         }
-        state.expense_records.append(new_record)
-        
-        data_manager = DataManager()
-        data_manager.save_data("expenses", state.expense_records)
-        
-        state.expenses_df = get_expenses_df(state.expense_records)
+        # Deux opérations identiques le même jour peuvent être réelles: la seconde demande confirmation
+        entry = repr(sorted(fields.items()))
+        if data_manager.is_duplicate("expenses", fields) and state.duplicate_pending != entry:
+            state.duplicate_pending = entry
+            notify(state, "warning", "Cette dépense est déjà enregistrée (même date, montant et description). Cliquez de nouveau sur Ajouter pour l'enregistrer quand même")
+            return
+        state.duplicate_pending = ""
+        new_record: Dict[str, Any] = {"id": data_manager.next_id("expenses"), **fields}
+        # Comparée à l'historique de sa catégorie, qui ne la compte qu'une fois enregistrée
+        anomaly = data_manager.check_anomaly(new_record)
+        if not data_manager.append_data("expenses", new_record):
+            notify(state, "error", "❌ Erreur lors de l'enregistrement de la dépense")
+            return
+        if state.suggested_category and state.new_category != state.suggested_category:
+            # Catégorie proposée puis corrigée: la correction est retenue pour ce commerçant
+            data_manager.category_rules().learn(state.new_description, state.new_category)
+        _refresh_expenses(state, data_manager)
+        _notify_budget(state, data_manager, new_record)
+        if anomaly["anomaly"]:
+            notify(state, "warning", f"Dépense inhabituelle en {new_record['category']}: {anomaly['ratio']:.1f} fois le montant habituel")
         
         # Réinitialiser le formulaire
         state.new_description = ""
         state.new_amount = 0.0
+        state.suggested_category = ""
+
+def suggest_category(state) -> None:
+    """Proposer la catégorie donnée par les règles pour la description saisie"""
+    from utils.data_manager import DataManager
+
+    category = DataManager().category_rules().categorize(state.new_description, default="")
+    state.suggested_category = category if category in categories else ""
+    if state.suggested_category:
+        state.new_category = category
+
+def add_rule(state) -> None:
+    """Ajouter une règle de catégorisation (mot-clé ou expression régulière)"""
+    from taipy.gui import notify
+    from utils.data_manager import DataManager
+
+    rules = DataManager().category_rules()
+    add = rules.add_pattern if state.rule_is_pattern else rules.add_keyword
+    if add(state.rule_text, state.rule_category):
+        notify(state, "success", f"Règle ajoutée: « {state.rule_text} » → {state.rule_category}")
+        state.rule_text = ""
+    else:
+        notify(state, "error", "Règle invalide: saisissez un mot-clé ou une expression régulière correcte")
+
+def _notify_budget(state, data_manager, record: Dict[str, Any]) -> None:
+    """Signaler le franchissement de 80 % ou 100 % de la limite de la catégorie, une fois par mois"""
+    from taipy.gui import notify
+
+    crossed = data_manager.check_budget(record)
+    if crossed is None:
+        return
+    threshold, spent, limit = crossed
+    if threshold >= 100:
+        notify(state, "error", f"Budget {record['category']} dépassé: {spent:.2f} / {limit:.2f} {state.total_currency}")
+    else:
+        notify(state, "warning", f"Budget {record['category']} utilisé à {threshold} %: {spent:.2f} / {limit:.2f} {state.total_currency}")
+
+def _refresh_expenses(state, data_manager) -> None:
+    state.expense_total = current_month_total(data_manager)
+    state.total_currency = data_manager.display_currency()
+    state.expenses_df = get_expenses_df(filtered_frame(state, data_manager))
+
+def apply_filters(state) -> None:
+    """Filtrer le tableau à chaque saisie, via l'index plein texte et les colonnes typées"""
+    from utils.data_manager import DataManager
+
+    state.expenses_df = get_expenses_df(filtered_frame(state, DataManager()))
+
+def update_expense(state) -> None:
+    """Remplacer la dépense sélectionnée par les valeurs du formulaire"""
+    from taipy.gui import notify
+    from utils.data_manager import DataManager
+
+    if not (state.new_description and state.new_amount > 0):
+        notify(state, "warning", "Renseignez la description et le montant")
+        return
+    data_manager = DataManager()
+    changes: Dict[str, Any] = {
+        "category": state.new_category,
+        "description": state.new_description,
+        "amount": state.new_amount,
+        "date": state.new_date,
+        "currency": state.new_currency
+    }
+    if data_manager.update_record("expenses", int(state.selected_id), changes):
+        # Catégorie des règles corrigée sur une dépense existante: retenue pour ce commerçant
+        data_manager.category_rules().learn(state.new_description, state.new_category)
+        _refresh_expenses(state, data_manager)
+        notify(state, "success", f"Dépense {int(state.selected_id)} modifiée")
+    else:
+        notify(state, "error", f"Aucune dépense avec l'ID {int(state.selected_id)}")
+
+def delete_expense(state) -> None:
+    """Supprimer la dépense sélectionnée"""
+    from taipy.gui import notify
+    from utils.data_manager import DataManager
+
+    data_manager = DataManager()
+    if data_manager.delete_record("expenses", int(state.selected_id)):
+        _refresh_expenses(state, data_manager)
+        notify(state, "success", f"Dépense {int(state.selected_id)} supprimée")
+    else:
+        notify(state, "error", f"Aucune dépense avec l'ID {int(state.selected_id)}")
@@ -4,31 +4,71 @@ Page Revenus - Gérer les sources de revenus
 from taipy.gui import Markdown
 from typing import List, Dict, Any
 from datetime import datetime
+import numpy as np
 import pandas as pd
+from utils.columnar_store import records_to_frame
+from utils.currency import SUPPORTED_CURRENCIES
+from utils.date_index import month_bounds
 
-income_records: List[Dict[str, Any]] = []
+# Total du mois en cours, lu dans l'index des dates de DataManager.record_store
+income_total: float = 0.0
+total_currency: str = "EUR"
+
+def current_month_total(data_manager) -> float:
+    """Total du mois en cours dans la devise des paramètres, sans parcourir l'historique"""
+    total, _ = data_manager.range_total("income", *month_bounds())
+    return total * data_manager.display_factor()
 
 new_source: str = ""
 new_amount: float = 0.0
 new_date: str = datetime.now().strftime("%Y-%m-%d")
 new_recurring: bool = False
+# Devise d'origine du montant saisi, celle des paramètres par défaut
+currencies: List[str] = list(SUPPORTED_CURRENCIES)
+new_currency: str = currencies[0]
+# Saisie identique à une opération enregistrée, en attente de confirmation
+duplicate_pending: str = ""
+# Identifiant du revenu à modifier ou supprimer
+selected_id: int = 0
+
+# Recherche dans les sources et filtre des dates du tableau (vides: aucun filtre)
+search_query: str = ""
+filter_start: str = ""
+filter_end: str = ""
+
+# Colonnes des enregistrements et libellés affichés dans le tableau
+INCOME_COLUMNS: Dict[str, str] = {
+    "id": "ID",
+    "source": "Source",
+    "amount": "Montant",
+    "date": "Date",
+    "currency": "Devise",
+    "recurring": "Récurrent",
+}
+
+income_table_columns: Dict[str, Dict[str, Any]] = {
+    "ID": {"index": 0},
+    "Source": {"index": 1},
+    "Montant": {"index": 2, "format": "%.2f"},
+    "Date": {"index": 3, "format": "yyyy-MM-dd"},
+    "Devise": {"index": 4},
+    "Récurrent": {"index": 5},
+}
 
 def get_income_df(records):
-    """Convert income records to DataFrame"""
-    if not records:
-        return pd.DataFrame(columns=["ID", "Source", "Montant", "Date", "Récurrent"])
-    return pd.DataFrame([
-        {
-            "ID": r["id"],
-            "Source": r["source"],
-            "Montant": f"{r['amount']:.2f}",
-            "Date": r["date"],
-            "Récurrent": "Oui" if r["recurring"] else "Non"
-        }
-        for r in records
-    ])
+    """Convert income records (list or DataManager.load_frame result) to DataFrame"""
+    frame = records if isinstance(records, pd.DataFrame) else records_to_frame(records)
+    if frame.empty:
+        return pd.DataFrame(columns=list(INCOME_COLUMNS.values()))
+    df = frame.reindex(columns=list(INCOME_COLUMNS)).rename(columns=INCOME_COLUMNS)
+    df["Récurrent"] = np.where(df["Récurrent"].fillna(False).astype(bool), "Oui", "Non")
+    return df
+
+income_df = get_income_df([])
 
-income_df = get_income_df(income_records)
+def filtered_frame(state, data_manager):
+    """Revenus correspondant à la recherche et aux dates choisies"""
+    return data_manager.search_frame("income", state.search_query, None, state.filter_start, state.filter_end)
 
 page = Markdown("""
 <|container|
@@ -45,7 +85,7 @@ page = Markdown("""
 
 ## Ajouter un Nouveau Revenu
 
-<|layout|columns=1 1 1 1|gap=1rem|
+<|layout|columns=1 1 1 1 1|gap=1rem|
 <|part|
 **Source**
 <|{new_source}|input|>
@@ -62,16 +102,48 @@ page = Markdown("""
 **Récurrent**
 <|{new_recurring}|toggle|>
 |>
+<|part|
+**Devise**
+<|{new_currency}|selector|lov={currencies}|dropdown|>
+|>
 |>
 
 <|{None}|button|label=Ajouter un Revenu|on_action=add_income|class_name=add-button|>
 
 ## Enregistrements de Revenus
 
-<|{income_df}|table|>
+<|layout|columns=2 1 1|gap=1rem|
+<|part|
+**Rechercher**
+<|{search_query}|input|on_change=apply_filters|>
+|>
+<|part|
+**Du (AAAA-MM-JJ)**
+<|{filter_start}|input|on_change=apply_filters|>
+|>
+<|part|
+**Au (AAAA-MM-JJ)**
+<|{filter_end}|input|on_change=apply_filters|>
+|>
+|>
+
+<|{income_df}|table|columns={income_table_columns}|>
+
+<|layout|columns=1 auto auto|gap=1rem|
+<|part|
+**ID du revenu**
+<|{selected_id}|number|>
+|>
+<|part|
+<|{None}|button|label=✏️ Modifier|on_action=update_income|class_name=edit-button|>
+|>
+<|part|
+<|{None}|button|label=🗑️ Supprimer|on_action=delete_income|class_name=delete-button|>
+|>
+|>
 
 ## Revenu Total Ce Mois
-### {sum(record['amount'] for record in income_records):.2f}
+### {income_total:.2f} {total_currency}
 
 |>
 
@@ -90,6 +162,18 @@ page = Markdown("""
     padding: 0.75rem 1.5rem;
     border-radius: 0.5rem;
 }
+.edit-button {
+    margin-top: 1.5rem;
+    background-color: #F59E0B;
+    color: white;
+    border-radius: 0.5rem;
+}
+.delete-button {
+    margin-top: 1.5rem;
+    background-color: #6B7280;
+    color: white;
+    border-radius: 0.5rem;
+}
 </style>
 """)
 
@@ -103,24 +187,77 @@ def go_to_dashboard(state) -> None:
 
 def add_income(state) -> None:
     """Ajouter un nouvel enregistrement de revenu"""
+    from taipy.gui import notify
     from utils.data_manager import DataManager
     
     if state.new_source and state.new_amount > 0:
-        new_record: Dict[str, Any] = {
-            "id": len(state.income_records) + 1,
+        data_manager = DataManager()
+        fields: Dict[str, Any] = {
             "source": state.new_source,
             "amount": state.new_amount,
             "date": state.new_date,
-            "recurring": state.new_recurring
+            "recurring": state.new_recurring,
+            "currency": state.new_currency
         }
-        state.income_records.append(new_record)
-        
-        data_manager = DataManager()
-        data_manager.save_data("income", state.income_records)
-        
-        state.income_df = get_income_df(state.income_records)
+        # Deux opérations identiques le même jour peuvent être réelles: la seconde demande confirmation
+        entry = repr(sorted(fields.items()))
+        if data_manager.is_duplicate("income", fields) and state.duplicate_pending != entry:
+            state.duplicate_pending = entry
+            notify(state, "warning", "Ce revenu est déjà enregistré (même date, montant et source). Cliquez de nouveau sur Ajouter pour l'enregistrer quand même")
+            return
+        state.duplicate_pending = ""
+        new_record: Dict[str, Any] = {"id": data_manager.next_id("income"), **fields}
+        if not data_manager.append_data("income", new_record):
+            notify(state, "error", "❌ Erreur lors de l'enregistrement du revenu")
+            return
+        _refresh_income(state, data_manager)
         
         # Réinitialiser le formulaire
         state.new_source = ""
         state.new_amount = 0.0
         state.new_recurring = False
+
+def _refresh_income(state, data_manager) -> None:
+    state.income_total = current_month_total(data_manager)
+    state.total_currency = data_manager.display_currency()
+    state.income_df = get_income_df(filtered_frame(state, data_manager))
+
+def apply_filters(state) -> None:
+    """Filtrer le tableau à chaque saisie, via l'index plein texte et les colonnes typées"""
+    from utils.data_manager import DataManager
+
+    state.income_df = get_income_df(filtered_frame(state, DataManager()))
+
+def update_income(state) -> None:
+    """Remplacer le revenu sélectionné par les valeurs du formulaire"""
+    from taipy.gui import notify
+    from utils.data_manager import DataManager
+
+    if not (state.new_source and state.new_amount > 0):
+        notify(state, "warning", "Renseignez la source et le montant")
+        return
+    data_manager = DataManager()
+    changes: Dict[str, Any] = {
+        "source": state.new_source,
+        "amount": state.new_amount,
+        "date": state.new_date,
+        "recurring": state.new_recurring,
+        "currency": state.new_currency
+    }
+    if data_manager.update_record("income", int(state.selected_id), changes):
+        _refresh_income(state, data_manager)
+        notify(state, "success", f"Revenu {int(state.selected_id)} modifié")
+    else:
+        notify(state, "error", f"Aucun revenu avec l'ID {int(state.selected_id)}")
+
+def delete_income(state) -> None:
+    """Supprimer le revenu sélectionné"""
+    from taipy.gui import notify
+    from utils.data_manager import DataManager
+
+    data_manager = DataManager()
+    if data_manager.delete_record("income", int(state.selected_id)):
+        _refresh_income(state, data_manager)
+        notify(state, "success", f"Revenu {int(state.selected_id)} supprimé")
+    else:
+        notify(state, "error", f"Aucun revenu avec l'ID {int(state.selected_id)}")
@@ -3,18 +3,114 @@ Page Rapports - Consulter les rapports financiers et analyses
 """
 from taipy.gui import Markdown
 from typing import List, Dict, Any
+from utils.currency import CURRENCY_SYMBOLS, missing_rates_message
+from utils.date_index import month_bounds
+from utils.rollup import last_buckets
+
+# Granularités proposées et nombre de périodes affichées
+REPORT_GRAINS: Dict[str, str] = {"Jour": "day", "Semaine": "week", "Mois": "month"}
+REPORT_PERIODS = 6
+
+report_grain: str = "Mois"
+grain_lov: List[str] = list(REPORT_GRAINS)
 
 monthly_summary: Dict[str, List[Any]] = {
-    "Mois": ["Jan", "Fév", "Mar", "Avr", "Mai", "Jun"],
-    "Revenus": [4500, 4800, 5000, 4900, 5200, 5000],
-    "Dépenses": [3200, 3400, 3100, 3300, 3500, 3200],
-    "Épargne": [1300, 1400, 1900, 1600, 1700, 1800]
+    "Période": [],
+    "Revenus": [],
+    "Dépenses": [],
+    "Épargne": []
 }
 
+average_income: float = 0.0
+average_expenses: float = 0.0
+average_savings: float = 0.0
+savings_rate: float = 0.0
+savings_rate_change: float = 0.0
+
+top_categories: Dict[str, List[Any]] = {"Catégorie": [], "Montant": [], "Part (%)": []}
+currency_symbol: str = "€"
+# Devises sans cours de change (vide: tous les cours sont connus)
+rates_warning: str = ""
+
+# Revenus récurrents projetés sur les prochains mois
+projection_summary: Dict[str, List[Any]] = {"Mois": [], "Revenus projetés": []}
+
+# Période libre, du mois en cours par défaut
+period_start, period_end = month_bounds()
+period_income: float = 0.0
+period_expenses: float = 0.0
+period_savings: float = 0.0
+period_count: int = 0
+
+def build_period_report(data_manager, start: str, end: str) -> Dict[str, Any]:
+    """Totaux d'une période quelconque, lus dans les index des dates (O(log N))"""
+    income_total, income_count = data_manager.range_total("income", start, end)
+    expense_total, expense_count = data_manager.range_total("expenses", start, end)
+    factor = data_manager.display_factor()
+    income_total *= factor
+    expense_total *= factor
+    return {
+        "period_income": income_total,
+        "period_expenses": expense_total,
+        "period_savings": income_total - expense_total,
+        "period_count": income_count + expense_count
+    }
+
+def build_report(data_manager, grain: str = "month", periods: int = REPORT_PERIODS) -> Dict[str, Any]:
+    """Calculer les données du rapport à partir des cubes de cumuls
+
+    Chaque valeur est lue dans une cellule du cube: le coût ne dépend pas de
+    la longueur de l'historique.
+    """
+    income_cube = data_manager.rollup("income")
+    expense_cube = data_manager.rollup("expenses")
+    # Les cubes sont en devise de référence: conversion dans la devise des paramètres
+    currency = data_manager.display_currency()
+    factor = data_manager.display_factor(currency)
+    buckets = last_buckets(grain, periods)
+    incomes = [amount * factor for amount in income_cube.series(grain, buckets)]
+    expenses = [amount * factor for amount in expense_cube.series(grain, buckets)]
+    savings = [i - e for i, e in zip(incomes, expenses)]
+
+    def rate(i: float, e: float) -> float:
+        return (i - e) / i * 100 if i > 0 else 0.0
+
+    projected = data_manager.projected_income(REPORT_PERIODS)
+    totals = sorted(expense_cube.category_totals().items(), key=lambda item: item[1], reverse=True)[:5]
+    total_expenses = expense_cube.total()
+    return {
+        "currency_symbol": CURRENCY_SYMBOLS.get(currency, currency),
+        "rates_warning": missing_rates_message(data_manager.missing_rates()),
+        "projection_summary": {
+            "Mois": list(projected),
+            "Revenus projetés": [amount * factor for amount in projected.values()]
+        },
+        "monthly_summary": {
+            "Période": buckets,
+            "Revenus": incomes,
+            "Dépenses": expenses,
+            "Épargne": savings
+        },
+        "average_income": sum(incomes) / periods,
+        "average_expenses": sum(expenses) / periods,
+        "average_savings": sum(savings) / periods,
+        "savings_rate": rate(incomes[-1], expenses[-1]),
+        "savings_rate_change": rate(incomes[-1], expenses[-1]) - rate(incomes[0], expenses[0]),
+        "top_categories": {
+            "Catégorie": [name for name, _ in totals],
+            "Montant": [amount * factor for _, amount in totals],
+            "Part (%)": [amount / total_expenses * 100 if total_expenses else 0.0 for _, amount in totals]
+        }
+    }
+
 page = Markdown("""
 <|container|
 # 📊 Rapports Financiers
 
+<|part|render={rates_warning != ""}|
+⚠️ {rates_warning}
+|>
+
 <|layout|columns=1fr auto|gap=1rem|
 <|part|
 <|button|label=🏠 Accueil|on_action=go_home|class_name=nav-button|>
@@ -24,26 +120,56 @@ page = Markdown("""
 |>
 |>
 
-## Tendances Mensuelles
+## Tendances
 
-<|{monthly_summary}|chart|type=bar|x=Mois|y[1]=Revenus|y[2]=Dépenses|y[3]=Épargne|title=Aperçu Financier sur 6 Mois|>
+<|layout|columns=1fr auto|gap=1rem|
+<|{report_grain}|toggle|lov={grain_lov}|on_change=refresh_report|>
+<|button|label=🔄 Actualiser|on_action=refresh_report|class_name=nav-button|>
+|>
+
+<|{monthly_summary}|chart|type=bar|x=Période|y[1]=Revenus|y[2]=Dépenses|y[3]=Épargne|title=Aperçu Financier sur les 6 Dernières Périodes|>
+
+## Période Personnalisée
+
+<|layout|columns=1 1 1 1 1|gap=1rem|
+<|{period_start}|date|label=Du|on_change=refresh_period|>
+<|{period_end}|date|label=Au|on_change=refresh_period|>
+<|card|
+### Revenus
+**{period_income:.2f} {currency_symbol}**
+|>
+<|card|
+### Dépenses
+**{period_expenses:.2f} {currency_symbol}**
+|>
+<|card|
+### Épargne
+**{period_savings:.2f} {currency_symbol}**
+
+{period_count} opérations
+|>
+|>
+
+## Revenus Récurrents Projetés
+
+<|{projection_summary}|chart|type=bar|x=Mois|y=Revenus projetés|title=Revenus Récurrents des 6 Prochains Mois|>
 
 ## Indicateurs Clés
 
 <|layout|columns=1 1 1|gap=1rem|
 <|card|
-### Revenu Mensuel Moyen
-**4 900,00 €**
+### Revenu Moyen par Période
+**{average_income:.2f} {currency_symbol}**
 |>
 
 <|card|
-### Dépenses Mensuelles Moyennes
-**3 283,33 €**
+### Dépenses Moyennes par Période
+**{average_expenses:.2f} {currency_symbol}**
 |>
 
 <|card|
-### Épargne Mensuelle Moyenne
-**1 616,67 €**
+### Épargne Moyenne par Période
+**{average_savings:.2f} {currency_symbol}**
 |>
 |>
 
@@ -52,17 +178,14 @@ page = Markdown("""
 <|layout|columns=1 1|gap=1rem|
 <|part|
 ### Principales Catégories de Dépenses
-1. Logement: 1 200,00 € (37,5%)
-2. Services: 700,00 € (21,9%)
-3. Alimentation: 600,00 € (18,8%)
-4. Transport: 400,00 € (12,5%)
-5. Divertissement: 300,00 € (9,4%)
+<|{top_categories}|table|format=%.2f|>
 |>
 
 <|part|
 ### Tendance du Taux d'Épargne
-Votre taux d'épargne s'est amélioré de **8%** au cours des 6 derniers mois.
-Taux actuel: **33%**
+Évolution sur les 6 dernières périodes: **{savings_rate_change:+.1f} points**
+
+Taux actuel: **{savings_rate:.1f}%**
 |>
 |>
 
@@ -86,3 +209,20 @@ def go_home(state) -> None:
 def go_to_dashboard(state) -> None:
     from taipy.gui import navigate
     navigate(state, to="dashboard")
+
+def refresh_report(state) -> None:
+    """Recalculer le rapport pour la granularité choisie"""
+    from utils.data_manager import DataManager
+
+    report = build_report(DataManager(), REPORT_GRAINS.get(state.report_grain, "month"))
+    for name, value in report.items():
+        setattr(state, name, value)
+
+def refresh_period(state) -> None:
+    """Recalculer les totaux de la période choisie"""
+    from utils.data_manager import DataManager
+
+    start = str(state.period_start)[:10]
+    end = str(state.period_end)[:10]
+    for name, value in build_period_report(DataManager(), start, end).items():
+        setattr(state, name, value)
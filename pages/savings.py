@@ -10,21 +10,35 @@ savings_goals: List[Dict[str, Any]] = []
 new_goal: str = ""
 new_target: float = 0.0
 new_current: float = 0.0
+# Identifiant de l'objectif à modifier ou supprimer
+selected_id: int = 0
 
-def get_savings_df(records):
-    """Convert savings goals to DataFrame"""
+COLUMNS = ["ID", "Objectif", "Cible", "Actuel", "Progrès (%)", "Atteint vers", "Fourchette (10%-90%)", "Probabilité (%)"]
+
+def get_savings_df(records, forecasts=None):
+    """Convert savings goals to DataFrame, with their forecast completion dates"""
     if not records:
-        return pd.DataFrame(columns=["ID", "Objectif", "Cible", "Actuel", "Progrès (%)"])
-    return pd.DataFrame([
-        {
+        return pd.DataFrame(columns=COLUMNS)
+    by_id = {f["id"]: f for f in forecasts or []}
+    rows = []
+    for r in records:
+        forecast = by_id.get(r["id"], {})
+        progress = forecast.get("progress", r.get("progress", 0.0))
+        rows.append({
             "ID": r["id"],
             "Objectif": r["goal"],
             "Cible": f"{r['target']:.2f}",
             "Actuel": f"{r['current']:.2f}",
-            "Progrès (%)": f"{r['progress']:.1f}%"
-        }
-        for r in records
-    ])
+            "Progrès (%)": f"{progress:.1f}%",
+            "Atteint vers": forecast.get("median") or "—",
+            "Fourchette (10%-90%)": f"{forecast.get('low') or '—'} → {forecast.get('high') or '—'}",
+            "Probabilité (%)": f"{forecast.get('probability', 0.0):.0f}%"
+        })
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+def forecast_savings_df(data_manager, records):
+    """Tableau des objectifs avec leurs dates d'atteinte simulées"""
+    return get_savings_df(records, data_manager.forecast_goals(records))
 
 savings_df = get_savings_df(savings_goals)
 
@@ -64,6 +78,19 @@ page = Markdown("""
 
 <|{savings_df}|table|>
 
+<|layout|columns=1 auto auto|gap=1rem|
+<|part|
+**ID de l'objectif**
+<|{selected_id}|number|>
+|>
+<|part|
+<|{None}|button|label=✏️ Modifier|on_action=update_goal|class_name=edit-button|>
+|>
+<|part|
+<|{None}|button|label=🗑️ Supprimer|on_action=delete_goal|class_name=delete-button|>
+|>
+|>
+
 |>
 
 <style>
@@ -81,6 +108,18 @@ page = Markdown("""
     padding: 0.75rem 1.5rem;
     border-radius: 0.5rem;
 }
+.edit-button {
+    margin-top: 1.5rem;
+    background-color: #F59E0B;
+    color: white;
+    border-radius: 0.5rem;
+}
+.delete-button {
+    margin-top: 1.5rem;
+    background-color: #6B7280;
+    color: white;
+    border-radius: 0.5rem;
+}
 </style>
 """)
 
@@ -92,27 +131,59 @@ def go_to_dashboard(state) -> None:
     from taipy.gui import navigate
     navigate(state, to="dashboard")
 
+def _goal_fields(state) -> Dict[str, Any]:
+    """Champs d'un objectif saisis dans le formulaire, progrès recalculé"""
+    progress: float = (state.new_current / state.new_target * 100) if state.new_target > 0 else 0.0
+    return {
+        "goal": state.new_goal,
+        "target": state.new_target,
+        "current": state.new_current,
+        "progress": progress
+    }
+
 def add_goal(state) -> None:
     """Ajouter un nouvel objectif d'épargne"""
     from utils.data_manager import DataManager
     
     if state.new_goal and state.new_target > 0:
-        progress: float = (state.new_current / state.new_target * 100) if state.new_target > 0 else 0.0
-        new_record: Dict[str, Any] = {
-            "id": len(state.savings_goals) + 1,
-            "goal": state.new_goal,
-            "target": state.new_target,
-            "current": state.new_current,
-            "progress": progress
-        }
+        data_manager = DataManager()
+        new_record: Dict[str, Any] = {"id": data_manager.next_id("savings_goals"), **_goal_fields(state)}
         state.savings_goals.append(new_record)
         
-        data_manager = DataManager()
-        data_manager.save_data("savings_goals", state.savings_goals)
+        data_manager.append_data("savings_goals", new_record)
         
-        state.savings_df = get_savings_df(state.savings_goals)
+        state.savings_df = forecast_savings_df(data_manager, state.savings_goals)
         
         # Réinitialiser le formulaire
         state.new_goal = ""
         state.new_target = 0.0
         state.new_current = 0.0
+
+def update_goal(state) -> None:
+    """Remplacer l'objectif sélectionné par les valeurs du formulaire"""
+    from taipy.gui import notify
+    from utils.data_manager import DataManager
+
+    if not (state.new_goal and state.new_target > 0):
+        notify(state, "warning", "Renseignez le nom et le montant cible")
+        return
+    data_manager = DataManager()
+    if data_manager.update_record("savings_goals", int(state.selected_id), _goal_fields(state)):
+        state.savings_goals = data_manager.load_data("savings_goals")
+        state.savings_df = forecast_savings_df(data_manager, state.savings_goals)
+        notify(state, "success", f"Objectif {int(state.selected_id)} modifié")
+    else:
+        notify(state, "error", f"Aucun objectif avec l'ID {int(state.selected_id)}")
+
+def delete_goal(state) -> None:
+    """Supprimer l'objectif sélectionné"""
+    from taipy.gui import notify
+    from utils.data_manager import DataManager
+
+    data_manager = DataManager()
+    if data_manager.delete_record("savings_goals", int(state.selected_id)):
+        state.savings_goals = data_manager.load_data("savings_goals")
+        state.savings_df = forecast_savings_df(data_manager, state.savings_goals)
+        notify(state, "success", f"Objectif {int(state.selected_id)} supprimé")
+    else:
+        notify(state, "error", f"Aucun objectif avec l'ID {int(state.selected_id)}")
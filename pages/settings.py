@@ -3,23 +3,24 @@ Page Paramètres - Configurer les préférences de l'application
 """
 from taipy.gui import Markdown, notify
 from typing import List
+from utils.currency import SUPPORTED_CURRENCIES, CURRENCY_SYMBOLS
 
 currency: str = "EUR"
-currencies: List[str] = ["EUR", "USD", "GBP", "CAD", "CHF", "FCFA"]
+currencies: List[str] = list(SUPPORTED_CURRENCIES)
 theme: str = "Clair"
 themes: List[str] = ["Clair", "Sombre"]
 notifications: bool = True
 email_reports: bool = False
 user_email: str = "utilisateur@exemple.com"
+# Relevé bancaire (CSV ou OFX) choisi pour l'import et avancement de l'import en cours
+import_path: str = ""
+import_status: str = ""
+# Avancement et bilan de l'export en cours
+export_status: str = ""
+# Sauvegarde: complète la première fois, puis seulement les modifications depuis la précédente
+backup_status: str = ""
 
-currency_symbols = {
-    "EUR": "€",
-    "USD": "$",
-    "GBP": "£",
-    "CAD": "CA$",
-    "CHF": "CHF",
-    "FCFA": "FCFA"
-}
+currency_symbols = CURRENCY_SYMBOLS
 
 page = Markdown("""
 <|container|
@@ -63,15 +64,24 @@ page = Markdown("""
 
 ## Gestion des Données
 
-<|layout|columns=1 1|gap=1rem|
+<|layout|columns=1 1 1|gap=1rem|
 <|part|
 <|{None}|button|label=📤 Exporter les Données|on_action=export_data|class_name=data-button|>
 |>
 <|part|
-<|{None}|button|label=📥 Importer les Données|on_action=import_data|class_name=data-button|>
+<|{None}|button|label=🗂️ Sauvegarde Incrémentale|on_action=backup_data|class_name=data-button|>
+|>
+<|part|
+<|{import_path}|file_selector|label=📥 Importer un Relevé (CSV, OFX)|extensions=.csv,.ofx,.qfx|drop_message=Déposer le relevé ici|on_action=import_data|class_name=data-button|>
 |>
 |>
 
+<|{export_status}|text|>
+
+<|{backup_status}|text|>
+
+<|{import_status}|text|>
+
 |>
 
 <style>
@@ -127,26 +137,95 @@ def save_settings(state) -> None:
         from main import app_state
         app_state.currency = state.currency
         app_state.theme = state.theme
+        # Devise et activation des notifications utilisées par les alertes de budget
+        data_manager.configure_budget_alerts()
         
         notify(state, "success", "✅ Paramètres enregistrés avec succès!")
     else:
         notify(state, "error", "❌ Erreur lors de l'enregistrement des paramètres")
 
 def export_data(state) -> None:
-    """Exporter les données utilisateur"""
+    """Exporter toutes les données en arrière-plan dans une archive compressée, enregistrement par enregistrement"""
+    from taipy.gui import invoke_long_callback
     from utils.data_manager import DataManager
-    import json
-    
-    data_manager = DataManager()
-    all_data = data_manager.export_all_data()
-    
-    export_success = data_manager.save_data("export_backup", all_data)
-    
-    if export_success:
-        notify(state, "success", "✅ Données exportées avec succès dans data/export_backup.json")
+    from utils.exporter import ExportProgress, export_collections
+
+    progress = ExportProgress()
+    state.export_status = "⏳ Export en cours..."
+    invoke_long_callback(
+        state,
+        export_collections,
+        [DataManager(), progress],
+        _export_status,
+        [progress],
+        1000,
+    )
+
+def _export_status(state, status, progress, result=None) -> None:
+    """Afficher l'avancement de l'export, puis l'archive créée"""
+    if isinstance(status, int) and not isinstance(status, bool):
+        state.export_status = f"⏳ {progress.percent:.0f} % - {progress.records} enregistrements ({progress.collection})"
+    elif status and progress.error is None:
+        state.export_status = f"✅ {progress.records} enregistrements exportés dans {progress.path}"
+        notify(state, "success", f"✅ Données exportées avec succès dans {progress.path}")
     else:
-        notify(state, "error", "❌ Erreur lors de l'export des données")
+        state.export_status = "❌ Export interrompu"
+        notify(state, "error", f"❌ Erreur lors de l'export des données: {progress.error}")
+
+def backup_data(state) -> None:
+    """Sauvegarder en arrière-plan les enregistrements modifiés depuis la dernière sauvegarde"""
+    from taipy.gui import invoke_long_callback
+    from utils.backup import backup
+    from utils.data_manager import DataManager
+    from utils.exporter import ExportProgress
+
+    progress = ExportProgress()
+    state.backup_status = "⏳ Sauvegarde en cours..."
+    invoke_long_callback(state, backup, [DataManager(), False, progress], _backup_status, [progress], 1000)
+
+def _backup_status(state, status, progress, result=None) -> None:
+    """Afficher l'avancement de la sauvegarde, puis l'archive créée"""
+    if isinstance(status, int) and not isinstance(status, bool):
+        state.backup_status = f"⏳ {progress.percent:.0f} % - {progress.records} enregistrements ({progress.collection})"
+    elif status and progress.error is None:
+        if progress.path is None:
+            state.backup_status = "✅ Aucune modification depuis la dernière sauvegarde"
+        else:
+            state.backup_status = f"✅ {progress.records} enregistrements sauvegardés dans {progress.path}"
+            notify(state, "success", f"✅ Sauvegarde enregistrée dans {progress.path}")
+    else:
+        state.backup_status = "❌ Sauvegarde interrompue"
+        notify(state, "error", f"❌ Erreur lors de la sauvegarde: {progress.error}")
 
 def import_data(state) -> None:
-    """Importer les données utilisateur"""
-    notify(state, "info", "ℹ️ Fonctionnalité d'import en cours de développement")
+    """Importer un relevé bancaire en arrière-plan, par lots, sans bloquer les autres sessions"""
+    from taipy.gui import invoke_long_callback
+    from utils.data_manager import DataManager
+    from utils.importer import ImportProgress, import_statement
+
+    if not state.import_path:
+        notify(state, "warning", "Choisissez un relevé CSV ou OFX")
+        return
+    progress = ImportProgress()
+    state.import_status = "⏳ Import en cours..."
+    invoke_long_callback(
+        state,
+        import_statement,
+        [DataManager(), state.import_path, progress, state.currency],
+        _import_status,
+        [progress],
+        1000,
+    )
+
+def _import_status(state, status, progress, result=None) -> None:
+    """Afficher l'avancement de l'import, puis son bilan"""
+    summary = (f"{progress.rows} lignes lues: {progress.expenses} dépenses, {progress.income} revenus, "
+               f"{progress.duplicates} doublons et {progress.rejected} lignes invalides ignorés")
+    if isinstance(status, int) and not isinstance(status, bool):
+        state.import_status = f"⏳ {progress.percent:.0f} % - {summary}"
+    elif status and progress.error is None:
+        state.import_status = f"✅ {summary}"
+        notify(state, "success", f"✅ Relevé importé: {summary}")
+    else:
+        state.import_status = f"❌ Import interrompu - {summary}"
+        notify(state, "error", f"❌ Erreur lors de l'import: {progress.error}")
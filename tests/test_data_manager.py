@@ -0,0 +1,756 @@
+"""
+Tests du stockage des données budgétaires.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import journal
+from utils.data_manager import DataManager
+
+
+def test_journal_append_and_replay(tmp_path):
+    """Teste que les ajouts en mode journal sont relus par load_data."""
+    (tmp_path / "expenses.json").write_text(json.dumps([{"id": 1, "amount": 10.0}]), encoding="utf-8")
+    dm = DataManager(str(tmp_path), journal_collections=["expenses"])
+
+    assert dm.append_data("expenses", {"id": 2, "amount": 5.0})
+    assert dm.append_data("expenses", {"id": 3, "amount": 2.5})
+
+    assert [r["id"] for r in dm.load_data("expenses")] == [1, 2, 3]
+    # Le fichier existant n'est pas réécrit à chaque ajout
+    assert len(json.loads((tmp_path / "expenses.json").read_text(encoding="utf-8"))) == 1
+
+
+def test_journal_compaction(tmp_path, monkeypatch):
+    """Teste que le compactage intègre le journal dans le snapshot."""
+    monkeypatch.setattr(journal, "COMPACT_THRESHOLD", 10**9)
+    dm = DataManager(str(tmp_path), journal_collections=["income"])
+    for i in range(5):
+        dm.append_data("income", {"id": i + 1, "amount": 100.0})
+
+    journal.CollectionJournal.for_path(tmp_path / "income.json").compact()
+
+    assert not (tmp_path / "income.journal.jsonl").exists()
+    assert len(dm.load_data("income")) == 5
+
+
+def test_read_cache_hits_and_invalidation(tmp_path):
+    """Teste que les relectures sont servies par le cache et invalidées par save_data."""
+    dm = DataManager(str(tmp_path))
+    dm.save_data("expenses", [{"id": 1, "amount": 10.0}])
+    before = DataManager.cache_stats()
+
+    first = dm.load_data("expenses")
+    first[0]["amount"] = 999.0  # une modification de l'appelant ne pollue pas le cache
+    second = dm.load_data("expenses")
+    assert second[0]["amount"] == 10.0
+    assert DataManager.cache_stats()["hits"] == before["hits"] + 1
+
+    dm.save_data("expenses", [{"id": 1, "amount": 20.0}])
+    assert dm.load_data("expenses")[0]["amount"] == 20.0
+
+
+def test_sqlite_backend_and_migration(tmp_path):
+    """Teste la migration des fichiers JSON vers SQLite et les agrégats indexés."""
+    from utils.sqlite_backend import migrate_json_to_sqlite
+
+    json_dm = DataManager(str(tmp_path), backend="json")
+    json_dm.save_data("expenses", [
+        {"id": 1, "category": "Transport", "amount": 40.0, "date": "2026-10-01"},
+        {"id": 2, "category": "Alimentation", "amount": 60.0, "date": "2026-10-02"},
+    ])
+    json_dm.save_data("settings", {"currency": "EUR"})
+
+    assert migrate_json_to_sqlite(str(tmp_path)) == {"expenses": 2, "settings": 1}
+
+    dm = DataManager(str(tmp_path), backend="sqlite")
+    dm.append_data("expenses", {"id": 3, "category": "Transport", "amount": 10.0, "date": "2026-10-03"})
+    assert [r["id"] for r in dm.load_data("expenses")] == [1, 2, 3]
+    assert dm.total_amount("expenses") == 110.0
+    assert dm.category_totals("expenses") == {"Transport": 50.0, "Alimentation": 60.0}
+    assert dm.load_data("settings") == [{"currency": "EUR"}]
+
+    # Sans catégorie: compté avec "Autre", en un seul groupe
+    dm.append_data("expenses", {"id": 4, "amount": 1.0, "date": "2026-10-04"})
+    dm.append_data("expenses", {"id": 5, "category": "Autre", "amount": 2.0, "date": "2026-10-05"})
+    assert dm.sqlite.category_totals("expenses") == {"Transport": 50.0, "Alimentation": 60.0, "Autre": 3.0}
+    assert dm.sqlite.total_amount("expenses", "Autre") == 3.0
+
+
+def test_columnar_snapshot_with_journal_tail(tmp_path):
+    """Teste la lecture de l'instantané Arrow complété par les ajouts du journal."""
+    dm = DataManager(str(tmp_path), journal_collections=["expenses"], columnar_collections=["expenses"])
+    dm.save_data("expenses", [
+        {"id": 1, "category": "Transport", "description": "Bus", "amount": 2.5, "date": "2026-10-01"},
+    ])
+    # Instantané écrit à la lecture, pas à chaque sauvegarde
+    assert not (tmp_path / "expenses.arrow").exists()
+    dm.append_data("expenses", {"id": 2, "category": "Transport", "description": "Taxi", "amount": 20.0, "date": "2026-10-02"})
+
+    frame = dm.load_frame("expenses")
+    assert list(frame["id"]) == [1, 2]
+    assert str(frame["date"].dtype).startswith("datetime64")
+    assert dm.category_totals("expenses") == {"Transport": 22.5}
+
+
+def test_write_behind_coalesces_and_flushes(tmp_path):
+    """Teste que les sauvegardes différées sont regroupées, lisibles et écrites par flush."""
+    dm = DataManager(str(tmp_path), write_behind=True)
+    dm.save_data("expenses", [{"id": 1, "amount": 1.0}])
+    dm.append_data("expenses", {"id": 2, "amount": 2.0})
+
+    assert [r["id"] for r in dm.load_data("expenses")] == [1, 2]
+
+    DataManager.flush()
+    on_disk = json.loads((tmp_path / "expenses.json").read_text(encoding="utf-8"))
+    assert [r["id"] for r in on_disk] == [1, 2]
+    assert not (tmp_path / "expenses.json.tmp").exists()
+
+    # Colonnes typées et cumuls gardés après l'écriture en arrière-plan, sans reconstruction
+    store, cube = dm.record_store("expenses"), dm.rollup("expenses")
+    dm.append_data("expenses", {"id": 4, "amount": 4.0})
+    DataManager.flush()
+    assert dm.record_store("expenses") is store and dm.rollup("expenses") is cube
+    assert store.get(4)["amount"] == 4.0
+
+    # Écriture en échec: signalée par flush, gardée en file et réécrite ensuite
+    from utils.write_behind import WriteBehindError
+
+    write_files = dm._write_files
+    dm._write_files = lambda filename, data: False
+    dm.append_data("expenses", {"id": 3, "amount": 3.0})
+    with pytest.raises(WriteBehindError):
+        DataManager.flush()
+    assert [r["id"] for r in dm.load_data("expenses")] == [1, 2, 4, 3]
+    dm._write_files = write_files
+    DataManager.flush()
+    on_disk = json.loads((tmp_path / "expenses.json").read_text(encoding="utf-8"))
+    assert [r["id"] for r in on_disk] == [1, 2, 4, 3]
+
+
+def test_write_behind_keeps_appends_made_during_a_write(tmp_path, monkeypatch):
+    """Teste qu'un ajout fait pendant l'écriture d'une sauvegarde différée n'est pas écrasé par elle."""
+    import threading
+
+    started, release = threading.Event(), threading.Event()
+    rewrite = journal.CollectionJournal.rewrite
+
+    def slow_rewrite(self, data):
+        started.set()
+        release.wait(5)
+        return rewrite(self, data)
+
+    monkeypatch.setattr(journal.CollectionJournal, "rewrite", slow_rewrite)
+    dm = DataManager(str(tmp_path), journal_collections=["income"], write_behind=True)
+    dm.save_data("income", [{"id": 1, "amount": 1.0}])
+    assert started.wait(5)
+    dm.append_data("income", {"id": 2, "amount": 2.0})
+    dm.extend_data("income", [{"id": 3, "amount": 3.0}])
+    release.set()
+    DataManager.flush()
+
+    reloaded = DataManager(str(tmp_path), journal_collections=["income"])
+    assert [r["id"] for r in reloaded.load_data("income")] == [1, 2, 3]
+
+
+def test_iter_records_streams_large_file(tmp_path):
+    """Teste la lecture en flux d'un fichier plus grand qu'un bloc de lecture."""
+    from utils.json_stream import iter_json_records
+
+    records = [{"id": i, "category": "Autre", "amount": 1.5, "description": "x" * 50} for i in range(2000)]
+    (tmp_path / "expenses.json").write_text(json.dumps(records + [42], indent=2), encoding="utf-8")
+
+    streamed = list(iter_json_records(tmp_path / "expenses.json", chunk_size=256))
+    assert streamed == records
+    assert DataManager(str(tmp_path)).total_amount("expenses") == 3000.0
+
+
+def test_partitioned_layout_prunes_range_reads(tmp_path):
+    """Teste la migration vers les partitions mensuelles et l'élagage des lectures par période."""
+    from utils.partitioned_store import PartitionedCollection, migrate_to_partitions
+
+    DataManager(str(tmp_path)).save_data("expenses", [
+        {"id": 1, "amount": 10.0, "date": "2026-09-15"},
+        {"id": 2, "amount": 20.0, "date": "2026-10-02"},
+    ])
+    assert migrate_to_partitions(str(tmp_path), "expenses") == 2
+
+    dm = DataManager(str(tmp_path), partitioned_collections=["expenses"])
+    dm.append_data("expenses", {"id": 3, "amount": 5.0, "date": "2026-10-20"})
+
+    store = PartitionedCollection.for_path(tmp_path / "expenses")
+    assert store.partitions_between("2026-10-01", "2026-10-31") == ["2026-10"]
+    assert [r["id"] for r in dm.load_range("expenses", "2026-10-01", "2026-10-31")] == [2, 3]
+    assert [r["id"] for r in dm.load_data("expenses")] == [1, 2, 3]
+
+    # Modification et suppression: seul le fichier du mois de l'enregistrement est réécrit
+    september = (tmp_path / "expenses" / "2026-09.json").stat().st_mtime_ns
+    assert dm.update_record("expenses", 2, {"amount": 25.0})
+    assert dm.update_record("expenses", 3, {"date": "2026-11-05"})
+    assert (tmp_path / "expenses" / "2026-09.json").stat().st_mtime_ns == september
+    assert dm.load_range("expenses", "2026-11-01", "2026-11-30")[0]["id"] == 3
+    assert dm.delete_record("expenses", 3)
+    assert not (tmp_path / "expenses" / "2026-11.json").exists()
+    assert sorted(store.manifest()) == ["2026-09", "2026-10"]
+    assert dm.total_amount("expenses") == 35.0
+
+
+def test_fast_codec_is_compact_strict_and_compatible(tmp_path, monkeypatch):
+    """Teste que le codec rapide relit l'ancien format et refuse les types inconnus."""
+    from utils import codec
+
+    legacy = DataManager(str(tmp_path))
+    legacy.save_data("income", [{"id": 1, "amount": 100.0}])
+
+    monkeypatch.setattr(codec, "CODEC", "fast")
+    dm = DataManager(str(tmp_path))
+    assert dm.load_data("income") == [{"id": 1, "amount": 100.0}]
+    assert dm.append_data("income", {"id": 2, "amount": 50.0})
+    assert b"\n" not in (tmp_path / "income.json").read_bytes()
+    assert not dm.save_data("income", [{"id": 3, "amount": object()}])
+
+
+def test_record_store_round_trip_and_incremental_update(tmp_path):
+    """Teste les colonnes typées: conversion JSON, agrégats et mise à jour par append_data."""
+    from utils.record_store import RecordStore
+
+    records = [
+        {"id": 1, "category": "Transport", "description": "Bus", "amount": 2.5, "date": "2026-10-01"},
+        {"id": 2, "category": "Alimentation", "description": "Marché", "amount": 30.0, "date": "2026-10-02"},
+    ]
+    assert RecordStore.for_collection("expenses", records).to_records() == records
+
+    dm = DataManager(str(tmp_path))
+    dm.save_data("expenses", records)
+    store = dm.record_store("expenses")
+    dm.append_data("expenses", {"id": 3, "category": "Transport", "description": "Bus", "amount": 2.5, "date": "2026-10-03"})
+
+    assert dm.record_store("expenses") is store
+    assert len(store) == 3 and len(store.texts) == 2
+    assert dm.category_totals("expenses") == {"Transport": 5.0, "Alimentation": 30.0}
+
+    # Forme d'origine gardée: montant entier, date avec l'heure, champ booléen absent
+    legacy = {"id": 1, "source": "Salaire", "amount": 2000, "date": "2026-10-01T09:30:00"}
+    assert RecordStore.for_collection("income", [legacy]).to_records() == [legacy]
+    dm.save_data("income", [legacy, {"id": 2, "source": "Prime", "amount": 150, "date": "2026-10-15"}])
+    assert dm.update_record("income", 2, {"amount": 200})
+    assert dm.load_data("income") == [legacy, {"id": 2, "source": "Prime", "amount": 200, "date": "2026-10-15"}]
+
+
+def test_update_delete_by_id(tmp_path):
+    """Teste la modification et la suppression par ID, et que les ID ne sont pas réutilisés."""
+    dm = DataManager(str(tmp_path), journal_collections=["expenses"])
+    for _ in range(3):
+        dm.append_data("expenses", {"id": dm.next_id("expenses"), "category": "Transport", "amount": 10.0})
+    assert dm.total_amount("expenses") == 30.0
+
+    assert dm.update_record("expenses", 2, {"amount": 25.0})
+    assert dm.delete_record("expenses", 1)
+    assert not dm.delete_record("expenses", 1)
+
+    assert dm.total_amount("expenses") == 35.0
+    assert [(r["id"], r["amount"]) for r in dm.load_data("expenses")] == [(2, 25.0), (3, 10.0)]
+    assert dm.get_record("expenses", 2)["category"] == "Transport"
+    # Relu depuis le journal, sans le cache des colonnes typées
+    assert [r["id"] for r in DataManager(str(tmp_path), journal_collections=["expenses"]).iter_records("expenses")] == [2, 3]
+    assert dm.next_id("expenses") == 4
+
+    # Redémarrage: le compteur est relu dans data/id_counters.json, l'ID 3 supprimé n'est pas redonné
+    from utils.id_index import COUNTERS_NAME, IdAllocator
+
+    assert dm.delete_record("expenses", 3)
+    restarted = IdAllocator(tmp_path / COUNTERS_NAME)
+    assert restarted.next_id("expenses", lambda: dm.iter_records("expenses")) == 5
+
+    # Collections sans colonnes typées: même recherche par index id -> position
+    dm.save_data("budget_categories", [{"id": i, "name": f"Catégorie {i}", "limit": 100.0} for i in range(1, 6)])
+    assert dm.get_record("budget_categories", 4)["name"] == "Catégorie 4"
+    assert dm.update_record("budget_categories", 4, {"limit": 250.0})
+    assert dm.get_record("budget_categories", 4)["limit"] == 250.0
+    assert dm.delete_record("budget_categories", 2)
+    assert dm.get_record("budget_categories", 2) is None
+    assert dm.get_record("budget_categories", 5)["name"] == "Catégorie 5"
+
+
+def test_running_totals(tmp_path):
+    """Teste que les totaux par catégorie et par mois suivent ajouts, modifications et suppressions."""
+    dm = DataManager(str(tmp_path))
+    dm.save_data("expenses", [
+        {"id": 1, "category": "Transport", "amount": 10.0, "date": "2026-01-05"},
+        {"id": 2, "amount": 4.0, "date": "2026-02-01"},
+    ])
+    totals = dm.aggregates("expenses")
+    assert totals.by_category == {"Transport": 10.0, "Autre": 4.0}
+    assert totals.by_month == {"2026-01": 10.0, "2026-02": 4.0}
+
+    dm.append_data("expenses", {"id": 3, "category": "Transport", "amount": 5.0, "date": "2026-02-10"})
+    dm.update_record("expenses", 1, {"category": "Santé"})
+    dm.delete_record("expenses", 2)
+
+    totals = dm.aggregates("expenses")
+    assert totals.total == 15.0
+    assert totals.by_category == {"Transport": 5.0, "Santé": 10.0}
+    assert totals.by_month == {"2026-01": 10.0, "2026-02": 5.0}
+
+
+def test_analytics_category_budget():
+    """Teste les agrégations vectorisées et la jointure catégories/limites."""
+    from utils import analytics
+    from utils.columnar_store import records_to_frame
+
+    frame = records_to_frame([
+        {"id": 1, "category": "Transport", "amount": 30.0, "date": "2026-01-05"},
+        {"id": 2, "amount": 5.0, "date": "2026-02-01"},
+        {"id": 3, "category": "Transport", "amount": 10.0},
+    ])
+    assert analytics.total(frame) == 45.0
+    assert analytics.category_totals(frame) == {"Transport": 40.0, "Autre": 5.0}
+    assert analytics.month_totals(frame) == {"2026-01": 30.0, "2026-02": 5.0}
+
+    budget = analytics.category_budget(
+        [{"name": "Transport", "limit": 80.0}, {"name": "Santé", "limit": 0.0}], {"Transport": 40.0}
+    )
+    assert budget["spent"].tolist() == [40.0, 0.0]
+    assert budget["remaining"].tolist() == [40.0, 0.0]
+    assert budget["used_pct"].tolist() == [50.0, 0.0]
+
+
+def test_rollup_cube_persisted_and_incremental(tmp_path, monkeypatch):
+    """Teste que le cube de cumuls suit les ajouts et est relu depuis le disque au redémarrage."""
+    from utils import data_manager
+    from utils.rollup import RollupCube
+
+    dm = DataManager(str(tmp_path))
+    dm.save_data("expenses", [{"id": 1, "category": "Transport", "amount": 10.0, "date": "2026-01-05"}])
+    assert dm.rollup("expenses").total("month", "2026-01") == 10.0
+
+    dm.append_data("expenses", {"id": 2, "category": "Santé", "amount": 5.0, "date": "2026-01-06"})
+    dm.delete_record("expenses", 1)
+    cube = dm.rollup("expenses")
+    assert cube.total("month", "2026-01") == 5.0
+    assert cube.total("week", "2026-W02") == 5.0
+    assert cube.category_totals() == {"Santé": 5.0}
+
+    DataManager.flush()
+    monkeypatch.setattr(data_manager, "_rollups", {})
+    monkeypatch.setattr(RollupCube, "from_records", None)
+    assert DataManager(str(tmp_path)).rollup("expenses").total("day", "2026-01-06") == 5.0
+
+
+def test_range_total_date_index(tmp_path):
+    """Teste les totaux par période via l'index trié des dates, y compris après des ajouts."""
+    dm = DataManager(str(tmp_path))
+    dm.save_data("income", [
+        {"id": 1, "amount": 100.0, "date": "2026-03-15"},
+        {"id": 2, "amount": 50.0, "date": "2026-01-10"},
+        {"id": 3, "amount": 7.0},
+    ])
+    assert dm.range_total("income", "2026-01-01", "2026-01-31") == (50.0, 1)
+    assert dm.range_total("income") == (150.0, 2)
+
+    dm.append_data("income", {"id": 4, "amount": 20.0, "date": "2026-03-31"})
+    dm.append_data("income", {"id": 5, "amount": 30.0, "date": "2026-02-01"})
+    assert dm.range_total("income", "2026-02-01", "2026-03-31") == (150.0, 3)
+    dm.delete_record("income", 1)
+    assert dm.range_total("income", "2026-03-01", None) == (20.0, 1)
+
+
+def test_currency_conversion(tmp_path):
+    """Teste la conversion des montants selon le cours de leur date, en masse et à l'ajout."""
+    (tmp_path / "exchange_rates.json").write_text(json.dumps({"base": "EUR", "rates": {
+        "2026-01-01": {"USD": 2.0},
+        "2026-02-01": {"USD": 4.0, "GBP": 0.5},
+    }}), encoding="utf-8")
+    dm = DataManager(str(tmp_path))
+    dm.save_data("expenses", [
+        {"id": 1, "category": "Transport", "amount": 10.0, "date": "2026-01-15", "currency": "USD"},
+        {"id": 2, "category": "Transport", "amount": 10.0, "date": "2026-02-15", "currency": "USD"},
+        {"id": 3, "category": "Santé", "amount": 10.0, "date": "2026-02-15"},
+    ])
+    assert dm.total_amount("expenses") == 5.0 + 2.5 + 10.0
+    dm.append_data("expenses", {"id": 4, "category": "Santé", "amount": 1.0, "date": "2026-03-01", "currency": "GBP"})
+    assert dm.category_totals("expenses") == {"Transport": 7.5, "Santé": 12.0}
+    assert dm.range_total("expenses", "2026-02-01", "2026-02-28") == (12.5, 2)
+    assert dm.rollup("expenses").total("month", "2026-01") == 5.0
+    # Les enregistrements gardent leur montant et leur devise d'origine
+    assert dm.get_record("expenses", 4)["currency"] == "GBP"
+    assert dm.display_factor("USD") == 4.0
+    assert dm.missing_rates() == []
+
+    # Anciens enregistrements sans devise: saisis dans celle des paramètres; sans fichier de cours, rien n'est inventé
+    legacy = DataManager(str(tmp_path / "legacy"))
+    legacy.save_data("settings", {"currency": "FCFA"})
+    legacy.save_data("income", [{"id": 1, "source": "Salaire", "amount": 500000.0, "date": "2026-01-31"}])
+    assert legacy.stamp_legacy_currency() == {"income": 1}
+    assert legacy.get_record("income", 1)["currency"] == "FCFA"
+    assert legacy.stamp_legacy_currency() == {}
+    assert legacy.missing_rates() == ["FCFA"]
+    assert not (tmp_path / "legacy" / "exchange_rates.json").exists()
+
+
+def test_recurring_income_projection(tmp_path):
+    """Teste la projection des revenus récurrents: une source par libellé, à partir du mois suivant."""
+    from datetime import date
+
+    dm = DataManager(str(tmp_path))
+    dm.save_data("income", [
+        {"id": 1, "source": "Salaire", "amount": 2000.0, "date": "2026-08-31", "recurring": True},
+        {"id": 2, "source": "Salaire", "amount": 2100.0, "date": "2026-09-30", "recurring": True},
+        {"id": 3, "source": "Prime", "amount": 500.0, "date": "2026-09-15"},
+        {"id": 4, "source": "Loyer perçu", "amount": 300.0, "date": "2026-12-01", "recurring": True},
+    ])
+    today = date(2026, 10, 18)
+    assert dm.projected_income(3, today) == {"2026-11": 2100.0, "2026-12": 2100.0, "2027-01": 2400.0}
+
+    occurrences = list(dm.iter_projected_income(3, today))
+    assert [(o["source"], o["date"]) for o in occurrences] == [
+        ("Salaire", "2026-11-30"), ("Salaire", "2026-12-30"), ("Salaire", "2027-01-30"),
+        ("Loyer perçu", "2027-01-01"),
+    ]
+    assert len(dm.load_data("income")) == 4
+
+
+def test_savings_goal_forecast(tmp_path):
+    """Teste la prévision des objectifs: épargne régulière répartie, objectif atteint, cache."""
+    from datetime import date
+
+    dm = DataManager(str(tmp_path))
+    dm.save_data("income", [
+        {"id": i, "source": "Salaire", "amount": 1000.0, "date": f"2026-{m:02d}-01"} for i, m in enumerate(range(1, 10), 1)
+    ])
+    dm.save_data("expenses", [
+        {"id": i, "category": "Loyer", "amount": 800.0, "date": f"2026-{m:02d}-05"} for i, m in enumerate(range(1, 10), 1)
+    ])
+    goals = [
+        {"id": 1, "goal": "Vacances", "target": 1000.0, "current": 0.0},
+        {"id": 2, "goal": "Vélo", "target": 300.0, "current": 300.0},
+        {"id": 3, "goal": "Maison", "target": 10 ** 9, "current": 0.0},
+    ]
+    today = date(2026, 10, 18)
+    forecasts = dm.forecast_goals(goals, paths=200, today=today)
+    # 200 € d'épargne par mois, partagés entre 3 objectifs: 1000 € en 15 mois
+    assert forecasts[0]["median"] == "2028-01"
+    assert forecasts[0]["probability"] == 100.0
+    assert forecasts[1]["median"] == "2026-10" and forecasts[1]["progress"] == 100.0
+    assert forecasts[2]["median"] is None and forecasts[2]["probability"] == 0.0
+    assert dm.forecast_goals(goals, paths=200, today=today) is forecasts
+
+
+def test_budget_alerts_once_per_month(tmp_path):
+    """Teste les alertes de budget: 80 % puis 100 %, chaque seuil une seule fois par mois."""
+    from datetime import date
+
+    dm = DataManager(str(tmp_path))
+    dm.configure_budget_alerts([{"name": "Alimentation", "limit": 100.0}])
+    today = date(2026, 10, 18)
+
+    def add(record_id, amount, day="2026-10-18", category="Alimentation"):
+        record = {"id": record_id, "category": category, "amount": amount, "date": day}
+        dm.append_data("expenses", record)
+        return dm.check_budget(record, today)
+
+    assert add(1, 50.0) is None
+    assert add(2, 35.0) == (80, 85.0, 100.0)
+    assert add(3, 5.0) is None
+    assert add(4, 50.0, category="Transport") is None
+    assert add(5, 500.0, day="2026-09-01") is None
+    assert add(6, 20.0) == (100, 110.0, 100.0)
+    assert add(7, 1.0) is None
+    # Les seuils déjà signalés sont conservés après un redémarrage
+    assert json.loads((tmp_path / "budget_alerts.json").read_text(encoding="utf-8"))["period"] == "2026-10"
+
+
+def test_unusual_expense_detection(tmp_path):
+    """Teste la détection des dépenses inhabituelles: historique noté en batch, puis ajout par ajout."""
+    dm = DataManager(str(tmp_path))
+    amounts = [50.0, 55.0, 48.0, 52.0, 51.0, 49.0, 200.0, 53.0, 47.0, 50.0]
+    dm.save_data("expenses", [
+        {"id": i, "category": "Alimentation", "amount": a, "date": f"2026-09-{i:02d}"} for i, a in enumerate(amounts, 1)
+    ] + [{"id": 20, "category": "Logement", "amount": 900.0, "date": "2026-09-01"}])
+
+    history = dm.anomaly_detector().history
+    assert history.loc[history["anomaly"], "id"].tolist() == [7]
+
+    assert dm.check_anomaly({"category": "Alimentation", "amount": 54.0, "date": "2026-10-01"})["anomaly"] is False
+    unusual = dm.check_anomaly({"category": "Alimentation", "amount": 160.0, "date": "2026-10-02"})
+    assert unusual["anomaly"] and unusual["ratio"] > 3
+    # Trop peu d'historique pour juger le logement
+    assert not dm.check_anomaly({"category": "Logement", "amount": 5000.0, "date": "2026-10-03"})["anomaly"]
+
+    # Noter une dépense ne la compte pas; l'ajout enregistré la compte, une modification reconstruit tout
+    detector = dm.anomaly_detector()
+    count = detector.stats["Alimentation"].count
+    assert count == len(amounts)
+    dm.append_data("expenses", {"id": 21, "category": "Alimentation", "amount": 54.0, "date": "2026-10-01"})
+    assert dm.anomaly_detector() is detector and detector.stats["Alimentation"].count == count + 1
+    dm.update_record("expenses", 21, {"amount": 500.0})
+    rebuilt = dm.anomaly_detector()
+    assert rebuilt is not detector
+    assert rebuilt.history.loc[rebuilt.history["id"] == 21, "amount"].tolist() == [500.0]
+
+
+def test_full_text_search(tmp_path):
+    """Teste la recherche plein texte: accents, préfixes, filtres combinés et index sauvegardé."""
+    dm = DataManager(str(tmp_path))
+    dm.save_data("expenses", [
+        {"id": 1, "category": "Alimentation", "description": "Épicerie du marché", "amount": 30.0, "date": "2026-09-02"},
+        {"id": 2, "category": "Alimentation", "description": "Boulangerie", "amount": 5.0, "date": "2026-10-01"},
+        {"id": 3, "category": "Transport", "description": "Billet de train Noël", "amount": 80.0, "date": "2026-10-05"},
+        {"id": 4, "category": "Alimentation", "description": "epicerie bio", "amount": 12.0, "date": "2026-10-07"},
+    ])
+    assert dm.search_frame("expenses", "EPICERIE")["id"].tolist() == [1, 4]
+    assert dm.search_frame("expenses", "épi march")["id"].tolist() == [1]
+    assert dm.search_frame("expenses", "noel")["id"].tolist() == [3]
+    assert dm.search_frame("expenses", "epic", "Alimentation", "2026-10-01", "2026-10-31")["id"].tolist() == [4]
+    assert dm.search_frame("expenses", "", None, "2026-10-01")["id"].tolist() == [2, 3, 4]
+
+    # Index tenu à jour à l'ajout et à la modification
+    dm.append_data("expenses", {"id": 5, "category": "Santé", "description": "Pharmacie", "amount": 9.0, "date": "2026-10-08"})
+    dm.update_record("expenses", 2, {"description": "Boulangerie pharmacie"})
+    assert dm.search_frame("expenses", "pharma")["id"].tolist() == [2, 5]
+    DataManager.flush()
+    saved = json.loads((tmp_path / "expenses.text_index.json").read_text(encoding="utf-8"))
+    assert "pharmacie" in saved["postings"]
+
+
+def test_import_bank_statements(tmp_path):
+    """Teste l'import de relevés CSV (format français) et OFX par lots."""
+    from utils.importer import import_statement, parse_amount
+
+    # Séparateur décimal: le dernier de "," et "."; "1,234" seul est ambigu et refusé
+    assert [parse_amount(v) for v in ("1,234.56", "1.234,56", "1234,5", "1,234")] == [1234.56, 1234.56, 1234.5, None]
+
+    dm = DataManager(str(tmp_path))
+    dm.append_data("expenses", {"id": 1, "category": "Loyer", "description": "Loyer", "amount": 700.0, "date": "2026-09-01"})
+    statement = tmp_path / "releve.csv"
+    statement.write_bytes(
+        "Date opération;Libellé;Débit;Crédit\n"
+        "02/10/2026;CB CARREFOUR;45,90;\n"
+        "03/10/2026;VIR SALAIRE;;2 100,00\n"
+        "pas une date;???;1,00;\n"
+        "05/10/2026;CB SNCF  BILLET;1 234,56;\n".encode("cp1252")
+    )
+    progress = import_statement(dm, statement, chunk_size=2)
+    assert (progress.rows, progress.expenses, progress.income, progress.rejected) == (4, 2, 1, 1)
+    assert progress.error is None and progress.percent == 100.0
+    expenses = dm.load_data("expenses")
+    assert [(e["id"], e["description"], e["amount"], e["date"]) for e in expenses[1:]] == [
+        (2, "CB CARREFOUR", 45.9, "2026-10-02"), (3, "CB SNCF BILLET", 1234.56, "2026-10-05"),
+    ]
+    assert dm.load_data("income")[0]["source"] == "VIR SALAIRE"
+    assert dm.total_amount("expenses") == 700.0 + 45.9 + 1234.56
+
+    ofx = tmp_path / "releve.ofx"
+    ofx.write_text(
+        "OFXHEADER:100\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>USD\n<BANKTRANLIST>\n"
+        "<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20261007120000<TRNAMT>-12.50<NAME>Café<MEMO>Gare</STMTTRN>\n"
+        "<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20261008<TRNAMT>300.00<NAME>Remboursement</STMTTRN>\n"
+        "</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n",
+        encoding="utf-8",
+    )
+    progress = import_statement(dm, ofx)
+    assert (progress.expenses, progress.income) == (1, 1)
+    assert dm.get_record("expenses", 4) == {
+        "id": 4, "category": "Autre", "description": "Café Gare", "amount": 12.5, "date": "2026-10-07", "currency": "USD",
+    }
+
+
+def test_duplicate_transactions_skipped(tmp_path):
+    """Teste l'index de dédoublonnage: réimport, relevés qui se chevauchent et ajouts manuels."""
+    from utils.importer import import_statement
+
+    dm = DataManager(str(tmp_path))
+    first = tmp_path / "septembre.csv"
+    first.write_text(
+        "Date;Libellé;Montant\n"
+        "01/09/2026;CAFE;-2,50\n"
+        "01/09/2026;CAFE;-2,50\n"
+        "02/09/2026;Épicerie;-30,00\n",
+        encoding="utf-8",
+    )
+    assert import_statement(dm, first).expenses == 3
+    # Même relevé: tout est ignoré, y compris le deuxième café identique
+    progress = import_statement(dm, first)
+    assert (progress.expenses, progress.duplicates) == (0, 3)
+
+    overlapping = tmp_path / "chevauchement.csv"
+    overlapping.write_text(
+        "Date;Libellé;Montant\n"
+        "01/09/2026;Cafe;-2,50\n"
+        "01/09/2026;CAFE;-2,50\n"
+        "01/09/2026;CAFE;-2,50\n"
+        "03/09/2026;Pharmacie;-9,00\n",
+        encoding="utf-8",
+    )
+    progress = import_statement(dm, overlapping)
+    assert (progress.expenses, progress.duplicates) == (2, 2)
+    assert len(dm.load_data("expenses")) == 5
+
+    assert dm.is_duplicate("expenses", {"description": "épicerie", "amount": 30.0, "date": "2026-09-02"})
+    assert not dm.is_duplicate("expenses", {"description": "épicerie", "amount": 30.01, "date": "2026-09-02"})
+    dm.delete_record("expenses", 3)
+    assert not dm.is_duplicate("expenses", {"description": "épicerie", "amount": 30.0, "date": "2026-09-02"})
+
+    # Index sauvegardé, identique à une reconstruction depuis les données
+    from utils.dedup import DedupIndex
+
+    DataManager.flush()
+    saved = DedupIndex.load(tmp_path / "expenses.dedup.npz", dm._store_signature("expenses"), "description")
+    assert saved is not None and saved.counts == DedupIndex.from_store(dm.record_store("expenses")).counts
+
+
+def test_category_rules(tmp_path):
+    """Teste les règles de catégorisation: mots-clés, motifs, corrections apprises et import."""
+    from utils.categorizer import CategoryRules
+    from utils.importer import import_statement
+
+    dm = DataManager(str(tmp_path))
+    rules = dm.category_rules()
+    assert rules.add_keyword("Carrefour", "Alimentation")
+    assert rules.add_keyword("carrefour location", "Transport")
+    assert rules.add_pattern(r"\bsncf\b|\bratp\b", "Transport")
+    assert not rules.add_pattern("(", "Transport")
+    # Motifs qui ne peuvent pas rejoindre l'alternance commune: refusés, les règles en place restent valides
+    assert not rules.add_pattern("(?i)uber", "Transport")
+    assert not rules.add_pattern(r"(a)\1", "Transport")
+    assert rules.add_pattern(r"(?P<double>b)(?P=double)", "Services")
+    assert not rules.add_pattern(r"(?P<double>c)", "Services")
+    assert rules.add_keyword("uber", "Transport")
+    assert rules.categorize("abba") == "Services"
+    # La correspondance de l'alternance désigne la règle: groupes des motifs précédents décomptés, la plus à gauche gagne
+    assert rules.add_pattern(r"(navigo|velib) (mois|an)", "Abonnements")
+    assert rules.add_pattern(r"\bparking\b", "Stationnement")
+    assert rules.categorize("Parking gare") == "Stationnement"
+    assert rules.categorize("velib an puis sncf") == "Abonnements"
+
+    assert rules.categorize_many([
+        "CB CARREFOUR 12/03 PARIS",
+        "Carrefour Location 04/05",
+        "Prélèvement RATP navigo",
+        "Pharmacie",
+        "CB CARREFOUR 12/03 PARIS",
+    ]) == ["Alimentation", "Transport", "Transport", "Autre", "Alimentation"]
+    assert rules.categorize("carrefourmarket") == "Autre"
+
+    # Correction manuelle: retenue pour le commerçant, quelles que soient la date et la référence
+    assert rules.learn("CB CARREFOUR 12/03 PARIS", "Divertissement")
+    assert not rules.learn("CB CARREFOUR 20/04 PARIS", "Divertissement")
+    assert rules.categorize("CB CARREFOUR 15/04 PARIS") == "Divertissement"
+    assert rules.categorize("CB CARREFOUR 15/04 LYON") == "Alimentation"
+    # Commerçant qu'aucune règle ne connaît: rien à corriger, rien n'est appris
+    assert not rules.learn("Boulangerie Paul 12", "Alimentation")
+    assert rules.categorize("Boulangerie Paul 13") == "Autre"
+
+    # Règles relues depuis data/category_rules.json
+    reloaded = CategoryRules(tmp_path / "category_rules.json")
+    assert reloaded.categorize("CB CARREFOUR 01/01 PARIS") == "Divertissement"
+    assert reloaded.categorize("Billet SNCF") == "Transport"
+
+    statement = tmp_path / "releve.csv"
+    statement.write_text(
+        "Date;Libellé;Montant;Catégorie\n"
+        "01/09/2026;CB CARREFOUR 01/09 LYON;-40,00;\n"
+        "02/09/2026;Billet SNCF;-55,00;Divertissement\n"
+        "03/09/2026;Librairie;-12,00;\n",
+        encoding="utf-8",
+    )
+    import_statement(dm, statement)
+    assert [e["category"] for e in dm.load_data("expenses")] == ["Alimentation", "Divertissement", "Autre"]
+
+
+def test_streaming_export(tmp_path):
+    """Teste l'export en archive NDJSON: contenu, manifeste, sommes de contrôle et progression."""
+    import zipfile
+    from utils.exporter import ExportProgress, export_collections, file_sha256, read_manifest, verify_export
+
+    dm = DataManager(str(tmp_path))
+    dm.extend_data("expenses", [
+        {"id": i, "category": "Alimentation", "description": f"Épicerie {i}", "amount": i + 0.5, "date": "2026-09-01"}
+        for i in range(1, 2501)
+    ])
+    dm.append_data("income", {"id": 1, "source": "Salaire", "amount": 2500.0, "date": "2026-09-01", "recurring": True})
+    dm.save_data("settings", {"currency": "EUR", "theme": "Clair"})
+
+    progress = ExportProgress()
+    export_collections(dm, progress)
+    assert progress.done and progress.error is None
+    assert (progress.records, progress.total, progress.percent) == (2502, 2502, 100.0)
+    archive = progress.path
+    assert archive.parent == tmp_path / "exports" and not list(archive.parent.glob("*.tmp"))
+
+    manifest = read_manifest(archive)
+    assert manifest["collections"]["expenses"]["records"] == 2500
+    assert manifest["collections"]["settings"]["records"] == 1
+    assert manifest["collections"]["savings_goals"]["records"] == 0
+    with zipfile.ZipFile(archive) as z:
+        lines = z.read("expenses.ndjson").decode("utf-8").splitlines()
+    assert json.loads(lines[0])["description"] == "Épicerie 1" and len(lines) == 2500
+
+    assert verify_export(archive)
+    sidecar = archive.with_name(archive.name + ".sha256").read_text(encoding="utf-8")
+    assert sidecar.split()[0] == file_sha256(archive)
+
+    # Membre altéré: la vérification échoue
+    corrupted = tmp_path / "corrompu.zip"
+    with zipfile.ZipFile(archive) as src, zipfile.ZipFile(corrupted, "w") as dst:
+        for item in src.infolist():
+            data = src.read(item.filename)
+            dst.writestr(item.filename, data.replace(b"Salaire", b"Salaira") if item.filename == "income.ndjson" else data)
+    assert not verify_export(corrupted)
+
+
+def test_incremental_backup_and_restore(tmp_path):
+    """Teste les numéros de séquence, les sauvegardes incrémentales et la restauration."""
+    from utils.backup import backup, backup_chain, restore
+    from utils.exporter import read_manifest
+
+    dm = DataManager(str(tmp_path / "data"))
+    dm.extend_data("expenses", [
+        {"id": i, "category": "Alimentation", "description": f"Courses {i}", "amount": float(i), "date": "2026-09-01"}
+        for i in range(1, 1001)
+    ])
+    dm.save_data("settings", {"currency": "EUR"})
+    first = dm.changes().sequence
+    assert first == 2
+
+    full = backup(dm)
+    assert full.error is None and read_manifest(full.path)["kind"] == "full"
+    assert full.records == 1001
+    # Rien de modifié: aucune archive
+    assert backup(dm).path is None
+
+    dm.update_record("expenses", 5, {"amount": 50.0})
+    dm.delete_record("expenses", 7)
+    dm.append_data("expenses", {"id": 1001, "category": "Transport", "description": "Bus", "amount": 2.0, "date": "2026-09-02"})
+    dm.append_data("expenses", {"id": 1002, "category": "Transport", "description": "Taxi", "amount": 20.0, "date": "2026-09-02"})
+    dm.delete_record("expenses", 1002)
+    assert dm.changes().sequence == first + 5
+
+    delta = backup(dm)
+    manifest = read_manifest(delta.path)
+    assert manifest["kind"] == "delta" and manifest["base"] == first and manifest["parent"] == full.path.name
+    # Seuls les enregistrements modifiés sont écrits
+    assert manifest["collections"]["expenses"]["records"] == 2
+    assert sorted(manifest["deleted"]["expenses"]) == [7, 1002]
+    assert delta.path.stat().st_size < full.path.stat().st_size
+
+    dm.save_data("settings", {"currency": "USD"})
+    second = backup(dm)
+    assert read_manifest(second.path)["replaced"] == ["settings"]
+    assert [path for path, _ in backup_chain(tmp_path / "data" / "backups")] == [full.path, delta.path, second.path]
+
+    target = DataManager(str(tmp_path / "restaure"))
+    # Identifiant déjà attribué dans le dossier cible avant la restauration
+    target.append_data("expenses", {"id": target.next_id("expenses"), "category": "Autre", "description": "Test", "amount": 1.0, "date": "2026-09-03"})
+    restored = restore(tmp_path / "data" / "backups", target)
+    assert restored["expenses"] == 1000
+    assert target.load_data("expenses") == dm.load_data("expenses")
+    assert target.load_data("settings")[0]["currency"] == "USD"
+    assert target.next_id("expenses") == 1002
@@ -0,0 +1,77 @@
+"""
+Running totals of a collection by category, by month and overall
+"""
+from typing import Dict, Any, Optional, Tuple
+
+
+class RunningTotals:
+    """Totals kept up to date record by record, read without scanning
+
+    Every change is O(1): add() on an append, remove() then add() on an
+    update, remove() on a deletion. Records without category count as
+    "Autre"; records without a usable date are left out of the months.
+    """
+
+    def __init__(self) -> None:
+        self.total = 0.0
+        self.count = 0
+        self.by_category: Dict[str, float] = {}
+        self.by_month: Dict[str, float] = {}
+        # Nombre d'enregistrements par clé: une clé vidée par remove() disparaît
+        self._category_counts: Dict[str, int] = {}
+        self._month_counts: Dict[str, int] = {}
+
+    @staticmethod
+    def _month(date: Any) -> Optional[str]:
+        text = str(date or "")
+        return text[:7] if len(text) >= 7 and text[:4].isdigit() and text[4] == "-" else None
+
+    @staticmethod
+    def _shift(totals: Dict[str, float], counts: Dict[str, int], key: str, amount: float, step: int) -> None:
+        counts[key] = counts.get(key, 0) + step
+        if counts[key] <= 0:
+            del counts[key]
+            totals.pop(key, None)
+        else:
+            totals[key] = totals.get(key, 0.0) + amount
+
+    def _apply(self, amount: Any, category: Any, date: Any, step: int) -> None:
+        amount = float(amount) if isinstance(amount, (int, float)) else 0.0
+        signed = amount * step
+        self.total += signed
+        self.count += step
+        name = "Autre" if category is None else str(category)
+        self._shift(self.by_category, self._category_counts, name, signed, step)
+        month = self._month(date)
+        if month is not None:
+            self._shift(self.by_month, self._month_counts, month, signed, step)
+
+    def add(self, amount: Any, category: Any = None, date: Any = None) -> None:
+        """Count one record"""
+        self._apply(amount, category, date, 1)
+
+    def remove(self, amount: Any, category: Any = None, date: Any = None) -> None:
+        """Uncount one record previously passed to add()"""
+        self._apply(amount, category, date, -1)
+
+    def load(
+        self,
+        total: float,
+        count: int,
+        categories: Dict[str, Tuple[float, int]],
+        months: Dict[str, Tuple[float, int]],
+    ) -> None:
+        """Replace the totals with ones computed in bulk ({key: (amount, count)})"""
+        self.total = total
+        self.count = count
+        self.by_category = {key: amount for key, (amount, _) in categories.items()}
+        self._category_counts = {key: n for key, (_, n) in categories.items()}
+        self.by_month = {key: amount for key, (amount, _) in months.items()}
+        self._month_counts = {key: n for key, (_, n) in months.items()}
+
+    def category_total(self, category: str) -> float:
+        return self.by_category.get(category, 0.0)
+
+    def month_total(self, month: str) -> float:
+        """Total of a "YYYY-MM" month"""
+        return self.by_month.get(month, 0.0)
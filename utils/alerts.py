@@ -0,0 +1,87 @@
+"""
+Budget limit alerts checked as expenses are added
+"""
+from typing import List, Dict, Any, Optional, Set, Tuple
+import threading
+from pathlib import Path
+
+from utils.journal import read_snapshot, write_snapshot
+
+ALERTS_NAME = "budget_alerts.json"
+
+# Seuils d'alerte, en pourcentage de la limite d'une catégorie
+THRESHOLDS: Tuple[int, ...] = (80, 100)
+
+
+class BudgetAlerts:
+    """Budget limits and the thresholds already crossed in the current month
+
+    The limits are set from the budget categories when they are loaded or
+    saved, so that check() compares a spending with its limit without
+    reading any file. Each (category, threshold) fires once per month, also
+    across restarts: the crossed ones are kept in data/budget_alerts.json.
+    """
+
+    _instances: Dict[Path, "BudgetAlerts"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.limits: Dict[str, float] = {}
+        self.factor = 1.0
+        self.enabled = True
+        self.period: Optional[str] = None
+        self.fired: Set[Tuple[str, int]] = set()
+        # read_snapshot renvoie l'objet du fichier dans une liste
+        for saved in read_snapshot(path)[:1]:
+            self.period = saved.get("period")
+            self.fired = {(str(category), int(threshold)) for category, threshold in saved.get("fired", [])}
+
+    @classmethod
+    def for_path(cls, path: Path) -> "BudgetAlerts":
+        """Return the shared alerts of a state file"""
+        key = path.resolve()
+        with cls._instances_lock:
+            alerts = cls._instances.get(key)
+            if alerts is None:
+                alerts = cls(path)
+                cls._instances[key] = alerts
+            return alerts
+
+    def configure(self, categories: List[Dict[str, Any]], factor: float = 1.0, enabled: bool = True) -> None:
+        """Set the limits of the budget categories (in the currency `factor` converts to)"""
+        limits = {}
+        for category in categories:
+            limit = category.get("limit")
+            if category.get("name") and isinstance(limit, (int, float)) and limit > 0:
+                limits[str(category["name"])] = float(limit)
+        with self.lock:
+            self.limits = limits
+            self.factor = factor
+            self.enabled = enabled
+
+    def watches(self, category: str) -> bool:
+        return self.enabled and category in self.limits
+
+    def check(self, category: str, spent: float, period: str) -> Optional[Tuple[int, float, float]]:
+        """Highest threshold newly crossed by a category's spending of a period (reference currency)
+
+        Returns (threshold, spent, limit) in the configured currency, or None
+        when no threshold is crossed or the crossed ones already fired.
+        """
+        with self.lock:
+            limit = self.limits.get(category)
+            if not self.enabled or limit is None:
+                return None
+            if period != self.period:
+                # Nouveau mois: les seuils peuvent à nouveau être signalés
+                self.period = period
+                self.fired = set()
+            spent = spent * self.factor
+            crossed = [t for t in THRESHOLDS if spent >= limit * t / 100 and (category, t) not in self.fired]
+            if not crossed:
+                return None
+            self.fired.update((category, t) for t in crossed)
+            write_snapshot(self.path, {"period": self.period, "fired": sorted(self.fired)})
+            return max(crossed), spent, limit
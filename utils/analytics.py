@@ -0,0 +1,74 @@
+"""
+Vectorized budget analytics over typed DataFrames
+"""
+from typing import List, Dict, Any
+
+import numpy as np
+import pandas as pd
+
+# Colonnes ajoutées aux catégories de budget par category_budget
+BUDGET_COLUMNS = ["spent", "remaining", "used_pct"]
+
+
+def total(frame: pd.DataFrame) -> float:
+    """Sum of the amount column"""
+    if "amount" not in frame:
+        return 0.0
+    return float(frame["amount"].to_numpy(dtype=np.float64, na_value=0.0).sum())
+
+
+def category_totals(frame: pd.DataFrame) -> Dict[str, float]:
+    """Sum of amounts per category in one group-by; records without category count as "Autre" """
+    if "amount" not in frame or frame.empty:
+        return {}
+    if "category" not in frame:
+        return {"Autre": total(frame)}
+    grouped = frame.groupby("category", sort=False, observed=True, dropna=False)["amount"].sum()
+    totals: Dict[str, float] = {}
+    for key, value in grouped.items():
+        name = "Autre" if pd.isna(key) else str(key)
+        totals[name] = totals.get(name, 0.0) + float(value)
+    return totals
+
+
+def month_totals(frame: pd.DataFrame) -> Dict[str, float]:
+    """Sum of amounts per "YYYY-MM" month; undated records are left out"""
+    if "amount" not in frame or "date" not in frame or frame.empty:
+        return {}
+    dates = pd.to_datetime(frame["date"], errors="coerce")
+    dated = dates.notna().to_numpy()
+    if not dated.any():
+        return {}
+    months = dates[dated].to_numpy().astype("datetime64[M]")
+    keys, inverse = np.unique(months, return_inverse=True)
+    sums = np.bincount(inverse, weights=frame["amount"].to_numpy(dtype=np.float64)[dated], minlength=len(keys))
+    return {str(key): float(value) for key, value in zip(keys, sums)}
+
+
+def budget_summary(income_total: float, expense_total: float) -> Dict[str, float]:
+    """Income, expenses, remaining and savings rate"""
+    remaining = income_total - expense_total
+    return {
+        "total_income": income_total,
+        "total_expenses": expense_total,
+        "remaining": remaining,
+        "savings_rate": (remaining / income_total * 100) if income_total > 0 else 0.0,
+    }
+
+
+def category_budget(categories: List[Dict[str, Any]], spent: Dict[str, float]) -> pd.DataFrame:
+    """Join the budget categories to the spent amounts in one pass
+
+    Returns the categories with "spent", "remaining" and "used_pct" columns,
+    in their original order.
+    """
+    frame = pd.DataFrame(categories)
+    if frame.empty:
+        return pd.DataFrame(columns=["name", "limit"] + BUDGET_COLUMNS)
+    spent_by_name = pd.Series(spent, dtype=np.float64)
+    frame["spent"] = frame["name"].map(spent_by_name).fillna(0.0).astype(np.float64)
+    limits = pd.to_numeric(frame["limit"], errors="coerce").fillna(0.0).to_numpy(dtype=np.float64)
+    frame["remaining"] = limits - frame["spent"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frame["used_pct"] = np.where(limits > 0, frame["spent"].to_numpy() / limits * 100, 0.0)
+    return frame
@@ -0,0 +1,164 @@
+"""
+Streaming detection of unusual expenses per category
+"""
+from typing import Dict, Any
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.record_store import RecordStore
+
+# Poids de la dernière dépense dans les moyennes exponentielles
+ALPHA = 0.1
+# Dépenses d'une catégorie nécessaires avant de signaler quoi que ce soit
+MIN_HISTORY = 5
+# Écart à la moyenne (en écarts-types) et multiple de la médiane jugés inhabituels
+Z_THRESHOLD = 3.0
+RATIO_THRESHOLD = 3.0
+# Quantile haut suivi par catégorie: une dépense inhabituelle le dépasse toujours
+UPPER_QUANTILE = 0.9
+# Dernières dépenses d'une catégorie servant aux quantiles du mode batch
+WINDOW = 20
+
+
+class CategoryStats:
+    """Exponentially weighted mean and variance, median and upper quantile of one category
+
+    The quantiles are tracked by stochastic approximation: each amount
+    moves them by a step proportional to the typical deviation, up or down
+    depending on its side, so an update is O(1) and needs no stored history.
+    """
+
+    __slots__ = ("count", "mean", "var", "median", "upper", "spread")
+
+    def __init__(self, count: int = 0, mean: float = 0.0, var: float = 0.0,
+                 median: float = 0.0, upper: float = 0.0, spread: float = 0.0) -> None:
+        self.count = count
+        self.mean = mean
+        self.var = var
+        self.median = median
+        self.upper = upper
+        self.spread = spread
+
+    def score(self, amount: float) -> Dict[str, Any]:
+        """Z-score and ratio to the median of an amount, before it is counted"""
+        std = math.sqrt(self.var)
+        zscore = (amount - self.mean) / std if std > 0 else 0.0
+        ratio = amount / self.median if self.median > 0 else 0.0
+        anomaly = (
+            self.count >= MIN_HISTORY
+            and amount > self.upper
+            and (zscore >= Z_THRESHOLD or ratio >= RATIO_THRESHOLD)
+        )
+        return {"zscore": zscore, "ratio": ratio, "median": self.median, "anomaly": anomaly}
+
+    def update(self, amount: float) -> None:
+        """Count one amount"""
+        if self.count == 0:
+            self.mean = self.median = self.upper = amount
+            self.var = 0.0
+            self.spread = abs(amount) * ALPHA
+        else:
+            diff = amount - self.mean
+            increment = ALPHA * diff
+            self.mean += increment
+            self.var = (1 - ALPHA) * (self.var + diff * increment)
+            self.spread += ALPHA * (abs(amount - self.median) - self.spread)
+            step = 2 * ALPHA * self.spread
+            self.median += step * (0.5 - (amount < self.median))
+            self.upper += step * (UPPER_QUANTILE - (amount < self.upper))
+            self.upper = max(self.upper, self.median)
+        self.count += 1
+
+
+def score_history(frame: pd.DataFrame) -> pd.DataFrame:
+    """Score every expense of a history against the ones of its category before it, in one pass
+
+    `frame` holds id, category, amount and day, in the order the expenses
+    were made. The exponentially weighted statistics and the rolling
+    quantiles are computed per category by pandas, then shifted by one so
+    that each expense is compared with the history preceding it.
+    """
+    if frame.empty:
+        return frame.assign(zscore=[], ratio=[], anomaly=[])
+    grouped = frame.groupby("category", sort=False, observed=True)["amount"]
+    ewm = grouped.ewm(alpha=ALPHA, adjust=False)
+    mean = ewm.mean().reset_index(level=0, drop=True).sort_index()
+    std = ewm.var(bias=True).reset_index(level=0, drop=True).sort_index().pow(0.5)
+    rolling = grouped.rolling(WINDOW, min_periods=1)
+    median = rolling.median().reset_index(level=0, drop=True).sort_index()
+    upper = rolling.quantile(UPPER_QUANTILE).reset_index(level=0, drop=True).sort_index()
+    keys = frame["category"]
+    before = pd.DataFrame({"mean": mean, "std": std, "median": median, "upper": upper}).groupby(keys, sort=False, observed=True).shift()
+    amounts = frame["amount"].to_numpy(dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        zscore = np.where(before["std"] > 0, (amounts - before["mean"]) / before["std"], 0.0)
+        ratio = np.where(before["median"] > 0, amounts / before["median"], 0.0)
+    anomaly = (
+        (grouped.cumcount().to_numpy() >= MIN_HISTORY)
+        & (amounts > before["upper"].to_numpy())
+        & ((zscore >= Z_THRESHOLD) | (ratio >= RATIO_THRESHOLD))
+    )
+    return frame.assign(zscore=zscore, ratio=ratio, anomaly=anomaly)
+
+
+def history_frame(store: RecordStore) -> pd.DataFrame:
+    """Expenses of a record store in date order: id, category, amount in the reference currency, day"""
+    n = store.size
+    keep = np.flatnonzero(store.alive[:n])
+    order = keep[np.argsort(store.days[keep], kind="stable")]
+    # Le code -1 (sans catégorie) désigne le dernier élément, "Autre"
+    names = np.array(store.categories.strings + ["Autre"], dtype=object)
+    return pd.DataFrame({
+        "id": store.ids[order],
+        "category": names[store.category_codes[order]],
+        "amount": store.base_amounts[order],
+        "day": store.days[order],
+    })
+
+
+class AnomalyDetector:
+    """Per-category statistics of the expenses, seeded once from the history then updated per expense"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.stats: Dict[str, CategoryStats] = {}
+        self.history = pd.DataFrame(columns=["id", "category", "amount", "day", "zscore", "ratio", "anomaly"])
+
+    @classmethod
+    def from_history(cls, frame: pd.DataFrame) -> "AnomalyDetector":
+        """Score the whole history in batch and start the streaming statistics where it ends"""
+        detector = cls()
+        detector.history = score_history(frame)
+        if frame.empty:
+            return detector
+        grouped = frame.groupby("category", sort=False, observed=True)["amount"]
+        ewm = grouped.ewm(alpha=ALPHA, adjust=False)
+        last_mean = ewm.mean().groupby(level=0, observed=True).last()
+        last_var = ewm.var(bias=True).groupby(level=0, observed=True).last().fillna(0.0)
+        tail = frame.groupby("category", sort=False, observed=True).tail(WINDOW).groupby("category", observed=True)["amount"]
+        medians = tail.median()
+        uppers = tail.quantile(UPPER_QUANTILE)
+        for category, count in grouped.size().items():
+            spread = float((frame.loc[tail.groups[category], "amount"] - medians[category]).abs().mean())
+            detector.stats[str(category)] = CategoryStats(
+                int(count), float(last_mean[category]), float(last_var[category]),
+                float(medians[category]), float(uppers[category]), spread,
+            )
+        return detector
+
+    def score(self, category: str, amount: float) -> Dict[str, Any]:
+        """Score an expense against its category without counting it"""
+        with self.lock:
+            stats = self.stats.get(category)
+            return (stats or CategoryStats()).score(amount)
+
+    def observe(self, category: str, amount: float) -> Dict[str, Any]:
+        """Score an expense against its category, then count it (O(1))"""
+        with self.lock:
+            stats = self.stats.setdefault(category, CategoryStats())
+            result = stats.score(amount)
+            stats.update(amount)
+        return result
@@ -0,0 +1,195 @@
+"""
+Full and incremental backups of the collections, and their restoration
+"""
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from pathlib import Path
+import sys
+import zipfile
+
+from utils.changes import PUT, REPLACE
+from utils.codec import loads
+from utils.exporter import (
+    EXPORT_COLLECTIONS, ExportProgress, count_records, read_manifest, verify_export, write_archive,
+)
+from utils.journal import read_snapshot, write_snapshot
+
+BACKUP_DIR = "backups"
+BACKUP_PREFIX = "budget-backup"
+BACKUP_STATE_NAME = "backup_state.json"
+
+# Collections enregistrées sous forme d'un seul objet, pas d'une liste
+SINGLE_RECORD_COLLECTIONS = {"settings"}
+
+
+def _state(directory: Path) -> Dict[str, Any]:
+    """Watermark (last sequence number backed up) and archives of the current backup chain"""
+    # read_snapshot renvoie l'objet du fichier dans une liste
+    for saved in read_snapshot(directory / BACKUP_STATE_NAME)[:1]:
+        return saved
+    return {}
+
+
+def _changed_records(
+    data_manager: Any, collection: str, ops: Dict[Any, str], deleted: List[Any], progress: ExportProgress
+) -> Iterator[Dict[str, Any]]:
+    """Current version of the records written since the watermark; deleted ids are collected in `deleted`"""
+    for record_id, op in ops.items():
+        record = data_manager.get_record(collection, record_id) if op == PUT else None
+        if record is None:
+            deleted.append(record_id)
+            progress.records += 1
+        else:
+            yield record
+
+
+def backup(
+    data_manager: Any,
+    full: bool = False,
+    progress: Optional[ExportProgress] = None,
+    directory: Optional[Any] = None,
+) -> ExportProgress:
+    """Back up the collections into data/backups, in full or only what changed since the last backup
+
+    The first backup, and any requested with `full`, is a full export. The
+    next ones are deltas: the change log gives the records written after
+    the watermark of the previous backup, which are read by id and written
+    with the ids deleted since, so their time and size follow the number of
+    changes, not the size of the history. A collection rewritten as a whole
+    (save_data) is taken in full. Each archive records the sequence number
+    it goes up to and the archive it follows; the change log is then
+    truncated up to that number. Without any change, no archive is written
+    (progress.path stays None).
+    """
+    progress = progress or ExportProgress()
+    directory = Path(directory) if directory is not None else data_manager.data_dir / BACKUP_DIR
+    log = data_manager.changes()
+    try:
+        state = _state(directory)
+        if full or not state.get("chain"):
+            # Numéro relevé avant la lecture: une écriture concurrente figurera aussi dans le prochain delta
+            sequence = log.sequence
+            progress.total = sum(count_records(data_manager, name) for name in EXPORT_COLLECTIONS)
+            streams = {name: data_manager.iter_records(name) for name in EXPORT_COLLECTIONS}
+            manifest: Dict[str, Any] = {"kind": "full", "sequence": sequence, "base": None, "parent": None}
+            path = write_archive(directory, BACKUP_PREFIX, streams, progress, manifest)
+            chain = [path.name]
+        else:
+            sequence, changes = log.changes_since(int(state["sequence"]))
+            if not changes:
+                progress.done = True
+                return progress
+            deleted: Dict[str, List[Any]] = {}
+            streams = {}
+            progress.total = 0
+            for collection, ops in changes.items():
+                if ops == REPLACE:
+                    progress.total += count_records(data_manager, collection)
+                    streams[collection] = data_manager.iter_records(collection)
+                else:
+                    progress.total += len(ops)
+                    removed = deleted.setdefault(collection, [])
+                    streams[collection] = _changed_records(data_manager, collection, ops, removed, progress)
+            manifest = {
+                "kind": "delta",
+                "sequence": sequence,
+                "base": int(state["sequence"]),
+                "parent": state["chain"][-1],
+                "replaced": sorted(c for c, ops in changes.items() if ops == REPLACE),
+                # Rempli pendant l'écriture des membres; le manifeste est écrit en dernier
+                "deleted": deleted,
+            }
+            path = write_archive(directory, BACKUP_PREFIX, streams, progress, manifest)
+            chain = list(state["chain"]) + [path.name]
+        write_snapshot(directory / BACKUP_STATE_NAME, {"sequence": sequence, "chain": chain})
+        log.truncate(sequence)
+    except Exception as e:
+        print(f"[v0] Error backing up data: {e}")
+        progress.error = str(e)
+    progress.done = True
+    return progress
+
+
+def backup_chain(directory: Any) -> List[Tuple[Path, Dict[str, Any]]]:
+    """Archives to replay for the latest state: the most recent full backup, then its deltas in order
+
+    The chain is rebuilt from the manifests (each delta names the archive
+    it follows), so it does not depend on backup_state.json.
+    """
+    manifests: Dict[str, Dict[str, Any]] = {}
+    for path in sorted(Path(directory).glob(f"{BACKUP_PREFIX}-*.zip")):
+        try:
+            manifests[path.name] = read_manifest(path)
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            print(f"[v0] Skipping unreadable backup {path}: {e}")
+    fulls = [name for name, m in manifests.items() if m.get("kind") == "full"]
+    if not fulls:
+        return []
+    name = max(fulls, key=lambda n: (manifests[n]["sequence"], n))
+    chain = [(Path(directory) / name, manifests[name])]
+    children = {m.get("parent"): n for n, m in manifests.items() if m.get("kind") == "delta"}
+    while name in children:
+        name = children[name]
+        chain.append((Path(directory) / name, manifests[name]))
+    return chain
+
+
+def _key(record: Dict[str, Any], position: int) -> Any:
+    record_id = record.get("id")
+    return record_id if isinstance(record_id, int) else ("position", position)
+
+
+def restore(directory: Any, data_manager: Any) -> Dict[str, int]:
+    """Replay the latest full backup and its deltas into the collections of a DataManager
+
+    Every archive is checked against the checksums of its manifest first.
+    Records are applied by id (written or replaced, then deleted ones
+    removed) and each collection is saved once at the end. Returns the
+    number of records restored per collection.
+    """
+    chain = backup_chain(directory)
+    if not chain:
+        raise ValueError(f"Aucune sauvegarde complète dans {directory}")
+    for path, _ in chain:
+        if not verify_export(path):
+            raise ValueError(f"Sauvegarde corrompue: {path}")
+    collections: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+    for path, manifest in chain:
+        replaced = manifest["collections"] if manifest["kind"] == "full" else manifest.get("replaced", [])
+        with zipfile.ZipFile(path) as archive:
+            for name, entry in manifest["collections"].items():
+                records = collections.setdefault(name, {})
+                if name in replaced:
+                    records.clear()
+                with archive.open(entry["file"]) as member:
+                    for line in member:
+                        if line.strip():
+                            record = loads(line)
+                            records[_key(record, len(records))] = record
+        for name, ids in manifest.get("deleted", {}).items():
+            for record_id in ids:
+                collections.get(name, {}).pop(record_id, None)
+    restored: Dict[str, int] = {}
+    for name, records in collections.items():
+        values = list(records.values())
+        if name in SINGLE_RECORD_COLLECTIONS:
+            if values:
+                data_manager.save_data(name, values[0])
+        else:
+            data_manager.save_data(name, values)
+        restored[name] = len(values)
+    print(f"[v0] Restored from {len(chain)} backup(s): {restored}")
+    return restored
+
+
+if __name__ == "__main__":
+    # python -m utils.backup [--full]                    : sauvegarde (incrémentale par défaut) de data/
+    # python -m utils.backup restore <dossier> <cible>   : restauration de data/backups dans un autre dossier
+    from utils.data_manager import DataManager
+
+    if sys.argv[1:2] == ["restore"]:
+        if len(sys.argv) != 4:
+            sys.exit("Usage: python -m utils.backup restore <dossier des sauvegardes> <dossier cible>")
+        restore(sys.argv[2], DataManager(sys.argv[3]))
+    else:
+        result = backup(DataManager(), full="--full" in sys.argv)
+        print(f"[v0] Backup: {result.path or 'no change since the last backup'} ({result.records} records)")
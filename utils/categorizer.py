@@ -0,0 +1,217 @@
+"""
+Rule-based categorization of expenses from their description
+"""
+from typing import List, Dict, Optional, Tuple
+from pathlib import Path
+import re
+import threading
+
+from utils.journal import read_snapshot, write_snapshot
+from utils.text_index import fold
+
+RULES_NAME = "category_rules.json"
+DEFAULT_CATEGORY = "Autre"
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Constructions qui changent de sens une fois les motifs réunis en une seule alternance:
+# drapeaux globaux (?i) et références à un groupe par son numéro (\1, (?(1)...))
+_GLOBAL_FLAGS = re.compile(r"^\(\?[aiLmsux]+\)")
+_NUMBERED_REFERENCE = re.compile(r"(?<!\\)(?:\\\\)*\\[1-9]|\(\?\(\d")
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Folded words of a description, separated by single spaces: "CB Épicerie  N°12" -> "cb epicerie n 12" """
+    return " ".join(_WORD.findall(fold(text or "")))
+
+
+def merchant_key(text: Optional[str]) -> str:
+    """Words of a description without the ones holding digits (dates, card or receipt numbers)
+
+    "CB CARREFOUR 12/03 PARIS" and "CB CARREFOUR 15/04 PARIS" share the key
+    "cb carrefour paris", so a correction made on one applies to the other.
+    """
+    return _without_numbers(normalize_text(text))
+
+
+def _without_numbers(normalized: str) -> str:
+    return " ".join(word for word in normalized.split() if not any(c.isdigit() for c in word))
+
+
+def _check_pattern(pattern: str) -> None:
+    """Raise re.error for a pattern that cannot be one branch of the combined alternation"""
+    re.compile(pattern)
+    if _GLOBAL_FLAGS.match(pattern):
+        raise re.error("inline global flags are not supported; matching already ignores case")
+    if _NUMBERED_REFERENCE.search(pattern):
+        raise re.error("numbered group references are not supported; use (?P<name>...) and (?P=name)")
+
+
+def _valid_pattern(pattern: str) -> bool:
+    try:
+        _check_pattern(pattern)
+    except re.error as e:
+        print(f"[v0] Ignoring invalid category pattern {pattern!r}: {e}")
+        return False
+    return True
+
+
+def _combine(patterns: List[str]) -> Tuple[Optional[re.Pattern], List[int]]:
+    """One alternation of every pattern, and the index of the group closing each branch
+
+    Each branch ends with an empty group, the last one closed when the
+    branch matches: lastindex of the match tells which pattern it is, in
+    the same search. Empty groups keep the speed of a plain alternation;
+    capturing each branch would make the search several times slower.
+    Raises re.error if the patterns do not combine.
+    """
+    if not patterns:
+        return None, []
+    markers = []
+    groups = 0
+    for pattern in patterns:
+        groups += re.compile(pattern).groups + 1
+        markers.append(groups)
+    return re.compile("|".join(f"(?:{p})()" for p in patterns), re.IGNORECASE), markers
+
+
+class CategoryRules:
+    """Keyword and pattern rules mapping descriptions to categories, plus the learned corrections
+
+    Rules are checked in this order: a correction learned for the merchant
+    key of the description, then keywords (whole words of the folded text,
+    the leftmost match winning, the longest one at a same position), then
+    patterns (regular expressions over the normalized words, the leftmost
+    match winning, the first added at a same position). All keywords are
+    compiled into a single alternation and all patterns into another, whose
+    match tells the rule, so a description is scanned once per kind
+    whatever the number of rules; a batch is categorized once per distinct
+    description. The rules are kept in data/category_rules.json and the
+    compiled matchers are rebuilt only when a rule changes.
+    """
+
+    _instances: Dict[Path, "CategoryRules"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.keywords: Dict[str, str] = {}
+        self.patterns: List[Tuple[str, str]] = []
+        self.learned: Dict[str, str] = {}
+        self._keyword_matcher: Optional[re.Pattern] = None
+        self._pattern_matcher: Optional[re.Pattern] = None
+        # Groupe fermant chaque branche de l'alternance des motifs -> catégorie
+        self._pattern_categories: Dict[int, str] = {}
+        # read_snapshot renvoie l'objet du fichier dans une liste
+        for saved in read_snapshot(path)[:1]:
+            self.keywords = {str(k): str(v) for k, v in saved.get("keywords", {}).items()}
+            self.patterns = [(str(p), str(c)) for p, c in saved.get("patterns", []) if _valid_pattern(str(p))]
+            self.learned = {str(k): str(v) for k, v in saved.get("learned", {}).items()}
+        self._compile()
+
+    @classmethod
+    def for_path(cls, path: Path) -> "CategoryRules":
+        """Return the shared rules of a rules file"""
+        key = path.resolve()
+        with cls._instances_lock:
+            rules = cls._instances.get(key)
+            if rules is None:
+                rules = cls(path)
+                cls._instances[key] = rules
+            return rules
+
+    def _compile(self) -> None:
+        """Build the combined matchers (one alternation per kind of rule)"""
+        keywords = sorted(self.keywords, key=len, reverse=True)
+        self._keyword_matcher = (
+            re.compile(r"(?<![a-z0-9])(?:" + "|".join(re.escape(k) for k in keywords) + r")(?![a-z0-9])")
+            if keywords else None
+        )
+        self._pattern_matcher, markers = _combine([p for p, _ in self.patterns])
+        self._pattern_categories = {marker: category for marker, (_, category) in zip(markers, self.patterns)}
+
+    def _save(self) -> None:
+        write_snapshot(self.path, {
+            "keywords": self.keywords,
+            "patterns": [list(rule) for rule in self.patterns],
+            "learned": self.learned,
+        })
+
+    def add_keyword(self, keyword: str, category: str) -> bool:
+        """Categorize the descriptions holding a word or phrase (case and accents ignored)"""
+        keyword = normalize_text(keyword)
+        if not keyword or not category:
+            return False
+        with self.lock:
+            self.keywords[keyword] = category
+            self._compile()
+            self._save()
+        return True
+
+    def add_pattern(self, pattern: str, category: str) -> bool:
+        """Categorize the descriptions matching a regular expression (over their normalized words)"""
+        if not pattern or not category:
+            return False
+        with self.lock:
+            patterns = [rule for rule in self.patterns if rule[0] != pattern] + [(pattern, category)]
+            try:
+                _check_pattern(pattern)
+                # L'alternance complète est compilée avant de remplacer les règles en place
+                _combine([p for p, _ in patterns])
+            except re.error as e:
+                print(f"[v0] Invalid category pattern {pattern!r}: {e}")
+                return False
+            self.patterns = patterns
+            self._compile()
+            self._save()
+        return True
+
+    def _match(self, normalized: str) -> Optional[str]:
+        """Category of a normalized description, or None when no rule applies"""
+        learned = self.learned.get(_without_numbers(normalized))
+        if learned is not None:
+            return learned
+        if self._keyword_matcher is not None:
+            found = self._keyword_matcher.search(normalized)
+            if found is not None:
+                return self.keywords[found.group()]
+        if self._pattern_matcher is not None:
+            found = self._pattern_matcher.search(normalized)
+            if found is not None:
+                return self._pattern_categories[found.lastindex]
+        return None
+
+    def categorize(self, text: Optional[str], default: str = DEFAULT_CATEGORY) -> str:
+        """Category of one description, `default` when no rule applies"""
+        with self.lock:
+            return self._match(normalize_text(text)) or default
+
+    def categorize_many(self, texts: List[Optional[str]], default: str = DEFAULT_CATEGORY) -> List[str]:
+        """Categories of a batch of descriptions, each distinct description matched once"""
+        found: Dict[str, str] = {}
+        result = []
+        with self.lock:
+            for text in texts:
+                normalized = normalize_text(text)
+                category = found.get(normalized)
+                if category is None:
+                    category = found[normalized] = self._match(normalized) or default
+                result.append(category)
+        return result
+
+    def learn(self, text: Optional[str], category: str) -> bool:
+        """Remember a category chosen by hand for a merchant, when a rule proposed another one
+
+        A merchant no rule knows is not learned: only corrections are.
+        Returns True if a correction was recorded.
+        """
+        key = merchant_key(text)
+        if not key or not category:
+            return False
+        with self.lock:
+            proposed = self._match(normalize_text(text))
+            if proposed is None or proposed == category:
+                return False
+            self.learned[key] = category
+            self._save()
+        return True
@@ -0,0 +1,111 @@
+"""
+Change sequence numbers of the writes, for incremental backups
+"""
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+from pathlib import Path
+import json
+import os
+import threading
+
+from utils.journal import read_snapshot, write_snapshot
+
+CHANGES_NAME = "changes.jsonl"
+CHANGES_STATE_NAME = "changes.json"
+
+# Opérations du journal des modifications
+PUT = "put"
+DELETE = "delete"
+# Collection entièrement réécrite (save_data): une sauvegarde incrémentale la reprend en entier
+REPLACE = "replace"
+
+
+class ChangeLog:
+    """Append-only log of the writes, each stamped with a monotonically increasing sequence number
+
+    A line holds the sequence number, the collection, the operation and the
+    ids it touched, not the records: the log grows with the number of
+    writes, and changes_since() tells which records changed after a
+    watermark without scanning the data. Lines up to a watermark are
+    dropped by truncate() once a backup holds them; data/changes.json keeps
+    the last sequence number so that numbering continues after that.
+    """
+
+    _instances: Dict[Path, "ChangeLog"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.state_path = path.with_name(CHANGES_STATE_NAME)
+        self.lock = threading.Lock()
+        self.sequence = 0
+        # read_snapshot renvoie l'objet du fichier dans une liste
+        for saved in read_snapshot(self.state_path)[:1]:
+            self.sequence = int(saved.get("sequence", 0))
+        for entry in self._entries():
+            self.sequence = max(self.sequence, entry["seq"])
+
+    @classmethod
+    def for_path(cls, path: Path) -> "ChangeLog":
+        """Return the shared log of a changes file"""
+        key = path.resolve()
+        with cls._instances_lock:
+            log = cls._instances.get(key)
+            if log is None:
+                log = cls(path)
+                cls._instances[key] = log
+            return log
+
+    def _entries(self) -> Iterator[Dict[str, Any]]:
+        """Stream the entries of the log, skipping a line cut by a crash"""
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(entry, dict) and isinstance(entry.get("seq"), int):
+                    yield entry
+
+    def record(self, collection: str, op: str, ids: Optional[List[Any]] = None) -> int:
+        """Stamp a write with the next sequence number and log it; returns that number"""
+        with self.lock:
+            self.sequence += 1
+            entry = {"seq": self.sequence, "collection": collection, "op": op}
+            if op != REPLACE:
+                entry["ids"] = list(ids or [])
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            return self.sequence
+
+    def changes_since(self, watermark: int) -> Tuple[int, Dict[str, Any]]:
+        """Writes after a watermark: (last sequence number, {collection: REPLACE or {id: PUT | DELETE}})
+
+        Only the last operation on each id counts; a collection replaced
+        after the watermark is reported as REPLACE.
+        """
+        with self.lock:
+            sequence = self.sequence
+            changes: Dict[str, Any] = {}
+            for entry in self._entries():
+                if entry["seq"] <= watermark or entry["seq"] > sequence:
+                    continue
+                collection = entry["collection"]
+                if entry["op"] == REPLACE:
+                    changes[collection] = REPLACE
+                elif changes.get(collection) != REPLACE:
+                    ops = changes.setdefault(collection, {})
+                    for record_id in entry.get("ids", []):
+                        ops[record_id] = entry["op"]
+            return sequence, changes
+
+    def truncate(self, watermark: int) -> None:
+        """Drop the entries up to a watermark, already held by a backup"""
+        with self.lock:
+            kept = [entry for entry in self._entries() if entry["seq"] > watermark]
+            write_snapshot(self.state_path, {"sequence": self.sequence})
+            temp = self.path.with_name(self.path.name + ".tmp")
+            with open(temp, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(entry) + "\n" for entry in kept)
+            os.replace(temp, self.path)
@@ -0,0 +1,68 @@
+"""
+Serialization codecs for collection files
+"""
+from typing import Any, Optional, Union
+from datetime import date, datetime
+from decimal import Decimal
+import json
+import os
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:  # orjson est optionnel: on retombe sur le module json
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+# Codec d'écriture du déploiement:
+#   "json"  : format historique, indenté, json standard
+#   "fast"  : JSON compact encodé par orjson, types stricts
+CODEC: str = os.environ.get("BUDGET_CODEC", "json")
+CODECS = ("json", "fast")
+
+
+def _strict_default(value: Any) -> Any:
+    """Encode the few non-JSON types that records may legitimately hold, reject the others"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, "item") and callable(value.item):  # scalaires numpy
+        return value.item()
+    raise TypeError(f"Type not serializable in a budget record: {type(value).__name__}")
+
+
+def dumps(data: Any, codec: Optional[str] = None) -> bytes:
+    """Encode a collection with the configured codec"""
+    codec = codec or CODEC
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec: {codec}")
+    if codec == "fast":
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(data, default=_strict_default, option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(
+            data, default=_strict_default, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+    return json.dumps(data, indent=2, default=str, ensure_ascii=False).encode("utf-8")
+
+
+def dumps_line(data: Any, codec: Optional[str] = None) -> str:
+    """Encode one JSONL journal line"""
+    if (codec or CODEC) == "fast":
+        return dumps(data, "fast").decode("utf-8")
+    return json.dumps(data, default=str, ensure_ascii=False)
+
+
+def loads(raw: Union[bytes, str]) -> Any:
+    """Decode a collection written by any codec
+
+    Both codecs write plain JSON (indented or compact), so the fastest
+    available parser reads either format.
+    """
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # Le module json accepte aussi NaN/Infinity, écrits par l'ancien format
+            pass
+    return json.loads(raw)
@@ -0,0 +1,100 @@
+"""
+Columnar Arrow snapshots of budget collections
+"""
+from typing import List, Dict, Any, Optional, Iterable
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:  # pyarrow est optionnel: on retombe sur les fichiers JSON
+    pa = None
+    ARROW_AVAILABLE = False
+
+# Champs typés des collections; les autres champs sont stockés tels quels
+FLOAT_FIELDS = {"amount", "target", "current", "progress", "limit", "spent"}
+INT_FIELDS = {"id"}
+BOOL_FIELDS = {"recurring"}
+CATEGORY_FIELDS = {"category"}
+DATE_FIELDS = {"date"}
+
+
+def parse_dates(values: Iterable[Any]) -> pd.Series:
+    """Parse record dates ("YYYY-MM-DD", with or without a time part) into datetime64"""
+    text = pd.Series(list(values), dtype=object).astype(str).str.slice(0, 10)
+    return pd.to_datetime(text, format="%Y-%m-%d", errors="coerce")
+
+
+def records_to_frame(records: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Build a typed DataFrame from a list of records"""
+    frame = pd.DataFrame.from_records(records) if records else pd.DataFrame()
+    for name in frame.columns:
+        if name in DATE_FIELDS:
+            frame[name] = parse_dates(frame[name])
+        elif name in FLOAT_FIELDS:
+            frame[name] = pd.to_numeric(frame[name], errors="coerce")
+        elif name in CATEGORY_FIELDS:
+            frame[name] = frame[name].astype("category")
+    return frame
+
+
+def _column(name: str, values: List[Any]) -> "pa.Array":
+    """Convert the values of one field to a typed Arrow array"""
+    try:
+        if name in DATE_FIELDS:
+            return pa.Array.from_pandas(parse_dates(values)).cast(pa.date32())
+        if name in FLOAT_FIELDS:
+            return pa.array(values, pa.float64())
+        if name in INT_FIELDS:
+            return pa.array(values, pa.int64())
+        if name in BOOL_FIELDS:
+            return pa.array(values, pa.bool_())
+        if name in CATEGORY_FIELDS:
+            return pa.array(values, pa.string()).dictionary_encode()
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+        return pa.array([None if v is None else str(v) for v in values], pa.string())
+
+
+def write_table(path: Path, records: List[Dict[str, Any]], source: Dict[str, Any]) -> None:
+    """Write records as an uncompressed Arrow IPC file, tagged with the state it mirrors"""
+    names: Dict[str, None] = {}
+    for record in records:
+        for name in record:
+            names.setdefault(name, None)
+    columns = {name: _column(name, [record.get(name) for record in records]) for name in names}
+    table = pa.table(columns).replace_schema_metadata({"source": json.dumps(source)})
+    tmp_path = path.with_name(path.name + ".tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_table(path: Path) -> Optional["pa.Table"]:
+    """Open an Arrow snapshot through a memory map; its buffers stay on the mapped file"""
+    if not path.exists():
+        return None
+    try:
+        return pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+    except (pa.ArrowInvalid, OSError) as e:
+        print(f"[v0] Error reading columnar snapshot {path}: {e}")
+        return None
+
+
+def table_source(table: "pa.Table") -> Dict[str, Any]:
+    """Return the state tag written by write_table"""
+    metadata = table.schema.metadata or {}
+    try:
+        return json.loads(metadata.get(b"source", b"{}"))
+    except json.JSONDecodeError:
+        return {}
+
+
+def table_to_frame(table: "pa.Table") -> pd.DataFrame:
+    """Convert a snapshot to pandas without consolidating the column buffers"""
+    return table.to_pandas(split_blocks=True, date_as_object=False)
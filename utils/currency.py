@@ -0,0 +1,159 @@
+"""
+Exchange rate table and currency conversion for budget records
+"""
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from utils.journal import read_snapshot
+from utils.read_cache import file_signature
+from utils.record_store import MISSING_DAY, day_number
+
+# Devise de référence des totaux; les enregistrements sans devise y sont exprimés
+BASE_CURRENCY = "EUR"
+RATES_NAME = "exchange_rates.json"
+
+# Devises proposées dans les paramètres et les formulaires
+SUPPORTED_CURRENCIES: List[str] = ["EUR", "USD", "GBP", "CAD", "CHF", "FCFA"]
+CURRENCY_SYMBOLS: Dict[str, str] = {
+    "EUR": "€",
+    "USD": "$",
+    "GBP": "£",
+    "CAD": "CA$",
+    "CHF": "CHF",
+    "FCFA": "FCFA"
+}
+
+
+class RateTable:
+    """Rates of every currency against BASE_CURRENCY, indexed by date
+
+    The rate of a day is the one of the latest table date on or before it
+    (the earliest one for older days). Scalar factors are memoized per
+    (currency, day); bulk conversions look all the days up in one
+    searchsorted per currency.
+    """
+
+    _instances: Dict[Path, "RateTable"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.lock = threading.RLock()
+        self.signature: Any = None
+        self.days = np.empty(0, dtype=np.int32)
+        self.rates: Dict[str, np.ndarray] = {}
+        self._factors: Dict[Tuple[str, int], float] = {}
+
+    @classmethod
+    def for_path(cls, path: Path) -> "RateTable":
+        """Return the shared table of a rates file, reloaded when the file changes"""
+        key = path.resolve()
+        with cls._instances_lock:
+            table = cls._instances.get(key)
+            if table is None:
+                table = cls(path)
+                cls._instances[key] = table
+        table.refresh()
+        return table
+
+    def refresh(self) -> None:
+        """Reload the file if it changed; without a file the table is empty (see missing())"""
+        with self.lock:
+            signature = file_signature(self.path)
+            if signature == self.signature:
+                return
+            saved = read_snapshot(self.path)
+            self._load(saved[0].get("rates", {}) if saved else {})
+            self.signature = signature
+
+    def _load(self, table: Dict[str, Dict[str, float]]) -> None:
+        dated = sorted((day_number(key), rates) for key, rates in table.items() if day_number(key) != MISSING_DAY)
+        self.days = np.array([day for day, _ in dated], dtype=np.int32)
+        currencies = {currency for _, rates in dated for currency in rates} | {BASE_CURRENCY}
+        self.rates = {}
+        for currency in currencies:
+            column = np.array([rates.get(currency, np.nan) for _, rates in dated], dtype=np.float64)
+            if currency == BASE_CURRENCY:
+                column[:] = 1.0
+            # Une date sans cours pour une devise reprend le cours précédent (ou le suivant au début)
+            known = np.flatnonzero(~np.isnan(column))
+            if len(known) == 0:
+                continue
+            positions = np.searchsorted(known, np.arange(len(column)), side="right") - 1
+            column = column[known[np.clip(positions, 0, None)]]
+            self.rates[currency] = column
+        self._factors = {}
+
+    def currencies(self) -> List[str]:
+        return sorted(self.rates)
+
+    def missing(self, currencies: Iterable[Optional[str]]) -> List[str]:
+        """Currencies without any rate in the table; their amounts are counted unconverted"""
+        return sorted({c for c in currencies if c and c != BASE_CURRENCY and c not in self.rates})
+
+    def _positions(self, days: np.ndarray) -> np.ndarray:
+        return np.clip(np.searchsorted(self.days, days, side="right") - 1, 0, None)
+
+    def to_base(self, currency: Optional[str], day: int = MISSING_DAY) -> float:
+        """Factor converting an amount of a currency on a day into BASE_CURRENCY (memoized)"""
+        if currency is None or currency == BASE_CURRENCY:
+            return 1.0
+        key = (currency, day)
+        factor = self._factors.get(key)
+        if factor is None:
+            rates = self.rates.get(currency)
+            if rates is None or not len(self.days):
+                factor = 1.0
+            elif day == MISSING_DAY:
+                factor = 1.0 / float(rates[-1])
+            else:
+                factor = 1.0 / float(rates[self._positions(np.array([day]))[0]])
+            self._factors[key] = factor
+        return factor
+
+    def to_base_factors(self, currencies: List[str], codes: np.ndarray, days: np.ndarray) -> np.ndarray:
+        """Factors to BASE_CURRENCY for arrays of currency codes (into `currencies`, -1: base) and days"""
+        factors = np.ones(len(codes), dtype=np.float64)
+        if not len(self.days):
+            return factors
+        for code, currency in enumerate(currencies):
+            rates = self.rates.get(currency)
+            if currency == BASE_CURRENCY or rates is None:
+                continue
+            mask = codes == code
+            if not mask.any():
+                continue
+            selected = days[mask]
+            # Jours manquants: cours le plus récent
+            positions = np.where(selected == MISSING_DAY, len(self.days) - 1, self._positions(selected))
+            factors[mask] = 1.0 / rates[positions]
+        return factors
+
+    def record_to_base(self, record: Dict[str, Any]) -> float:
+        """Amount of a record converted into BASE_CURRENCY at the rate of its date"""
+        amount = record.get("amount", 0)
+        if not isinstance(amount, (int, float)):
+            return 0.0
+        currency = record.get("currency")
+        if currency is None or currency == BASE_CURRENCY:
+            return float(amount)
+        date = record.get("date")
+        return float(amount) * self.to_base(currency, day_number(date) if date is not None else MISSING_DAY)
+
+    def from_base(self, currency: str) -> float:
+        """Factor converting BASE_CURRENCY into a currency at the latest rate"""
+        rates = self.rates.get(currency)
+        return float(rates[-1]) if rates is not None and len(rates) else 1.0
+
+
+def missing_rates_message(missing: List[str]) -> str:
+    """Warning shown by the pages when some currencies have no rate ("" when none is missing)"""
+    if not missing:
+        return ""
+    return (
+        f"Cours de change manquants pour {', '.join(missing)} : ajoutez-les dans data/exchange_rates.json. "
+        "En attendant, ces montants sont comptés sans conversion."
+    )
@@ -0,0 +1,59 @@
+"""
+Sorted date index with prefix sums for range totals
+"""
+from typing import Tuple, Optional
+from datetime import date, timedelta
+
+import numpy as np
+
+
+def month_bounds(today: Optional[date] = None) -> Tuple[str, str]:
+    """First and last day (YYYY-MM-DD) of the month holding a date"""
+    today = today or date.today()
+    first = today.replace(day=1)
+    following = (first + timedelta(days=32)).replace(day=1)
+    return first.isoformat(), (following - timedelta(days=1)).isoformat()
+
+
+class DateIndex:
+    """Day numbers sorted ascending with the running sum of their amounts
+
+    between(start, end) is two binary searches and a subtraction: O(log N).
+    Records arriving in date order are appended in amortized O(1); an
+    out-of-order record makes append() return False so that the owner
+    rebuilds the index.
+    """
+
+    def __init__(self, days: np.ndarray, amounts: np.ndarray) -> None:
+        order = np.argsort(days, kind="stable")
+        self.size = len(days)
+        capacity = max(1024, self.size * 2)
+        self.days = np.empty(capacity, dtype=np.int32)
+        self.days[: self.size] = days[order]
+        # prefix[i] = somme des i premiers montants
+        self.prefix = np.zeros(capacity + 1, dtype=np.float64)
+        np.cumsum(amounts[order], out=self.prefix[1 : self.size + 1])
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, day: int, amount: float) -> bool:
+        """Add a record dated on or after the last indexed day"""
+        if self.size and day < self.days[self.size - 1]:
+            return False
+        if self.size == len(self.days):
+            self.days = np.concatenate([self.days, np.empty(len(self.days), dtype=np.int32)])
+            self.prefix = np.concatenate([self.prefix, np.zeros(len(self.days) - len(self.prefix) + 1)])
+        self.days[self.size] = day
+        self.prefix[self.size + 1] = self.prefix[self.size] + amount
+        self.size += 1
+        return True
+
+    def between(self, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[float, int]:
+        """Sum and count of the records whose day is in [start, end] (None: unbounded)"""
+        days = self.days[: self.size]
+        lo = 0 if start is None else int(np.searchsorted(days, start, side="left"))
+        hi = self.size if end is None else int(np.searchsorted(days, end, side="right"))
+        if hi <= lo:
+            return 0.0, 0
+        return float(self.prefix[hi] - self.prefix[lo]), hi - lo
@@ -0,0 +1,144 @@
+"""
+Content-hash index of records, to skip transactions already stored
+"""
+from typing import List, Dict, Any, Optional, Tuple
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from utils.record_store import MISSING_DAY, RecordStore, day_number
+from utils.rollup import _plain
+from utils.text_index import fold
+
+_MASK = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+
+
+def text_hash(text: Optional[str]) -> int:
+    """64-bit hash of a description or source, ignoring case, accents and spacing"""
+    normalized = " ".join(fold(text or "").split())
+    return int.from_bytes(hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _mix(days: np.ndarray, cents: np.ndarray, texts: np.ndarray) -> np.ndarray:
+    """Combine day, amount in cents and text hash into one 64-bit key (splitmix64 finalizer)"""
+    with np.errstate(over="ignore"):
+        key = texts.astype(np.uint64)
+        for part in (days.astype(np.int64).astype(np.uint64), cents.astype(np.int64).astype(np.uint64)):
+            key = (key ^ part) * np.uint64(_GOLDEN)
+            key ^= key >> np.uint64(31)
+    return key
+
+
+def _mix_one(day: int, cents: int, text: int) -> int:
+    """_mix for a single record, in plain integers"""
+    key = text
+    for part in (day & _MASK, cents & _MASK):
+        key = ((key ^ part) * _GOLDEN) & _MASK
+        key ^= key >> 31
+    return key
+
+
+def content_key(record: Dict[str, Any], text_field: str) -> int:
+    """Key of a record: its date, its amount to the cent and its normalized text"""
+    amount = record.get("amount", 0)
+    cents = round(float(amount) * 100) if isinstance(amount, (int, float)) else 0
+    date = record.get("date")
+    day = day_number(date) if date is not None else MISSING_DAY
+    text = record.get(text_field)
+    hashed = text_hash(None if text is None else str(text))
+    return _mix_one(day, cents, hashed)
+
+
+class DedupIndex:
+    """Number of stored records per content key
+
+    Counts, not a set: two identical coffees on the same day are two real
+    transactions. A batch keeps the n-th occurrence of a key only if fewer
+    than n records with that key are already stored, so importing a
+    statement twice, or two overlapping ones, adds each transaction once.
+    Lookups and updates are O(1) per record; the index is rebuilt from the
+    typed columns of a record store in a few vectorized passes.
+    """
+
+    def __init__(self, text_field: str) -> None:
+        self.text_field = text_field
+        self.lock = threading.Lock()
+        self.counts: Dict[int, int] = {}
+        # Signature des données au moment de la dernière sauvegarde
+        self.source: Any = None
+
+    @classmethod
+    def from_store(cls, store: RecordStore) -> "DedupIndex":
+        """Index the live records of a store"""
+        index = cls(store.text_field)
+        n = store.size
+        alive = store.alive[:n]
+        # Un hachage par texte distinct, pas par enregistrement
+        hashes = np.array([text_hash(text) for text in store.texts.strings] + [text_hash(None)], dtype=np.uint64)
+        keys = _mix(
+            store.days[:n][alive],
+            np.round(store.amounts[:n][alive] * 100),
+            hashes[store.text_codes[:n][alive]],
+        )
+        unique, counts = np.unique(keys, return_counts=True)
+        index.counts = dict(zip(unique.tolist(), counts.tolist()))
+        return index
+
+    def contains(self, record: Dict[str, Any]) -> bool:
+        return content_key(record, self.text_field) in self.counts
+
+    def new_records(self, records: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        """Records of a batch not already stored, and the number of duplicates skipped"""
+        kept: List[Dict[str, Any]] = []
+        seen: Dict[int, int] = {}
+        with self.lock:
+            for record in records:
+                key = content_key(record, self.text_field)
+                occurrence = seen.get(key, 0)
+                seen[key] = occurrence + 1
+                if occurrence >= self.counts.get(key, 0):
+                    kept.append(record)
+        return kept, len(records) - len(kept)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        key = content_key(record, self.text_field)
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def remove(self, record: Dict[str, Any]) -> None:
+        key = content_key(record, self.text_field)
+        with self.lock:
+            count = self.counts.get(key, 0) - 1
+            if count > 0:
+                self.counts[key] = count
+            else:
+                self.counts.pop(key, None)
+
+    def save(self, path: Path, source: Any) -> None:
+        """Persist the keys and counts (NumPy archive) with the signature of the data"""
+        with self.lock:
+            keys = np.fromiter(self.counts.keys(), dtype=np.uint64, count=len(self.counts))
+            counts = np.fromiter(self.counts.values(), dtype=np.int64, count=len(self.counts))
+        temp = path.with_name(path.name + ".tmp")
+        with open(temp, "wb") as f:
+            np.savez(f, keys=keys, counts=counts, source=np.array(json.dumps(_plain(source))))
+        os.replace(temp, path)
+
+    @classmethod
+    def load(cls, path: Path, source: Any, text_field: str) -> Optional["DedupIndex"]:
+        """Load a persisted index, or None if it was computed from other data"""
+        try:
+            with np.load(path) as saved:
+                if json.loads(str(saved["source"])) != _plain(source):
+                    return None
+                index = cls(text_field)
+                index.counts = dict(zip(saved["keys"].tolist(), saved["counts"].tolist()))
+        except (OSError, ValueError, KeyError):
+            return None
+        index.source = source
+        return index
@@ -0,0 +1,172 @@
+"""
+Streaming export of every collection into a compressed NDJSON archive
+"""
+from typing import List, Dict, Any, Optional, Iterable
+from datetime import datetime
+from pathlib import Path
+import hashlib
+import json
+import os
+import zipfile
+
+from utils.codec import dumps_line
+
+EXPORT_DIR = "exports"
+EXPORT_FORMAT = "budget-export"
+EXPORT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+# Collections exportées, dans l'ordre de l'archive
+EXPORT_COLLECTIONS = ("income", "expenses", "savings_goals", "budget_categories", "settings")
+# Lignes encodées puis écrites ensemble dans l'archive
+LINES_PER_WRITE = 1000
+# Octets lus à la fois pour vérifier une archive
+READ_BLOCK_SIZE = 1 << 20
+
+
+class ExportProgress:
+    """Counters of an export, updated as records are written and read by the page while it runs"""
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.records = 0
+        self.collection: Optional[str] = None
+        self.path: Optional[Path] = None
+        self.done = False
+        self.error: Optional[str] = None
+
+    @property
+    def percent(self) -> float:
+        if self.done:
+            return 100.0
+        return min(self.records / self.total * 100, 99.0) if self.total else 0.0
+
+
+def count_records(data_manager: Any, collection: str) -> int:
+    """Number of records of a collection, for the progress (the typed columns are already in memory)"""
+    if collection in ("expenses", "income"):
+        store = data_manager.record_store(collection)
+        return int(store.alive[: store.size].sum())
+    return len(data_manager.load_data(collection))
+
+
+def _write_collection(archive: zipfile.ZipFile, name: str, records: Any, progress: ExportProgress) -> Dict[str, Any]:
+    """Write a stream of records as one NDJSON member; returns its manifest entry"""
+    digest = hashlib.sha256()
+    count = size = 0
+    lines: List[str] = []
+    with archive.open(name, "w", force_zip64=True) as member:
+        def write() -> None:
+            nonlocal size
+            data = "".join(lines).encode("utf-8")
+            digest.update(data)
+            member.write(data)
+            size += len(data)
+            progress.records += len(lines)
+            lines.clear()
+
+        for record in records:
+            lines.append(dumps_line(record) + "\n")
+            count += 1
+            if len(lines) >= LINES_PER_WRITE:
+                write()
+        write()
+    return {"file": name, "records": count, "bytes": size, "sha256": digest.hexdigest()}
+
+
+def export_collections(
+    data_manager: Any,
+    progress: Optional[ExportProgress] = None,
+    directory: Optional[Any] = None,
+    collections: Optional[List[str]] = None,
+) -> ExportProgress:
+    """Export collections into data/exports/budget-export-<timestamp>.zip, one record at a time
+
+    Each collection becomes a deflated <collection>.ndjson member written
+    from DataManager.iter_records, so memory does not grow with the data.
+    manifest.json lists the record count, size and SHA-256 of every member,
+    and a <archive>.sha256 file next to the archive holds the checksum of
+    the archive itself. The archive is written under a temporary name and
+    only appears once complete.
+    """
+    progress = progress or ExportProgress()
+    collections = list(collections or EXPORT_COLLECTIONS)
+    directory = Path(directory) if directory is not None else data_manager.data_dir / EXPORT_DIR
+    try:
+        progress.total = sum(count_records(data_manager, name) for name in collections)
+        write_archive(directory, EXPORT_FORMAT, {name: data_manager.iter_records(name) for name in collections}, progress)
+    except Exception as e:
+        print(f"[v0] Error exporting data: {e}")
+        progress.error = str(e)
+    progress.done = True
+    return progress
+
+
+def write_archive(
+    directory: Path,
+    prefix: str,
+    streams: Dict[str, Iterable[Dict[str, Any]]],
+    progress: ExportProgress,
+    manifest: Optional[Dict[str, Any]] = None,
+) -> Path:
+    """Write record streams as the NDJSON members of <directory>/<prefix>-<date>.zip, with manifest and checksums
+
+    `manifest` holds extra fields for manifest.json; it may be completed
+    while the streams are read, since the manifest is written last.
+    """
+    exported_at = datetime.now()
+    path = directory / f"{prefix}-{exported_at:%Y%m%d-%H%M%S-%f}.zip"
+    temp = path.with_name(path.name + ".tmp")
+    manifest = manifest if manifest is not None else {}
+    manifest.update({"format": EXPORT_FORMAT, "version": EXPORT_VERSION, "export_date": exported_at.isoformat()})
+    members: Dict[str, Any] = {}
+    directory.mkdir(parents=True, exist_ok=True)
+    try:
+        with zipfile.ZipFile(temp, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for name, records in streams.items():
+                progress.collection = name
+                members[name] = _write_collection(archive, f"{name}.ndjson", records, progress)
+            manifest["collections"] = members
+            archive.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2, ensure_ascii=False))
+        os.replace(temp, path)
+    finally:
+        temp.unlink(missing_ok=True)
+    path.with_name(path.name + ".sha256").write_text(f"{file_sha256(path)}  {path.name}\n", encoding="utf-8")
+    progress.path = path
+    return path
+
+
+def file_sha256(path: Path) -> str:
+    """SHA-256 of a file, read by blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_manifest(path: Any) -> Dict[str, Any]:
+    """Manifest of an export archive"""
+    with zipfile.ZipFile(path) as archive:
+        return json.loads(archive.read(MANIFEST_NAME))
+
+
+def verify_export(path: Any) -> bool:
+    """Whether every member of an export archive matches the size and checksum of its manifest"""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            manifest = json.loads(archive.read(MANIFEST_NAME))
+            for entry in manifest["collections"].values():
+                digest = hashlib.sha256()
+                size = 0
+                with archive.open(entry["file"]) as member:
+                    for block in iter(lambda: member.read(READ_BLOCK_SIZE), b""):
+                        digest.update(block)
+                        size += len(block)
+                if size != entry["bytes"] or digest.hexdigest() != entry["sha256"]:
+                    print(f"[v0] Checksum mismatch for {entry['file']} in {path}")
+                    return False
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+        print(f"[v0] Error verifying export {path}: {e}")
+        return False
+    return True
@@ -0,0 +1,109 @@
+"""
+Monte Carlo forecast of savings-goal completion dates
+"""
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import date
+import threading
+
+import numpy as np
+
+from utils.projection import month_index, month_key
+
+# Nombre de trajectoires simulées et horizon en mois
+PATHS = 2000
+HORIZON_MONTHS = 120
+# Mois d'historique utilisés pour estimer l'épargne mensuelle
+HISTORY_MONTHS = 12
+
+_cache: Dict[Tuple[Any, ...], List[Dict[str, Any]]] = {}
+_cache_lock = threading.Lock()
+
+
+def savings_rate(income_months: Dict[str, float], expense_months: Dict[str, float], months: List[str]) -> Tuple[float, float]:
+    """Mean and standard deviation of the monthly net savings over some months"""
+    # Les mois antérieurs au premier enregistrement ne comptent pas comme une épargne nulle
+    recorded = [m for m in months if m in income_months or m in expense_months]
+    months = [m for m in months if recorded and m >= recorded[0]]
+    net = np.array([income_months.get(m, 0.0) - expense_months.get(m, 0.0) for m in months], dtype=np.float64)
+    if not len(net):
+        return 0.0, 0.0
+    mean = float(net.mean())
+    # Avec un seul mois d'historique, l'incertitude est fixée à 25 % de la moyenne
+    std = float(net.std(ddof=1)) if len(net) > 1 else abs(mean) * 0.25
+    return mean, std
+
+
+def simulate(
+    current: np.ndarray,
+    target: np.ndarray,
+    mean: float,
+    std: float,
+    paths: int = PATHS,
+    horizon: int = HORIZON_MONTHS,
+    seed: int = 0,
+) -> np.ndarray:
+    """Months needed by each goal on each simulated path (paths x goals), horizon + 1 if never reached
+
+    Every path draws `horizon` monthly net savings, negative months counting
+    as zero, split evenly between the goals. All goals and paths are solved
+    at once with a single searchsorted over the cumulative savings.
+    """
+    goals = len(target)
+    rng = np.random.default_rng(seed)
+    monthly = np.clip(rng.normal(mean, std, size=(paths, horizon)), 0.0, None) / max(goals, 1)
+    cumulative = np.cumsum(monthly, axis=1)
+    remaining = np.clip(target - current, 0.0, None)
+    # Décalage de chaque trajectoire au-dessus du maximum de la précédente: un seul tableau trié
+    offsets = (np.arange(paths) * (cumulative[:, -1].max() + remaining.max() + 1.0))[:, None]
+    flat = (cumulative + offsets).ravel()
+    found = np.searchsorted(flat, (remaining[None, :] + offsets).ravel(), side="left").reshape(paths, goals)
+    months = found - np.arange(paths)[:, None] * horizon + 1
+    months[:, remaining <= 0] = 0
+    return np.minimum(months, horizon + 1)
+
+
+def forecast_goals(
+    goals: List[Dict[str, Any]],
+    mean: float,
+    std: float,
+    today: Optional[date] = None,
+    paths: int = PATHS,
+    horizon: int = HORIZON_MONTHS,
+) -> List[Dict[str, Any]]:
+    """Median completion month, 10%-90% band and probability of completion for each goal"""
+    if not goals:
+        return []
+    current = np.array([float(g.get("current", 0) or 0) for g in goals])
+    target = np.array([float(g.get("target", 0) or 0) for g in goals])
+    months = simulate(current, target, mean, std, paths, horizon)
+    low, median, high = np.percentile(months, [10, 50, 90], axis=0, method="lower")
+    reached = (months <= horizon).mean(axis=0)
+    base = month_index(today or date.today())
+
+    def when(m: int) -> Optional[str]:
+        return month_key(base + int(m)) if m <= horizon else None
+
+    return [
+        {
+            "id": goal.get("id"),
+            "progress": float(min(current[i] / target[i] * 100, 100.0)) if target[i] > 0 else 0.0,
+            "median": when(median[i]),
+            "low": when(low[i]),
+            "high": when(high[i]),
+            "probability": float(reached[i] * 100),
+        }
+        for i, goal in enumerate(goals)
+    ]
+
+
+def cached_forecast(key: Tuple[Any, ...], goals: List[Dict[str, Any]], mean: float, std: float, **options: Any) -> List[Dict[str, Any]]:
+    """forecast_goals memoized on a key describing the data it depends on"""
+    with _cache_lock:
+        result = _cache.get(key)
+    if result is None:
+        result = forecast_goals(goals, mean, std, **options)
+        with _cache_lock:
+            # Seule la dernière prévision est utile: les anciennes clés ne reviennent pas
+            _cache.clear()
+            _cache[key] = result
+    return result
@@ -0,0 +1,69 @@
+"""
+Persistent record id allocator for budget collections
+"""
+from typing import Dict, Any, Callable, Iterable
+import threading
+from pathlib import Path
+
+from utils.journal import read_snapshot, write_snapshot
+
+COUNTERS_NAME = "id_counters.json"
+
+
+class IdAllocator:
+    """Hand out increasing ids per collection, stored in data/id_counters.json
+
+    Ids are never reused, even after a deletion: `len(records) + 1` would
+    give a deleted record's id to the next one added.
+    """
+
+    _instances: Dict[Path, "IdAllocator"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        # read_snapshot renvoie l'objet du fichier dans une liste
+        for loaded in read_snapshot(path)[:1]:
+            self._counters = {k: int(v) for k, v in loaded.items() if isinstance(v, int)}
+
+    @classmethod
+    def for_path(cls, path: Path) -> "IdAllocator":
+        """Return the shared allocator of a counters file"""
+        key = path.resolve()
+        with cls._instances_lock:
+            allocator = cls._instances.get(key)
+            if allocator is None:
+                allocator = cls(path)
+                cls._instances[key] = allocator
+            return allocator
+
+    def next_id(self, collection: str, existing: Callable[[], Iterable[Dict[str, Any]]]) -> int:
+        """Return a new id for a collection
+
+        `existing` streams the current records; it is only read the first
+        time a collection is seen, to start after its highest id.
+        """
+        return self.next_ids(collection, 1, existing)[0]
+
+    def next_ids(self, collection: str, count: int, existing: Callable[[], Iterable[Dict[str, Any]]]) -> range:
+        """Reserve `count` consecutive new ids for a collection, with one write of the counters"""
+        with self.lock:
+            last = self._counters.get(collection)
+            if last is None:
+                ids = (r.get("id") for r in existing())
+                last = max((i for i in ids if isinstance(i, int)), default=0)
+            self._counters[collection] = last + count
+            write_snapshot(self.path, self._counters)
+            return range(last + 1, last + count + 1)
+
+    def raise_to(self, collection: str, max_id: int) -> None:
+        """Make sure the ids handed out for a collection start after `max_id` (ids written without next_id)"""
+        with self.lock:
+            last = self._counters.get(collection)
+            # Compteur encore inconnu: next_ids partira des identifiants existants
+            if last is None or last >= max_id:
+                return
+            self._counters[collection] = max_id
+            write_snapshot(self.path, self._counters)
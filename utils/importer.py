@@ -0,0 +1,287 @@
+"""
+Streaming import of bank statements (CSV, OFX) into expenses and income
+"""
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+import csv
+import io
+import re
+
+from utils.currency import BASE_CURRENCY
+from utils.text_index import fold
+
+# Lignes lues, validées et écrites ensemble
+CHUNK_SIZE = 5000
+# Octets lus à la fois dans un relevé OFX
+OFX_BLOCK_SIZE = 1 << 16
+
+# Noms de colonnes reconnus (sans accents ni ponctuation) pour chaque champ, par priorité
+HEADER_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "date": ("date", "date operation", "date d operation", "date de l operation", "date comptable", "date valeur"),
+    "amount": ("amount", "montant", "montant eur", "montant en euros", "valeur"),
+    "debit": ("debit", "debit eur", "montant debit"),
+    "credit": ("credit", "credit eur", "montant credit"),
+    "description": ("description", "libelle", "libelle operation", "libelle de l operation", "label", "memo", "nom"),
+    "category": ("category", "categorie"),
+    "currency": ("currency", "devise"),
+}
+
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y", "%d.%m.%Y", "%Y%m%d")
+_OFX_TRANSACTION = re.compile(r"<STMTTRN>(.*?)</STMTTRN>", re.IGNORECASE | re.DOTALL)
+_OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+_OFX_CURRENCY = re.compile(r"<CURDEF>\s*(\w+)", re.IGNORECASE)
+# Partie entière qui pourrait aussi être le premier groupe de milliers ("1,234")
+_AMBIGUOUS_INTEGER = re.compile(r"[+-]?[1-9]\d{0,2}")
+
+
+class ImportProgress:
+    """Counters of an import, updated chunk by chunk and read by the page while it runs"""
+
+    def __init__(self, total_bytes: int = 0) -> None:
+        self.total_bytes = total_bytes
+        self.bytes_read = 0
+        self.rows = 0
+        self.expenses = 0
+        self.income = 0
+        self.rejected = 0
+        # Transactions déjà enregistrées (même date, montant et libellé), non réimportées
+        self.duplicates = 0
+        self.done = False
+        self.error: Optional[str] = None
+
+    @property
+    def percent(self) -> float:
+        if self.done:
+            return 100.0
+        return min(self.bytes_read / self.total_bytes * 100, 99.0) if self.total_bytes else 0.0
+
+
+def parse_amount(value: Any) -> Optional[float]:
+    """Amount of a statement cell: "1 234,56", "1,234.56", "1.234,56", "-12.30", "12,30 €"
+
+    The last of "," and "." is the decimal separator and the other one
+    groups thousands; a separator repeated ("1.234.567") groups thousands.
+    A single separator followed by three digits ("1,234", "1.234") could be
+    either, so the value is rejected (None) instead of being guessed.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = re.sub(r"[\s  €$£]", "", str(value or ""))
+    if not text:
+        return None
+    last = max(text.rfind(","), text.rfind("."))
+    if last >= 0:
+        mark = text[last]
+        other = "." if mark == "," else ","
+        if text.count(mark) > 1:
+            integer, decimals, grouping = text, "", mark
+            if other in text:
+                return None
+        else:
+            integer, decimals = text[:last], text[last + 1:]
+            grouping = other if other in integer else ""
+            if not grouping and len(decimals) == 3 and _AMBIGUOUS_INTEGER.fullmatch(integer):
+                print(f"[v0] Ambiguous amount {value!r}: decimal or thousands separator")
+                return None
+        if grouping:
+            if not re.fullmatch(rf"[+-]?\d{{1,3}}(?:{re.escape(grouping)}\d{{3}})*", integer):
+                return None
+            integer = integer.replace(grouping, "")
+        text = f"{integer}.{decimals}" if decimals else integer
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_date(value: Any) -> Optional[str]:
+    """ISO date (YYYY-MM-DD) of a statement cell, or None"""
+    return _parse_date(str(value or "").strip())
+
+
+# Un relevé répète les mêmes dates sur des milliers de lignes: une analyse par date distincte
+@lru_cache(maxsize=4096)
+def _parse_date(text: str) -> Optional[str]:
+    # Dates OFX: AAAAMMJJ suivi éventuellement de l'heure et du fuseau
+    if len(text) >= 8 and text[:8].isdigit():
+        text = text[:8]
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def normalize(fields: Dict[str, Any], currency: str = BASE_CURRENCY) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Turn a statement line into ("expenses" | "income", record), or None if it is not usable
+
+    Negative amounts (or debits) are expenses, positive ones (or credits)
+    are income; the record id is assigned when the chunk is written.
+    """
+    day = parse_date(fields.get("date"))
+    amount = parse_amount(fields.get("amount"))
+    if amount is None:
+        debit, credit = parse_amount(fields.get("debit")), parse_amount(fields.get("credit"))
+        if debit is None and credit is None:
+            return None
+        amount = (credit or 0.0) - abs(debit or 0.0)
+    if day is None or not amount:
+        return None
+    text = " ".join(str(fields.get("description") or "").split())
+    record_currency = str(fields.get("currency") or "").strip().upper() or currency
+    if amount < 0:
+        return "expenses", {
+            "category": str(fields.get("category") or "").strip() or "Autre",
+            "description": text,
+            "amount": round(-amount, 2),
+            "date": day,
+            "currency": record_currency,
+        }
+    return "income", {
+        "source": text,
+        "amount": round(amount, 2),
+        "date": day,
+        "recurring": False,
+        "currency": record_currency,
+    }
+
+
+def _open_text(raw: io.BufferedReader) -> io.TextIOWrapper:
+    """Text view of a statement: UTF-8 if its beginning decodes, Windows-1252 (banques françaises) otherwise"""
+    head = raw.peek(OFX_BLOCK_SIZE)[:OFX_BLOCK_SIZE]
+    try:
+        head.decode("utf-8")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError as e:
+        # Un caractère multi-octet coupé en fin d'extrait n'est pas une erreur
+        encoding = "utf-8-sig" if e.start >= len(head) - 3 else "cp1252"
+    return io.TextIOWrapper(raw, encoding=encoding, errors="replace", newline="")
+
+
+def _header_map(header: List[str]) -> Dict[str, int]:
+    """Column index of each known field in a CSV header"""
+    names = [" ".join(re.findall(r"[a-z0-9]+", fold(name))) for name in header]
+    columns: Dict[str, int] = {}
+    for field, aliases in HEADER_ALIASES.items():
+        for alias in aliases:
+            if alias in names:
+                columns[field] = names.index(alias)
+                break
+    return columns
+
+
+def iter_csv_chunks(path: Path, chunk_size: int = CHUNK_SIZE, progress: Optional[ImportProgress] = None) -> Iterator[List[Dict[str, str]]]:
+    """Stream the rows of a CSV statement as lists of {field: cell}, `chunk_size` rows at a time"""
+    with open(path, "rb") as raw:
+        text = _open_text(raw)
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect: Any = csv.Sniffer().sniff(sample, delimiters=";,\t|")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(text, dialect)
+        columns = _header_map(next(reader, []))
+        if "date" not in columns or not ({"amount", "debit", "credit"} & set(columns)):
+            raise ValueError("Colonnes date et montant introuvables dans l'en-tête du CSV")
+        while True:
+            rows = list(islice(reader, chunk_size))
+            if not rows:
+                return
+            if progress is not None:
+                progress.bytes_read = raw.tell()
+            yield [
+                {field: row[index] for field, index in columns.items() if index < len(row)}
+                for row in rows
+            ]
+
+
+def iter_ofx_chunks(path: Path, chunk_size: int = CHUNK_SIZE, progress: Optional[ImportProgress] = None) -> Iterator[List[Dict[str, str]]]:
+    """Stream the transactions of an OFX statement (SGML or XML), `chunk_size` at a time
+
+    The file is read by blocks; only the text after the last complete
+    <STMTTRN> element is carried over to the next block.
+    """
+    currency = ""
+    chunk: List[Dict[str, str]] = []
+    with open(path, "rb") as raw:
+        text = _open_text(raw)
+        buffer = ""
+        while True:
+            block = text.read(OFX_BLOCK_SIZE)
+            buffer += block
+            if not currency:
+                found = _OFX_CURRENCY.search(buffer)
+                currency = found.group(1).upper() if found else ""
+            end = 0
+            for match in _OFX_TRANSACTION.finditer(buffer):
+                tags = {name.upper(): value.strip() for name, value in _OFX_FIELD.findall(match.group(1))}
+                name, memo = tags.get("NAME", ""), tags.get("MEMO", "")
+                chunk.append({
+                    "date": tags.get("DTPOSTED", ""),
+                    "amount": tags.get("TRNAMT", ""),
+                    "description": f"{name} {memo}" if memo and memo != name else name or memo,
+                    "currency": currency,
+                })
+                end = match.end()
+                if len(chunk) >= chunk_size:
+                    if progress is not None:
+                        progress.bytes_read = raw.tell()
+                    yield chunk
+                    chunk = []
+            buffer = buffer[end:]
+            if not block:
+                break
+    if chunk:
+        yield chunk
+
+
+def import_statement(
+    data_manager: Any,
+    path: Any,
+    progress: Optional[ImportProgress] = None,
+    currency: str = BASE_CURRENCY,
+    chunk_size: int = CHUNK_SIZE,
+) -> ImportProgress:
+    """Import a CSV or OFX statement chunk by chunk through DataManager.extend_data
+
+    Memory stays bounded by the chunk size: each chunk is validated,
+    normalized, stripped of the transactions already stored, categorized
+    by the rules when the statement gives no category, given a block of
+    ids and written as one batch per collection before the next one is read.
+    """
+    path = Path(path)
+    progress = progress or ImportProgress()
+    progress.total_bytes = path.stat().st_size
+    chunks = iter_ofx_chunks if path.suffix.lower() in (".ofx", ".qfx") else iter_csv_chunks
+    try:
+        for rows in chunks(path, chunk_size, progress):
+            batches: Dict[str, List[Dict[str, Any]]] = {"expenses": [], "income": []}
+            for fields in rows:
+                normalized = normalize(fields, currency)
+                if normalized is None:
+                    progress.rejected += 1
+                else:
+                    batches[normalized[0]].append(normalized[1])
+            for collection, records in batches.items():
+                records, skipped = data_manager.new_records(collection, records)
+                progress.duplicates += skipped
+                if not records:
+                    continue
+                if collection == "expenses":
+                    data_manager.categorize(records)
+                ids = data_manager.next_ids(collection, len(records))
+                records = [{"id": record_id, **record} for record_id, record in zip(ids, records)]
+                if not data_manager.extend_data(collection, records):
+                    raise IOError(f"Échec de l'écriture de {collection}")
+                setattr(progress, collection, getattr(progress, collection) + len(records))
+            progress.rows += len(rows)
+    except Exception as e:
+        print(f"[v0] Error importing statement: {e}")
+        progress.error = str(e)
+    progress.done = True
+    return progress
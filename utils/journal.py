@@ -0,0 +1,225 @@
+"""
+Append-only journal storage for budget collections
+"""
+from typing import List, Dict, Any, Optional, Union, Iterable, Iterator, Tuple
+import os
+import threading
+from pathlib import Path
+
+from utils import codec
+from utils.json_stream import iter_json_stream
+
+# Nombre d'entrées de journal au-delà duquel un compactage est lancé
+COMPACT_THRESHOLD = 1000
+# ... si le journal pèse aussi au moins cette fraction de l'instantané: un import massif ne
+# réécrit pas tout l'instantané à chaque lot, le coût des compactages reste proportionnel aux ajouts
+COMPACT_RATIO = 0.25
+
+
+def read_snapshot(path: Path) -> List[Dict[str, Any]]:
+    """Read a JSON snapshot file and return its records"""
+    if not path.exists():
+        return []
+    with open(path, "rb") as f:
+        data = codec.loads(f.read())
+    if isinstance(data, dict):
+        return [data]
+    if isinstance(data, list):
+        return [item for item in data if isinstance(item, dict)]
+    print(f"[v0] Unexpected data format in {path}: {type(data)}")
+    return []
+
+
+def write_snapshot(path: Path, data: Union[List[Dict[str, Any]], Dict[str, Any]]) -> None:
+    """Write a JSON snapshot file through a temporary file and an atomic rename"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(codec.dumps(data))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CollectionJournal:
+    """Snapshot file plus an append-only JSONL log of changes for one collection"""
+
+    _instances: Dict[Path, "CollectionJournal"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, snapshot_path: Path) -> None:
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path.with_suffix(".journal.jsonl")
+        self.lock = threading.RLock()
+        self._entries: Optional[int] = None
+        self._compacting = False
+
+    @classmethod
+    def for_path(cls, snapshot_path: Path) -> "CollectionJournal":
+        """Return the shared journal of a snapshot file"""
+        key = snapshot_path.resolve()
+        with cls._instances_lock:
+            journal = cls._instances.get(key)
+            if journal is None:
+                journal = cls(snapshot_path)
+                cls._instances[key] = journal
+            return journal
+
+    def entry_count(self) -> int:
+        """Number of entries not yet compacted into the snapshot"""
+        with self.lock:
+            if self._entries is None:
+                self._entries = 0
+                if self.journal_path.exists():
+                    with open(self.journal_path, "r", encoding="utf-8") as f:
+                        self._entries = sum(1 for line in f if line.strip())
+            return self._entries
+
+    def append(self, op: str, record: Dict[str, Any]) -> None:
+        """Append one change to the journal"""
+        line = codec.dumps_line({"op": op, "record": record})
+        with self.lock:
+            count = self.entry_count()
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self._entries = count + 1
+        self._maybe_compact()
+
+    def extend(self, op: str, records: List[Dict[str, Any]]) -> None:
+        """Append one change per record to the journal, in a single write"""
+        lines = "".join(codec.dumps_line({"op": op, "record": record}) + "\n" for record in records)
+        with self.lock:
+            count = self.entry_count()
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+            self._entries = count + len(records)
+        self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        if self._entries < COMPACT_THRESHOLD:
+            return
+        try:
+            snapshot = self.snapshot_path.stat().st_size
+            if self.journal_path.stat().st_size < snapshot * COMPACT_RATIO:
+                return
+        except OSError:
+            pass
+        self.compact_in_background()
+
+    def _entries_from(self, skip: int = 0) -> Iterator[Dict[str, Any]]:
+        """Iterate over the journal entries, skipping the first ones"""
+        if not self.journal_path.exists():
+            return
+        index = 0
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                index += 1
+                if index <= skip:
+                    continue
+                try:
+                    entry = codec.loads(line)
+                except ValueError:
+                    # Ligne tronquée par un arrêt brutal pendant l'écriture
+                    print(f"[v0] Skipping corrupted journal entry in {self.journal_path}")
+                    continue
+                yield entry
+
+    def replay(self) -> List[Dict[str, Any]]:
+        """Load the snapshot and apply every journal entry on top of it"""
+        with self.lock:
+            records = read_snapshot(self.snapshot_path)
+            added, changes = self._split_entries(self._entries_from())
+            records.extend(added)
+            return list(self._patched(records, changes)) if changes else records
+
+    def iter_replay(self) -> Iterator[Dict[str, Any]]:
+        """Stream the snapshot records, then the records added by the journal"""
+        with self.lock:
+            # Le fichier ouvert reste lisible même si un compactage le remplace
+            snapshot = open(self.snapshot_path, "r", encoding="utf-8") if self.snapshot_path.exists() else None
+            # Le journal est borné par le compactage: il est lu d'un coup
+            added, changes = self._split_entries(self._entries_from())
+        try:
+            if snapshot is not None:
+                yield from self._patched(iter_json_stream(snapshot, str(self.snapshot_path)), changes)
+            yield from self._patched(added, changes)
+        finally:
+            if snapshot is not None:
+                snapshot.close()
+
+    def read_entries(self, skip: int = 0) -> List[Dict[str, Any]]:
+        """Return the journal entries written after the first `skip` ones"""
+        with self.lock:
+            return list(self._entries_from(skip))
+
+    def _split_entries(
+        self, entries: Iterable[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], Dict[Any, Optional[Dict[str, Any]]]]:
+        """Separate added records from updates and deletions, keyed by id (last one wins)"""
+        added: List[Dict[str, Any]] = []
+        changes: Dict[Any, Optional[Dict[str, Any]]] = {}
+        for entry in entries:
+            op = entry.get("op")
+            record = entry.get("record")
+            if not isinstance(record, dict):
+                op = None
+            if op == "add":
+                added.append(record)
+            elif op == "update":
+                changes[record.get("id")] = record
+            elif op == "delete":
+                changes[record.get("id")] = None
+            else:
+                print(f"[v0] Unknown journal entry in {self.journal_path}: {op}")
+        return added, changes
+
+    @staticmethod
+    def _patched(
+        records: Iterable[Dict[str, Any]], changes: Dict[Any, Optional[Dict[str, Any]]]
+    ) -> Iterator[Dict[str, Any]]:
+        """Replace updated records and drop deleted ones"""
+        for record in records:
+            record_id = record.get("id")
+            if changes and record_id in changes:
+                replacement = changes[record_id]
+                if replacement is None:
+                    continue
+                record = replacement
+            yield record
+
+    def rewrite(self, data: Union[List[Dict[str, Any]], Dict[str, Any]]) -> None:
+        """Replace the whole collection: write a new snapshot and reset the journal"""
+        with self.lock:
+            write_snapshot(self.snapshot_path, data)
+            self._truncate()
+
+    def compact(self) -> None:
+        """Fold the journal into a new snapshot"""
+        with self.lock:
+            write_snapshot(self.snapshot_path, self.replay())
+            self._truncate()
+            self._compacting = False
+        print(f"[v0] Journal compacted into {self.snapshot_path}")
+
+    def compact_in_background(self) -> None:
+        """Start a compaction on a daemon thread unless one is already running"""
+        with self.lock:
+            if self._compacting:
+                return
+            self._compacting = True
+        thread = threading.Thread(target=self._safe_compact, daemon=True)
+        thread.start()
+
+    def _safe_compact(self) -> None:
+        try:
+            self.compact()
+        except Exception as e:
+            with self.lock:
+                self._compacting = False
+            print(f"[v0] Error compacting journal: {e}")
+
+    def _truncate(self) -> None:
+        if self.journal_path.exists():
+            self.journal_path.unlink()
+        self._entries = 0
@@ -0,0 +1,74 @@
+"""
+Incremental reader for large JSON collection files
+"""
+from typing import Dict, Any, Iterator, TextIO
+import json
+from pathlib import Path
+
+# Taille des blocs lus sur le disque
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\r\n"
+_decoder = json.JSONDecoder()
+
+
+def iter_json_records(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Yield the records of a JSON file one at a time
+
+    The file may hold a list of records or a single record. Only one chunk
+    and the record being decoded are held in memory; list items that are not
+    objects are skipped, like DataManager.load_data does.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        yield from iter_json_stream(f, str(path), chunk_size)
+
+
+def iter_json_stream(f: TextIO, path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Yield the records of an already opened JSON file"""
+    buf = f.read(chunk_size)
+    pos = _skip(buf, 0, _WHITESPACE)
+    if pos < len(buf) and buf[pos] == "{":
+        record = json.loads(buf[pos:] + f.read())
+        if isinstance(record, dict):
+            yield record
+        return
+    if pos >= len(buf) or buf[pos] != "[":
+        print(f"[v0] Unexpected data format in {path}")
+        return
+    pos += 1
+    skipped = 0
+    while True:
+        pos = _skip(buf, pos, _WHITESPACE + ",")
+        if pos == len(buf):
+            more = f.read(chunk_size)
+            if not more:
+                raise ValueError(f"Truncated JSON array in {path}")
+            buf, pos = more, 0
+            continue
+        if buf[pos] == "]":
+            break
+        try:
+            item, end = _decoder.raw_decode(buf, pos)
+            complete = end < len(buf) or isinstance(item, (dict, list, str))
+        except json.JSONDecodeError:
+            complete = False
+        if not complete:
+            # Élément coupé par la fin du bloc: on lit la suite
+            more = f.read(chunk_size)
+            if not more:
+                raise ValueError(f"Truncated JSON array in {path}")
+            buf, pos = buf[pos:] + more, 0
+            continue
+        if isinstance(item, dict):
+            yield item
+        else:
+            skipped += 1
+        pos = end
+    if skipped:
+        print(f"[v0] Skipped {skipped} non-object items in {path}")
+
+
+def _skip(buf: str, pos: int, chars: str) -> int:
+    while pos < len(buf) and buf[pos] in chars:
+        pos += 1
+    return pos
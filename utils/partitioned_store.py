@@ -0,0 +1,205 @@
+"""
+Time-partitioned storage: one JSON shard per month and a manifest of date ranges
+"""
+from typing import List, Dict, Any, Optional, Union, Iterator
+import json
+import re
+import threading
+from pathlib import Path
+
+from utils.journal import read_snapshot, write_snapshot
+from utils.json_stream import iter_json_records
+
+MANIFEST_NAME = "manifest.json"
+# Partition des enregistrements sans date exploitable
+UNDATED = "undated"
+
+_MONTH_RE = re.compile(r"^\d{4}-\d{2}")
+
+
+def partition_key(record: Dict[str, Any]) -> str:
+    """Return the YYYY-MM partition of a record"""
+    date = str(record.get("date") or "")
+    return date[:7] if _MONTH_RE.match(date) else UNDATED
+
+
+def record_day(record: Dict[str, Any]) -> str:
+    """Return the YYYY-MM-DD date of a record, or an empty string"""
+    date = str(record.get("date") or "")
+    return date[:10] if _MONTH_RE.match(date) else ""
+
+
+class PartitionedCollection:
+    """Collection stored as data/<collection>/<YYYY-MM>.json shards"""
+
+    _instances: Dict[Path, "PartitionedCollection"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.manifest_path = directory / MANIFEST_NAME
+        self.lock = threading.RLock()
+
+    @classmethod
+    def for_path(cls, directory: Path) -> "PartitionedCollection":
+        """Return the shared store of a partition directory"""
+        key = directory.resolve()
+        with cls._instances_lock:
+            store = cls._instances.get(key)
+            if store is None:
+                store = cls(directory)
+                cls._instances[key] = store
+            return store
+
+    def manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Return {partition: {"min_date", "max_date", "count"}}"""
+        if not self.manifest_path.exists():
+            return {}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("partitions", {})
+
+    def _shard_path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _write_manifest(self, partitions: Dict[str, Dict[str, Any]]) -> None:
+        write_snapshot(self.manifest_path, {"partitions": dict(sorted(partitions.items()))})
+
+    @staticmethod
+    def _describe(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        days = [day for day in (record_day(r) for r in records) if day]
+        return {
+            "min_date": min(days) if days else None,
+            "max_date": max(days) if days else None,
+            "count": len(records),
+        }
+
+    def save(self, data: Union[List[Dict[str, Any]], Dict[str, Any]]) -> None:
+        """Rewrite every partition from the full list of records"""
+        records = [data] if isinstance(data, dict) else [r for r in data if isinstance(r, dict)]
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            groups.setdefault(partition_key(record), []).append(record)
+        with self.lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for key, group in groups.items():
+                write_snapshot(self._shard_path(key), group)
+            for stale in set(self.manifest()) - set(groups):
+                self._shard_path(stale).unlink(missing_ok=True)
+            self._write_manifest({key: self._describe(group) for key, group in groups.items()})
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """Add one record, rewriting only the shard of its month"""
+        key = partition_key(record)
+        with self.lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            shard = read_snapshot(self._shard_path(key))
+            shard.append(record)
+            write_snapshot(self._shard_path(key), shard)
+            partitions = self.manifest()
+            partitions[key] = self._describe(shard)
+            self._write_manifest(partitions)
+
+    def extend(self, records: List[Dict[str, Any]]) -> None:
+        """Add records, rewriting each shard they touch and the manifest once"""
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            groups.setdefault(partition_key(record), []).append(record)
+        with self.lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            partitions = self.manifest()
+            for key, group in groups.items():
+                shard = read_snapshot(self._shard_path(key))
+                shard.extend(group)
+                write_snapshot(self._shard_path(key), shard)
+                partitions[key] = self._describe(shard)
+            self._write_manifest(partitions)
+
+    def change(self, previous: Dict[str, Any], record: Optional[Dict[str, Any]]) -> None:
+        """Replace (record) or delete (None) a stored record, rewriting only the shards of its months
+
+        `previous` is the stored version, whose date gives the shard holding
+        it; a new date in another month moves the record to that shard.
+        """
+        record_id = previous.get("id")
+        old_key = partition_key(previous)
+        new_key = partition_key(record) if record is not None else None
+        with self.lock:
+            shard = read_snapshot(self._shard_path(old_key))
+            if new_key == old_key:
+                shard = [record if r.get("id") == record_id else r for r in shard]
+            else:
+                shard = [r for r in shard if r.get("id") != record_id]
+            shards = {old_key: shard}
+            if record is not None and new_key != old_key:
+                moved = read_snapshot(self._shard_path(new_key))
+                moved.append(record)
+                shards[new_key] = moved
+            partitions = self.manifest()
+            for key, group in shards.items():
+                if group:
+                    write_snapshot(self._shard_path(key), group)
+                    partitions[key] = self._describe(group)
+                else:
+                    # Comme save(): pas de fichier pour un mois vide
+                    self._shard_path(key).unlink(missing_ok=True)
+                    partitions.pop(key, None)
+            self._write_manifest(partitions)
+
+    def partitions_between(self, start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+        """Partitions whose date range overlaps [start, end] (YYYY-MM-DD, inclusive)"""
+        selected = []
+        for key, info in self.manifest().items():
+            if key == UNDATED:
+                continue
+            if start is not None and info.get("max_date") and info["max_date"] < start:
+                continue
+            if end is not None and info.get("min_date") and info["min_date"] > end:
+                continue
+            selected.append(key)
+        return sorted(selected)
+
+    def iter_records(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream the records, opening only the partitions that overlap the range"""
+        ranged = start is not None or end is not None
+        keys = self.partitions_between(start, end)
+        if not ranged and UNDATED in self.manifest():
+            keys.append(UNDATED)
+        for key in keys:
+            path = self._shard_path(key)
+            if not path.exists():
+                continue
+            for record in iter_json_records(path):
+                if ranged:
+                    day = record_day(record)
+                    if (start is not None and day < start) or (end is not None and day > end):
+                        continue
+                yield record
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Return every record, partition by partition"""
+        with self.lock:
+            return list(self.iter_records())
+
+
+def migrate_to_partitions(data_dir: str = "data", collection: str = "expenses") -> int:
+    """Split a flat data/<collection>.json file into monthly partitions
+
+    The flat file is kept as data/<collection>.json.bak.
+    """
+    flat_path = Path(data_dir) / f"{collection}.json"
+    store = PartitionedCollection.for_path(Path(data_dir) / collection)
+    if not flat_path.exists():
+        print(f"[v0] No flat file to migrate at {flat_path}")
+        return 0
+    records = read_snapshot(flat_path)
+    store.save(records)
+    flat_path.rename(flat_path.with_name(flat_path.name + ".bak"))
+    print(f"[v0] Migrated {len(records)} records to {store.directory}")
+    return len(records)
+
+
+if __name__ == "__main__":
+    import sys
+
+    for name in sys.argv[1:] or ["expenses", "income"]:
+        migrate_to_partitions(collection=name)
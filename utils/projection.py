@@ -0,0 +1,98 @@
+"""
+Lazy projection of recurring income into future monthly cash flows
+"""
+from typing import Dict, Any, Optional, Iterator, Tuple
+from datetime import date
+from functools import lru_cache
+import calendar
+
+import numpy as np
+
+from utils.record_store import MISSING_DAY, EPOCH, RecordStore
+
+
+def month_index(day: date) -> int:
+    """Months since year 0, so that consecutive months differ by 1"""
+    return day.year * 12 + day.month - 1
+
+
+def month_key(index: int) -> str:
+    """Inverse of month_index, as "YYYY-MM" """
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _occurrence_day(index: int, day_of_month: int) -> date:
+    """Same day of the month in another month, clamped to its last day"""
+    year, month = index // 12, index % 12 + 1
+    return date(year, month, min(day_of_month, calendar.monthrange(year, month)[1]))
+
+
+def iter_occurrences(record: Dict[str, Any], horizon: int, today: Optional[date] = None) -> Iterator[Dict[str, Any]]:
+    """Yield the monthly occurrences of a recurring record over the next `horizon` months
+
+    Occurrences fall on the day of the month of the record, from the month
+    after the current one (or after the record, if it is later). They are
+    generated one at a time and never stored.
+    """
+    try:
+        start = date.fromisoformat(str(record.get("date"))[:10])
+    except ValueError:
+        return
+    first = month_index(today or date.today()) + 1
+    for index in range(max(first, month_index(start) + 1), first + horizon):
+        occurrence = dict(record)
+        occurrence["date"] = _occurrence_day(index, start.day).isoformat()
+        occurrence["projected"] = True
+        yield occurrence
+
+
+@lru_cache(maxsize=8192)
+def _memoized(key: Tuple[Any, ...], horizon: int, first: int) -> Tuple[Tuple[str, float], ...]:
+    record = dict(key)
+    today = _occurrence_day(first - 1, 1)
+    return tuple((o["date"], float(o.get("amount", 0))) for o in iter_occurrences(record, horizon, today))
+
+
+def occurrences(record: Dict[str, Any], horizon: int, today: Optional[date] = None) -> Tuple[Tuple[str, float], ...]:
+    """(date, amount) of the projected occurrences, memoized per (record, horizon, month)
+
+    The memo key holds the record's fields, so an edited record is projected
+    again instead of reusing a stale expansion.
+    """
+    key = tuple(sorted((k, v) for k, v in record.items() if isinstance(v, (str, int, float, bool)) or v is None))
+    return _memoized(key, horizon, month_index(today or date.today()) + 1)
+
+
+def latest_recurring(store: RecordStore) -> np.ndarray:
+    """Positions of the recurring sources of an income store
+
+    Only the latest recurring record of a source text counts: a monthly
+    salary entered every month is one source, not one per entry.
+    """
+    n = store.size
+    keep = np.flatnonzero(store.alive[:n] & store.flags[:n] & (store.days[:n] != MISSING_DAY))
+    if not len(keep):
+        return keep
+    texts = store.text_codes[keep]
+    # Tri par source puis par date: le dernier de chaque groupe est le plus récent
+    order = np.lexsort((store.days[keep], texts))
+    last = np.r_[texts[order][1:] != texts[order][:-1], True]
+    return keep[order[last]]
+
+
+def projected_month_totals(store: RecordStore, horizon: int, today: Optional[date] = None) -> Dict[str, float]:
+    """Projected recurring amount of each of the next `horizon` months, without expanding rows
+
+    Each source contributes from the month after its start: one difference
+    array and a cumulative sum, O(sources + horizon).
+    """
+    first = month_index(today or date.today()) + 1
+    latest = latest_recurring(store)
+    # datetime64[M] compte les mois depuis 1970-01: même origine que month_index
+    starts = store.days[latest].astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) + month_index(EPOCH)
+    amounts = store.base_amounts[latest]
+    offsets = np.clip(starts + 1 - first, 0, None)
+    inside = offsets < horizon
+    steps = np.bincount(offsets[inside], weights=amounts[inside], minlength=horizon)[:horizon]
+    totals = np.cumsum(steps)
+    return {month_key(first + i): float(total) for i, total in enumerate(totals)}
@@ -0,0 +1,90 @@
+"""
+In-process read cache for collection files
+"""
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import os
+import threading
+from pathlib import Path
+
+# Signature d'un fichier: (mtime_ns, taille, inode), ou None s'il n'existe pas
+FileSignature = Optional[Tuple[int, int, int]]
+
+
+def file_signature(path: Path) -> FileSignature:
+    """Return the (mtime, size, inode) signature of a file"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class ReadCache:
+    """LRU cache of parsed collections validated against file signatures"""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[Tuple[FileSignature, ...], int, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, signature: Tuple[FileSignature, ...]) -> Optional[List[Dict[str, Any]]]:
+        """Return a copy of the cached records if the files did not change"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != signature:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            records = entry[2]
+        # Copie superficielle: les appelants modifient les listes et les enregistrements
+        return [dict(record) for record in records]
+
+    def put(self, key: str, signature: Tuple[FileSignature, ...], records: List[Dict[str, Any]]) -> None:
+        """Cache records, using the on-disk size as their memory cost"""
+        cost = sum(sig[1] for sig in signature if sig is not None)
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (signature, cost, [dict(record) for record in records])
+            self.used_bytes += cost
+            while self.used_bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        """Forget the cached records of a collection"""
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.used_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and memory usage"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "used_bytes": self.used_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _drop(self, key: str) -> None:
+        _, cost, _ = self._entries.pop(key)
+        self.used_bytes -= cost
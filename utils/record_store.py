@@ -0,0 +1,433 @@
+"""
+Typed, compact in-memory store for expense and income records
+"""
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.aggregates import RunningTotals
+from utils.date_index import DateIndex
+
+# Colonnes propres à chaque collection: (champ texte interné, champ booléen)
+STORE_FIELDS: Dict[str, Tuple[str, Optional[str]]] = {
+    "expenses": ("description", None),
+    "income": ("source", "recurring"),
+}
+
+# Jour manquant ou illisible dans la colonne des dates
+MISSING_DAY = np.iinfo(np.int32).min
+MISSING_ID = -1
+
+EPOCH = date(1970, 1, 1)
+
+# Types des champs id, montant, date, catégorie, texte et devise redonnés tels quels par les colonnes
+_EXACT_TYPES = (int, float, str, str, str, str)
+
+
+def day_number(value: Any) -> int:
+    """Days since 1970-01-01 of a "YYYY-MM-DD..." date, or MISSING_DAY"""
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return (value - EPOCH).days
+    try:
+        return (date.fromisoformat(str(value)[:10]) - EPOCH).days
+    except ValueError:
+        return MISSING_DAY
+
+
+def day_string(day: int) -> Optional[str]:
+    """Inverse of day_number"""
+    if day == MISSING_DAY:
+        return None
+    return (EPOCH + timedelta(days=int(day))).isoformat()
+
+
+class StringTable:
+    """Interned strings referenced by integer codes"""
+
+    def __init__(self) -> None:
+        self.strings: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def code(self, value: Optional[str]) -> int:
+        """Return the code of a string, adding it if needed (-1 for None)"""
+        if value is None:
+            return -1
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.strings)
+            self._codes[value] = code
+            self.strings.append(value)
+        return code
+
+    def find(self, value: str) -> Optional[int]:
+        """Return the code of a string without adding it"""
+        return self._codes.get(value)
+
+    def lookup(self, code: int) -> Optional[str]:
+        return self.strings[code] if code >= 0 else None
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+
+class RecordStore:
+    """Column arrays for id, amount, day and category plus an interned text field
+
+    Appends are amortized O(1) (the arrays double their capacity), lookups,
+    updates and deletions go through an id -> position index (deleted rows
+    are masked), and the aggregations run over the typed arrays instead of
+    lists of dicts. Overall, per-category and per-month totals are kept
+    running (see RunningTotals) and read without scanning the columns.
+    Given a rate table, totals, date ranges and the date index use amounts
+    converted into the reference currency; records keep their own amount.
+    Dates are kept at day resolution; fields outside the columns, and the
+    column fields they would not give back as stored (an int amount, a
+    date with a time, a missing flag...), are kept per record so that
+    record() returns the JSON shape as it was written.
+    """
+
+    _COLUMNS = {
+        "ids": (np.int64, MISSING_ID),
+        "amounts": (np.float64, 0.0),
+        "days": (np.int32, MISSING_DAY),
+        "category_codes": (np.int32, -1),
+        "text_codes": (np.int32, -1),
+        "flags": (np.bool_, False),
+        "alive": (np.bool_, True),
+        "currency_codes": (np.int32, -1),
+        # Montant converti dans la devise de référence, au cours de la date de l'enregistrement
+        "base_amounts": (np.float64, 0.0),
+    }
+
+    def __init__(
+        self,
+        text_field: str = "description",
+        flag_field: Optional[str] = None,
+        capacity: int = 1024,
+        rates: Optional[Any] = None,
+    ) -> None:
+        self.text_field = text_field
+        # Table de cours (utils.currency.RateTable); sans table, les montants ne sont pas convertis
+        self.rates = rates
+        self.flag_field = flag_field
+        self.size = 0
+        for name, (dtype, fill) in self._COLUMNS.items():
+            setattr(self, name, np.full(capacity, fill, dtype=dtype))
+        self.categories = StringTable()
+        self.texts = StringTable()
+        self.currencies = StringTable()
+        self.extras: Dict[int, Dict[str, Any]] = {}
+        # Champs absents de l'enregistrement que record() ajouterait (montant, champ booléen)
+        self.absent: Dict[int, Tuple[str, ...]] = {}
+        # Index id -> position, pour les lectures, modifications et suppressions en O(1)
+        self.index: Dict[int, int] = {}
+        self.deleted = 0
+        self.totals = RunningTotals()
+        self._counting = True
+        # Construit à la première requête par période, prolongé par les ajouts dans l'ordre des dates
+        self._date_index: Optional[DateIndex] = None
+        self._day_cache: Dict[str, int] = {}
+        # Dates en texte redonnées à l'identique par la colonne des jours ("YYYY-MM-DD")
+        self._exact_dates: Dict[str, bool] = {}
+        self._core_fields = {"id", "amount", "date", "category", "currency", text_field, flag_field}
+
+    @classmethod
+    def for_collection(
+        cls, collection: str, records: Iterable[Dict[str, Any]] = (), rates: Optional[Any] = None
+    ) -> "RecordStore":
+        """Build the store of "expenses" or "income" from records (a list or a stream)"""
+        text_field, flag_field = STORE_FIELDS[collection]
+        store = cls(text_field, flag_field, rates=rates)
+        # Conversions et totaux sont calculés en une fois sur les colonnes, pas enregistrement par enregistrement
+        store._counting = False
+        for record in records:
+            store.append(record)
+        store._counting = True
+        store.recount()
+        return store
+
+    def __len__(self) -> int:
+        return self.size - self.deleted
+
+    def _grow(self) -> None:
+        capacity = len(self.ids) * 2
+        for name, (dtype, fill) in self._COLUMNS.items():
+            grown = np.full(capacity, fill, dtype=dtype)
+            grown[: self.size] = getattr(self, name)[: self.size]
+            setattr(self, name, grown)
+
+    def _day(self, value: Any) -> int:
+        if value is None:
+            return MISSING_DAY
+        if not isinstance(value, str):
+            return day_number(value)
+        day = self._day_cache.get(value)
+        if day is None:
+            day = day_number(value)
+            self._day_cache[value] = day
+        return day
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """Add one record and return its position"""
+        if self.size == len(self.ids):
+            self._grow()
+        i = self.size
+        self.size += 1
+        self._set(i, record)
+        if self._date_index is not None and self.days[i] != MISSING_DAY:
+            if not self._date_index.append(int(self.days[i]), float(self.base_amounts[i])):
+                self._date_index = None
+        return i
+
+    def update(self, record_id: int, record: Dict[str, Any]) -> bool:
+        """Replace the record with an id in place; False if there is none"""
+        i = self.index.get(record_id)
+        if i is None:
+            return False
+        del self.index[record_id]
+        self.extras.pop(i, None)
+        self.absent.pop(i, None)
+        self._uncount(i)
+        self._date_index = None
+        self._set(i, record)
+        return True
+
+    def delete(self, record_id: int) -> bool:
+        """Mark the record with an id as deleted; False if there is none"""
+        i = self.index.pop(record_id, None)
+        if i is None:
+            return False
+        self._uncount(i)
+        self._date_index = None
+        self.alive[i] = False
+        self.amounts[i] = 0.0
+        self.base_amounts[i] = 0.0
+        self.extras.pop(i, None)
+        self.absent.pop(i, None)
+        self.deleted += 1
+        return True
+
+    def get(self, record_id: int) -> Optional[Dict[str, Any]]:
+        """Return the record with an id in its JSON shape"""
+        i = self.index.get(record_id)
+        return self.record(i) if i is not None else None
+
+    def _set(self, i: int, record: Dict[str, Any]) -> None:
+        record_id = record.get("id")
+        amount = record.get("amount", 0)
+        category = record.get("category")
+        text = record.get(self.text_field)
+        self.ids[i] = record_id if isinstance(record_id, int) else MISSING_ID
+        if isinstance(record_id, int):
+            self.index[record_id] = i
+        self.amounts[i] = amount if isinstance(amount, (int, float)) else 0.0
+        self.days[i] = self._day(record.get("date"))
+        self.category_codes[i] = self.categories.code(None if category is None else str(category))
+        self.text_codes[i] = self.texts.code(None if text is None else str(text))
+        if self.flag_field is not None:
+            self.flags[i] = bool(record.get(self.flag_field, False))
+        currency = record.get("currency")
+        self.currency_codes[i] = self.currencies.code(None if currency is None else str(currency))
+        extra = {key: value for key, value in record.items() if key not in self._core_fields}
+        date = record.get("date")
+        # Cas courant: tous les champs des colonnes présents et du type qu'elles redonnent
+        exact = (
+            (type(record_id), type(amount), type(date), type(category), type(text), type(currency)) == _EXACT_TYPES
+            and self._exact_date(date)
+            and (self.flag_field is None or type(record.get(self.flag_field)) is bool)
+        )
+        if not exact:
+            self._keep_inexact(i, record, extra)
+        if extra:
+            self.extras[i] = extra
+        if self._counting:
+            factor = self.rates.to_base(currency, int(self.days[i])) if self.rates is not None and currency else 1.0
+            self.base_amounts[i] = self.amounts[i] * factor
+            self.totals.add(self.base_amounts[i], category, record.get("date") if self.days[i] != MISSING_DAY else None)
+
+    def _exact_date(self, value: str) -> bool:
+        exact = self._exact_dates.get(value)
+        if exact is None:
+            exact = self._exact_dates[value] = day_string(self._day(value)) == value
+        return exact
+
+    def _keep_inexact(self, i: int, record: Dict[str, Any], extra: Dict[str, Any]) -> None:
+        """Add to `extra` the column fields record() would not give back as stored, and note the absent ones"""
+        for key in self._core_fields:
+            if key is None or key not in record:
+                continue
+            value = record[key]
+            if key == "id":
+                kept = type(value) is int
+            elif key == "amount":
+                kept = type(value) is float
+            elif key == "date":
+                kept = isinstance(value, str) and self._exact_date(value)
+            elif key == self.flag_field:
+                kept = type(value) is bool
+            else:
+                kept = isinstance(value, str)
+            if not kept:
+                extra[key] = value
+        absent = tuple(key for key in ("amount", self.flag_field) if key is not None and key not in record)
+        if absent:
+            self.absent[i] = absent
+
+    def _uncount(self, i: int) -> None:
+        category = self.categories.lookup(int(self.category_codes[i]))
+        self.totals.remove(self.base_amounts[i], category, day_string(int(self.days[i])))
+
+    def record(self, i: int) -> Dict[str, Any]:
+        """Return the record at a position in its JSON shape"""
+        record: Dict[str, Any] = {}
+        if self.ids[i] != MISSING_ID:
+            record["id"] = int(self.ids[i])
+        category = self.categories.lookup(int(self.category_codes[i]))
+        if category is not None:
+            record["category"] = category
+        text = self.texts.lookup(int(self.text_codes[i]))
+        if text is not None:
+            record[self.text_field] = text
+        record["amount"] = float(self.amounts[i])
+        day = day_string(int(self.days[i]))
+        if day is not None:
+            record["date"] = day
+        if self.flag_field is not None:
+            record[self.flag_field] = bool(self.flags[i])
+        currency = self.currencies.lookup(int(self.currency_codes[i]))
+        if currency is not None:
+            record["currency"] = currency
+        record.update(self.extras.get(i, {}))
+        for key in self.absent.get(i, ()):
+            del record[key]
+        return record
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Convert the store back to the list-of-dicts shape of the JSON files"""
+        return [self.record(i) for i in range(self.size) if self.alive[i]]
+
+    def recount(self) -> None:
+        """Convert the amounts in bulk and rebuild the running totals from the columns"""
+        n = self.size
+        self.base_amounts[:n] = self.amounts[:n]
+        if self.rates is not None and len(self.currencies):
+            self.base_amounts[:n] *= self.rates.to_base_factors(
+                self.currencies.strings, self.currency_codes[:n], self.days[:n]
+            )
+        self._date_index = None
+        alive = self.alive[:n]
+        amounts = self.base_amounts[:n][alive]
+        # Décalage de 1: le code -1 (sans catégorie) devient l'indice 0
+        codes = self.category_codes[:n][alive] + 1
+        sums = np.bincount(codes, weights=amounts, minlength=len(self.categories) + 1)
+        counts = np.bincount(codes, minlength=len(self.categories) + 1)
+        categories: Dict[str, Tuple[float, int]] = {}
+        for code in np.flatnonzero(counts):
+            name = self.categories.lookup(int(code) - 1) or "Autre"
+            amount, count = categories.get(name, (0.0, 0))
+            categories[name] = (amount + float(sums[code]), count + int(counts[code]))
+        days = self.days[:n][alive]
+        dated = days != MISSING_DAY
+        months, inverse = np.unique(days[dated].astype("datetime64[D]").astype("datetime64[M]"), return_inverse=True)
+        month_sums = np.bincount(inverse, weights=amounts[dated], minlength=len(months))
+        month_counts = np.bincount(inverse, minlength=len(months))
+        by_month = {
+            str(month): (float(total), int(count)) for month, total, count in zip(months, month_sums, month_counts)
+        }
+        self.totals.load(float(amounts.sum()), int(alive.sum()), categories, by_month)
+
+    def date_index(self) -> DateIndex:
+        """Return the sorted date index of the dated records"""
+        if self._date_index is None:
+            n = self.size
+            keep = self.alive[:n] & (self.days[:n] != MISSING_DAY)
+            self._date_index = DateIndex(self.days[:n][keep], self.base_amounts[:n][keep])
+        return self._date_index
+
+    def range_total(self, start: Optional[str] = None, end: Optional[str] = None) -> Tuple[float, int]:
+        """Sum and count of the records dated between start and end (YYYY-MM-DD, inclusive)"""
+        return self.date_index().between(
+            None if start is None else day_number(start), None if end is None else day_number(end)
+        )
+
+    def total(self) -> float:
+        """Sum of all amounts (in the reference currency when the store has a rate table)"""
+        return self.totals.total
+
+    def category_totals(self) -> Dict[str, float]:
+        """Sum of amounts per category; records without category count as "Autre" """
+        return dict(self.totals.by_category)
+
+    def month_totals(self) -> Dict[str, float]:
+        """Sum of amounts per "YYYY-MM" month"""
+        return dict(sorted(self.totals.by_month.items()))
+
+    def select(
+        self,
+        text_codes: Optional[np.ndarray] = None,
+        category: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> np.ndarray:
+        """Mask of the live rows with one of some text codes, a category and a date in [start, end]
+
+        Each criterion left to None (or an unreadable date) filters nothing;
+        every one is a single vectorized comparison over a column.
+        """
+        n = self.size
+        mask = self.alive[:n].copy()
+        if text_codes is not None:
+            mask &= np.isin(self.text_codes[:n], text_codes)
+        if category is not None:
+            code = self.categories.find(category)
+            if code is None:
+                return np.zeros(n, dtype=np.bool_)
+            mask &= self.category_codes[:n] == code
+        # Une borne illisible (date en cours de saisie) est ignorée
+        first = MISSING_DAY if start is None else day_number(start)
+        last = MISSING_DAY if end is None else day_number(end)
+        if first != MISSING_DAY or last != MISSING_DAY:
+            days = self.days[:n]
+            mask &= days != MISSING_DAY
+            if first != MISSING_DAY:
+                mask &= days >= first
+            if last != MISSING_DAY:
+                mask &= days <= last
+        return mask
+
+    def to_frame(self, mask: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """Typed DataFrame of the columns (same column names as DataManager.load_frame)
+
+        With a mask (see select()), only the selected rows are converted.
+        """
+        n = self.size
+        if mask is not None:
+            rows: Any = np.flatnonzero(mask)
+        else:
+            rows = np.flatnonzero(self.alive[:n]) if self.deleted else slice(0, n)
+        days = self.days[rows]
+        dates = days.astype("datetime64[D]")
+        dates[days == MISSING_DAY] = np.datetime64("NaT")
+        # Le code -1 désigne le dernier élément, None
+        texts = np.array(self.texts.strings + [None], dtype=object)
+        columns: Dict[str, Any] = {"id": self.ids[rows]}
+        if len(self.categories):
+            columns["category"] = pd.Categorical.from_codes(self.category_codes[rows], categories=self.categories.strings)
+        columns[self.text_field] = texts[self.text_codes[rows]]
+        columns["amount"] = self.amounts[rows]
+        columns["date"] = dates
+        if self.flag_field is not None:
+            columns[self.flag_field] = self.flags[rows]
+        if len(self.currencies):
+            columns["currency"] = pd.Categorical.from_codes(self.currency_codes[rows], categories=self.currencies.strings)
+        return pd.DataFrame(columns)
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the columns and the string tables"""
+        arrays = sum(getattr(self, name).nbytes for name in self._COLUMNS)
+        strings = sum(len(s) + 49 for s in self.texts.strings + self.categories.strings)
+        return arrays + strings
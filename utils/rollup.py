@@ -0,0 +1,154 @@
+"""
+Rollup cube of amounts by time bucket (day, week, month) and category
+"""
+from typing import List, Dict, Any, Callable, Optional, Iterable
+from datetime import date, timedelta
+import threading
+from pathlib import Path
+
+from utils.journal import read_snapshot, write_snapshot
+
+GRAINS = ("day", "week", "month")
+# Catégorie réservée au total de toutes les catégories d'un intervalle
+ALL = "*"
+# Intervalle unique de la granularité "all": le cumul depuis le début
+ALL_TIME = ("all", ALL)
+
+
+def bucket_keys(value: Any) -> Optional[Dict[str, str]]:
+    """Return {"day": "YYYY-MM-DD", "week": "YYYY-Www", "month": "YYYY-MM"} for a date"""
+    try:
+        day = value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+    year, week, _ = day.isocalendar()
+    return {"day": day.isoformat()[:10], "week": f"{year}-W{week:02d}", "month": day.isoformat()[:7]}
+
+
+def last_buckets(grain: str, count: int, today: Optional[date] = None) -> List[str]:
+    """Keys of the `count` buckets of a grain ending with the one holding today, oldest first"""
+    today = today or date.today()
+    keys: List[str] = []
+    if grain == "month":
+        year, month = today.year, today.month
+        for _ in range(count):
+            keys.append(f"{year:04d}-{month:02d}")
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    else:
+        step = timedelta(days=7 if grain == "week" else 1)
+        for i in range(count):
+            keys.append(bucket_keys(today - step * i)[grain])
+    return keys[::-1]
+
+
+def _plain(value: Any) -> Any:
+    """Tuples as lists, to compare a signature with its JSON copy"""
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+class RollupCube:
+    """Amount and record count per (grain, bucket, category)
+
+    add() and remove() touch a fixed number of cells (three grains plus the
+    all-time bucket, for the category and the "*" total), so the cube is kept
+    up to date in O(1) per record and read in O(1) per bucket.
+    """
+
+    def __init__(self, convert: Optional[Callable[[Dict[str, Any]], float]] = None) -> None:
+        # Montant compté pour un enregistrement (ex: converti dans la devise de référence)
+        self.convert = convert
+        # cells[grain][bucket][category] = [amount, count]
+        self.cells: Dict[str, Dict[str, Dict[str, List[float]]]] = {}
+        self.lock = threading.RLock()
+        self._keys_cache: Dict[str, Optional[Dict[str, str]]] = {}
+
+    @classmethod
+    def from_records(
+        cls, records: Iterable[Dict[str, Any]], convert: Optional[Callable[[Dict[str, Any]], float]] = None
+    ) -> "RollupCube":
+        cube = cls(convert)
+        for record in records:
+            cube.add(record)
+        return cube
+
+    def _keys(self, value: Any) -> Optional[Dict[str, str]]:
+        if not isinstance(value, str):
+            return bucket_keys(value) if value is not None else None
+        keys = self._keys_cache.get(value[:10])
+        if keys is None and value[:10] not in self._keys_cache:
+            keys = bucket_keys(value)
+            self._keys_cache[value[:10]] = keys
+        return keys
+
+    def _shift(self, grain: str, bucket: str, category: str, amount: float, step: int) -> None:
+        bucket_cells = self.cells.setdefault(grain, {}).setdefault(bucket, {})
+        for key in (category, ALL):
+            cell = bucket_cells.setdefault(key, [0.0, 0])
+            cell[0] += amount * step
+            cell[1] += step
+            if cell[1] <= 0:
+                del bucket_cells[key]
+        if not bucket_cells:
+            del self.cells[grain][bucket]
+
+    def _apply(self, record: Dict[str, Any], step: int) -> None:
+        if self.convert is not None:
+            amount = self.convert(record)
+        else:
+            amount = record.get("amount", 0)
+            amount = float(amount) if isinstance(amount, (int, float)) else 0.0
+        category = record.get("category")
+        category = "Autre" if category is None else str(category)
+        with self.lock:
+            self._shift(*ALL_TIME, category, amount, step)
+            keys = self._keys(record.get("date"))
+            if keys is not None:
+                for grain in GRAINS:
+                    self._shift(grain, keys[grain], category, amount, step)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Count one record"""
+        self._apply(record, 1)
+
+    def remove(self, record: Dict[str, Any]) -> None:
+        """Uncount one record previously passed to add()"""
+        self._apply(record, -1)
+
+    def total(self, grain: str = "all", bucket: str = ALL) -> float:
+        """Total of one bucket (the all-time total by default)"""
+        cell = self.cells.get(grain, {}).get(bucket, {}).get(ALL)
+        return cell[0] if cell else 0.0
+
+    def category_total(self, grain: str, bucket: str, category: str) -> float:
+        """Total of one category in one bucket"""
+        cell = self.cells.get(grain, {}).get(bucket, {}).get(category)
+        return cell[0] if cell else 0.0
+
+    def category_totals(self, grain: str = "all", bucket: str = ALL) -> Dict[str, float]:
+        """Totals per category of one bucket"""
+        with self.lock:
+            cells = self.cells.get(grain, {}).get(bucket, {})
+            return {category: cell[0] for category, cell in cells.items() if category != ALL}
+
+    def series(self, grain: str, buckets: List[str]) -> List[float]:
+        """Totals of a list of buckets, 0 for the empty ones"""
+        return [self.total(grain, bucket) for bucket in buckets]
+
+    def save(self, path: Path, source: Any) -> None:
+        """Persist the cells with the signature of the data they were computed from"""
+        with self.lock:
+            write_snapshot(path, {"source": _plain(source), "cells": self.cells})
+
+    @classmethod
+    def load(
+        cls, path: Path, source: Any, convert: Optional[Callable[[Dict[str, Any]], float]] = None
+    ) -> Optional["RollupCube"]:
+        """Load a persisted cube, or None if it was computed from other data"""
+        saved = read_snapshot(path)
+        if not saved or saved[0].get("source") != _plain(source):
+            return None
+        cube = cls(convert)
+        cube.cells = saved[0].get("cells", {})
+        return cube
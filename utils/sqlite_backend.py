@@ -0,0 +1,238 @@
+"""
+SQLite storage backend for budget collections
+"""
+from typing import List, Dict, Any, Optional, Union, Tuple, Iterator
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+# Collections gérées par la base et reprises lors de la migration depuis data/*.json
+COLLECTIONS = ["income", "expenses", "savings_goals", "budget_categories", "settings"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection TEXT NOT NULL,
+    id INTEGER,
+    date TEXT,
+    category TEXT,
+    amount REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_records_id ON records (collection, id);
+CREATE INDEX IF NOT EXISTS idx_records_date ON records (collection, date);
+CREATE INDEX IF NOT EXISTS idx_records_category ON records (collection, category, amount);
+"""
+
+
+def _row(collection: str, record: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Extract the indexed columns of a record"""
+    record_id = record.get("id")
+    amount = record.get("amount")
+    date = record.get("date")
+    category = record.get("category")
+    return (
+        collection,
+        record_id if isinstance(record_id, int) else None,
+        str(date) if date is not None else None,
+        str(category) if category is not None else None,
+        float(amount) if isinstance(amount, (int, float)) else None,
+        json.dumps(record, default=str, ensure_ascii=False),
+    )
+
+
+class SQLiteBackend:
+    """Store every collection as rows of a single WAL-mode SQLite database"""
+
+    _instances: Dict[Path, "SQLiteBackend"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    @classmethod
+    def for_path(cls, db_path: Path) -> "SQLiteBackend":
+        """Return the shared backend of a database file"""
+        key = db_path.resolve()
+        with cls._instances_lock:
+            backend = cls._instances.get(key)
+            if backend is None:
+                backend = cls(db_path)
+                cls._instances[key] = backend
+            return backend
+
+    def save(self, collection: str, data: Union[List[Dict[str, Any]], Dict[str, Any]]) -> None:
+        """Replace every record of a collection"""
+        records = [data] if isinstance(data, dict) else [r for r in data if isinstance(r, dict)]
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM records WHERE collection = ?", (collection,))
+            self.conn.executemany(
+                "INSERT INTO records (collection, id, date, category, amount, data) VALUES (?, ?, ?, ?, ?, ?)",
+                [_row(collection, record) for record in records],
+            )
+
+    def append(self, collection: str, record: Dict[str, Any]) -> None:
+        """Insert one record"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO records (collection, id, date, category, amount, data) VALUES (?, ?, ?, ?, ?, ?)",
+                _row(collection, record),
+            )
+
+    def extend(self, collection: str, records: List[Dict[str, Any]]) -> None:
+        """Insert records in one transaction"""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO records (collection, id, date, category, amount, data) VALUES (?, ?, ?, ?, ?, ?)",
+                [_row(collection, record) for record in records],
+            )
+
+    def get(self, collection: str, record_id: int) -> Optional[Dict[str, Any]]:
+        """Return the record with an id, through the id index"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT data FROM records WHERE collection = ? AND id = ?", (collection, record_id)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, collection: str, record_id: int, record: Dict[str, Any]) -> bool:
+        """Replace the record with an id; False if there is none"""
+        _, new_id, date, category, amount, data = _row(collection, record)
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "UPDATE records SET id = ?, date = ?, category = ?, amount = ?, data = ? "
+                "WHERE collection = ? AND id = ?",
+                (new_id, date, category, amount, data, collection, record_id),
+            )
+        return cursor.rowcount > 0
+
+    def delete(self, collection: str, record_id: int) -> bool:
+        """Delete the record with an id; False if there is none"""
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "DELETE FROM records WHERE collection = ? AND id = ?", (collection, record_id)
+            )
+        return cursor.rowcount > 0
+
+    def load(self, collection: str) -> List[Dict[str, Any]]:
+        """Return the records of a collection in insertion order"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT data FROM records WHERE collection = ? ORDER BY seq", (collection,)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def iter_records(self, collection: str, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Stream the records of a collection through a dedicated read connection"""
+        conn = sqlite3.connect(str(self.db_path))
+        try:
+            cursor = conn.execute(
+                "SELECT data FROM records WHERE collection = ? ORDER BY seq", (collection,)
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for (data,) in rows:
+                    yield json.loads(data)
+        finally:
+            conn.close()
+
+    def load_range(self, collection: str, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return the records dated between start and end (YYYY-MM-DD, inclusive) using the date index"""
+        where, params = self._date_filter(collection, start, end)
+        with self.lock:
+            rows = self.conn.execute(f"SELECT data FROM records WHERE {where} ORDER BY seq", params).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def range_total(self, collection: str, start: Optional[str] = None, end: Optional[str] = None) -> Tuple[float, int]:
+        """Sum and count of the records dated between start and end, using the date index"""
+        where, params = self._date_filter(collection, start, end)
+        with self.lock:
+            total, count = self.conn.execute(
+                f"SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM records WHERE {where}", params
+            ).fetchone()
+        return float(total), int(count)
+
+    @staticmethod
+    def _date_filter(collection: str, start: Optional[str], end: Optional[str]) -> Tuple[str, Tuple[Any, ...]]:
+        where = "collection = ?"
+        params: Tuple[Any, ...] = (collection,)
+        if start is not None:
+            where += " AND date >= ?"
+            params += (start,)
+        if end is not None:
+            # "~" est classé après les chiffres, " " et "T": la journée de fin est incluse en entier
+            where += " AND date < ?"
+            params += (end + "~",)
+        return where, params
+
+    def count(self, collection: str) -> int:
+        with self.lock:
+            (total,) = self.conn.execute(
+                "SELECT COUNT(*) FROM records WHERE collection = ?", (collection,)
+            ).fetchone()
+        return int(total)
+
+    def total_amount(self, collection: str, category: Optional[str] = None) -> float:
+        """Sum the amounts of a collection, optionally for one category"""
+        query = "SELECT COALESCE(SUM(amount), 0) FROM records WHERE collection = ?"
+        params: Tuple[Any, ...] = (collection,)
+        if category == "Autre":
+            query += " AND (category = ? OR category IS NULL)"
+            params += (category,)
+        elif category is not None:
+            query += " AND category = ?"
+            params += (category,)
+        with self.lock:
+            (total,) = self.conn.execute(query, params).fetchone()
+        return float(total)
+
+    def category_totals(self, collection: str) -> Dict[str, float]:
+        """Sum the amounts of a collection grouped by category"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT COALESCE(category, 'Autre'), SUM(amount) FROM records "
+                # Sans catégorie et 'Autre' forment un même groupe, comme dans les autres modes de stockage
+                "WHERE collection = ? GROUP BY COALESCE(category, 'Autre') ORDER BY MIN(seq)",
+                (collection,),
+            ).fetchall()
+        return {category: float(total or 0) for category, total in rows}
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+        with self._instances_lock:
+            self._instances.pop(self.db_path.resolve(), None)
+
+
+def migrate_json_to_sqlite(data_dir: str = "data", db_name: str = "budget.db") -> Dict[str, int]:
+    """Copy the existing data/*.json collections into the SQLite database
+
+    Collections that already contain rows are left untouched, so the
+    migration can be run again safely.
+    """
+    from utils.data_manager import DataManager
+
+    json_manager = DataManager(data_dir, backend="json")
+    backend = SQLiteBackend.for_path(Path(data_dir) / db_name)
+    migrated: Dict[str, int] = {}
+    for collection in COLLECTIONS:
+        if backend.count(collection) > 0:
+            continue
+        records = json_manager.load_data(collection)
+        if records:
+            backend.save(collection, records)
+            migrated[collection] = len(records)
+    print(f"[v0] Migrated to {backend.db_path}: {migrated}")
+    return migrated
+
+
+if __name__ == "__main__":
+    migrate_json_to_sqlite()
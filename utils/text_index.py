@@ -0,0 +1,137 @@
+"""
+Inverted full-text index over the interned texts of a record store
+"""
+from typing import List, Dict, Any, Optional, Set
+from bisect import bisect_left
+from pathlib import Path
+import re
+import threading
+import unicodedata
+
+import numpy as np
+
+from utils.journal import read_snapshot, write_snapshot
+from utils.record_store import StringTable
+from utils.rollup import _plain
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+# Ligatures que la décomposition Unicode ne sépare pas
+_LIGATURES = {"œ": "oe", "æ": "ae", "ß": "ss"}
+
+
+class _FoldTable(dict):
+    """str.translate table folding each character once, on first sight"""
+
+    def __missing__(self, codepoint: int) -> str:
+        char = chr(codepoint)
+        decomposed = unicodedata.normalize("NFKD", _LIGATURES.get(char, char))
+        folded = "".join(c for c in decomposed if not unicodedata.combining(c))
+        self[codepoint] = folded
+        return folded
+
+
+_FOLD = _FoldTable()
+
+
+def fold(text: str) -> str:
+    """Lowercase text without accents: "Épicerie Noël" -> "epicerie noel" """
+    text = text.lower()
+    return text if text.isascii() else text.translate(_FOLD)
+
+
+def tokenize(text: str) -> List[str]:
+    """Accent-folded alphanumeric words of a text"""
+    return _TOKEN.findall(fold(text))
+
+
+class TextIndex:
+    """Tokens mapped to the distinct texts holding them
+
+    Many records share a text, so the index is over the distinct texts
+    (the StringTable of a record store), not the rows: a query resolves to
+    a few text codes, then one np.isin over the text code column selects
+    the rows. Interned texts are only ever appended, so sync() indexes the
+    new ones incrementally. Each query word matches every token it is a
+    prefix of, found by binary search in the sorted vocabulary. Texts are
+    kept by value, so a saved index stays valid for a store rebuilt with
+    other codes.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.texts: List[str] = []
+        self.postings: Dict[str, Set[int]] = {}
+        # Textes de la table courante déjà examinés par sync()
+        self.synced = 0
+        # Signature des données au moment de la dernière sauvegarde
+        self.source: Any = None
+        self._ids: Dict[str, int] = {}
+        self._vocabulary: Optional[List[str]] = None
+
+    def sync(self, strings: List[str]) -> bool:
+        """Index the texts of a string table added since the last call; True if some were new"""
+        with self.lock:
+            added = False
+            for text in strings[self.synced:]:
+                if text in self._ids:
+                    continue
+                text_id = len(self.texts)
+                self._ids[text] = text_id
+                self.texts.append(text)
+                for token in set(tokenize(text)):
+                    self.postings.setdefault(token, set()).add(text_id)
+                added = True
+            self.synced = len(strings)
+            if added:
+                self._vocabulary = None
+            return added
+
+    def _prefixed(self, prefix: str) -> Set[int]:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        found: Set[int] = set()
+        for i in range(bisect_left(vocabulary, prefix), len(vocabulary)):
+            if not vocabulary[i].startswith(prefix):
+                break
+            found |= self.postings[vocabulary[i]]
+        return found
+
+    def codes(self, query: str, table: StringTable) -> Optional[np.ndarray]:
+        """Codes in a string table of the texts holding every word of a query (as prefixes)
+
+        None for a query without words, which filters nothing.
+        """
+        words = tokenize(query)
+        if not words:
+            return None
+        with self.lock:
+            matches: Optional[Set[int]] = None
+            # Les mots les plus longs sont les plus sélectifs: intersection commencée par eux
+            for word in sorted(set(words), key=len, reverse=True):
+                found = self._prefixed(word)
+                matches = found if matches is None else matches & found
+                if not matches:
+                    break
+            codes = (table.find(self.texts[i]) for i in matches or ())
+            return np.fromiter((c for c in codes if c is not None), dtype=np.int32)
+
+    def save(self, path: Path, source: Any) -> None:
+        """Persist the texts and postings with the signature of the data they were computed from"""
+        with self.lock:
+            postings = {token: sorted(ids) for token, ids in self.postings.items()}
+            texts = list(self.texts)
+        write_snapshot(path, {"source": _plain(source), "texts": texts, "postings": postings})
+
+    @classmethod
+    def load(cls, path: Path, source: Any) -> Optional["TextIndex"]:
+        """Load a persisted index, or None if it was computed from other data"""
+        saved = read_snapshot(path)
+        if not saved or saved[0].get("source") != _plain(source):
+            return None
+        index = cls()
+        index.source = source
+        index.texts = list(saved[0].get("texts", []))
+        index._ids = {text: i for i, text in enumerate(index.texts)}
+        index.postings = {token: set(ids) for token, ids in saved[0].get("postings", {}).items()}
+        return index
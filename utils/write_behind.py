@@ -0,0 +1,134 @@
+"""
+Write-behind queue: coalesced collection saves written by a background thread
+"""
+from typing import List, Dict, Any, Callable, Optional, Tuple
+import threading
+import time
+
+Writer = Callable[[Any], Any]
+
+# Attente avant de retenter une sauvegarde en échec (disque plein, fichier verrouillé...)
+RETRY_DELAY = 1.0
+
+
+class WriteBehindError(IOError):
+    """A queued save could not be written; it stays queued and is retried"""
+
+
+class WriteBehindQueue:
+    """Queue of pending collection saves, flushed after a short coalescing window
+
+    A writer that raises or returns False leaves its batch queued (unless a
+    newer save of the same collection replaced it meanwhile), so the change
+    is retried instead of being lost; the error is kept in last_error and
+    raised by flush().
+    """
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.enqueued = 0
+        self.coalesced = 0
+        self.writes = 0
+        self.failures = 0
+        self.last_error: Optional[Exception] = None
+        self._pending: Dict[str, Tuple[Any, Writer]] = {}
+        self._writing: Dict[str, Any] = {}
+        self._cond = threading.Condition()
+        # Sérialise les écritures pour qu'un lot ne soit jamais dépassé par le suivant
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def enqueue(self, key: str, data: Any, write: Writer) -> None:
+        """Queue the new content of a collection, replacing any pending one"""
+        with self._cond:
+            self.enqueued += 1
+            if key in self._pending:
+                self.coalesced += 1
+            self._pending[key] = (data, write)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def pending(self, key: str) -> Optional[Any]:
+        """Return the content queued or being written for a collection"""
+        with self._cond:
+            if key in self._pending:
+                return self._pending[key][0]
+            return self._writing.get(key)
+
+    def append_pending(self, key: str, record: Dict[str, Any]) -> bool:
+        """Append a record to a queued list; False if nothing is queued for the collection"""
+        with self._cond:
+            entry = self._pending.get(key)
+            if entry is None or not isinstance(entry[0], list):
+                return False
+            entry[0].append(record)
+            self.coalesced += 1
+            return True
+
+    def extend_pending(self, key: str, records: List[Dict[str, Any]]) -> bool:
+        """Append records to a queued list, all or none; False if nothing is queued for the collection"""
+        with self._cond:
+            entry = self._pending.get(key)
+            if entry is None or not isinstance(entry[0], list):
+                return False
+            entry[0].extend(records)
+            self.coalesced += 1
+            return True
+
+    def flush(self) -> None:
+        """Write every pending save now and wait for the writes in progress
+
+        Raises WriteBehindError if some of them failed; they stay queued.
+        """
+        failed = self._write_pending()
+        if failed:
+            raise WriteBehindError(f"Write-behind save failed for {', '.join(failed)}: {self.last_error}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "enqueued": self.enqueued,
+                "coalesced": self.coalesced,
+                "writes": self.writes,
+                "failures": self.failures,
+                "pending": len(self._pending),
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # Fenêtre de regroupement des sauvegardes successives
+            time.sleep(self.delay)
+            if self._write_pending():
+                time.sleep(RETRY_DELAY)
+
+    def _write_pending(self) -> List[str]:
+        """Write the queued saves; returns the keys whose write failed"""
+        failed: List[str] = []
+        with self._write_lock:
+            with self._cond:
+                batch = self._pending
+                self._pending = {}
+                self._writing = {key: data for key, (data, _) in batch.items()}
+            for key, (data, write) in batch.items():
+                try:
+                    if write(data) is False:
+                        raise WriteBehindError(f"writer reported a failure for {key}")
+                    error = None
+                except Exception as e:
+                    print(f"[v0] Error in write-behind save of {key}: {e}")
+                    error = e
+                with self._cond:
+                    self.writes += 1
+                    self._writing.pop(key, None)
+                    if error is not None:
+                        self.failures += 1
+                        self.last_error = error
+                        failed.append(key)
+                        # Remis en file pour une nouvelle tentative, sauf si une sauvegarde plus récente l'a remplacé
+                        self._pending.setdefault(key, (data, write))
+        return failed